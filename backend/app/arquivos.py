@@ -0,0 +1,34 @@
+# app/arquivos.py
+import os
+import threading
+
+# ================================
+# ESCRITA ATÔMICA EM DISCO
+# ================================
+# Capas, catálogo publicado e listagens dos zips são escritos num temporário
+# ao lado do destino e trocados com os.replace: quem lê vê o arquivo antigo ou
+# o novo inteiro, nunca um pela metade. O temporário leva pid + thread, porque
+# rotas do threadpool e workers podem gravar o mesmo destino ao mesmo tempo.
+
+
+def caminho_temporario(path: str) -> str:
+    # para quem escreve o temporário por conta própria (Pillow, link/cópia)
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def gravar_atomico(path: str, dados: bytes):
+    tmp = caminho_temporario(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, path)
+    except BaseException:
+        _remover(tmp)
+        raise
+
+
+def _remover(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
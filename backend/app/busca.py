@@ -0,0 +1,113 @@
+# app/busca.py
+import re
+import unicodedata
+
+from sqlalchemy import select, text, func, table, column, literal_column, or_, and_, cast, Float
+
+from app import models
+from app.database import IS_SQLITE
+
+# ================================
+# BUSCA DE JOGOS (full-text)
+# ================================
+# SQLite: tabela FTS5 "jogos_fts" (conteúdo externo = jogos), mantida por
+# triggers, com tokenizer unicode61 remove_diacritics (acentos não importam:
+# "acao" acha "Ação"). Ranking por bm25, nome pesa mais que descrição.
+#
+# Postgres: índice GIN sobre to_tsvector('simple', nome || descricao); sem a
+# extensão unaccent a busca lá diferencia acentos.
+BUSCA_LIMIT_PADRAO = 20
+BUSCA_LIMIT_MAXIMO = 100
+BUSCA_MAX_TERMOS = 8
+
+PESO_NOME = 10.0
+PESO_DESCRICAO = 1.0
+
+_fts = table("jogos_fts", column("rowid"))
+
+
+# ---------- schema (migração) ----------
+SQL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS jogos_fts USING fts5(
+        nome, descricao,
+        content='jogos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jogos_fts_ai AFTER INSERT ON jogos BEGIN
+        INSERT INTO jogos_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jogos_fts_ad AFTER DELETE ON jogos BEGIN
+        INSERT INTO jogos_fts(jogos_fts, rowid, nome, descricao) VALUES ('delete', old.id, old.nome, old.descricao);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jogos_fts_au AFTER UPDATE OF nome, descricao ON jogos BEGIN
+        INSERT INTO jogos_fts(jogos_fts, rowid, nome, descricao) VALUES ('delete', old.id, old.nome, old.descricao);
+        INSERT INTO jogos_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END
+    """,
+    # indexa o que já existe
+    "INSERT INTO jogos_fts(jogos_fts) VALUES ('rebuild')",
+]
+
+SQL_POSTGRES = [
+    "CREATE INDEX IF NOT EXISTS ix_jogos_busca ON jogos USING GIN ("
+    "to_tsvector('simple', coalesce(nome, '') || ' ' || coalesce(descricao, '')))",
+]
+
+
+def criar_indice(conn):
+    for sql in (SQL_SQLITE if IS_SQLITE else SQL_POSTGRES):
+        conn.execute(text(sql))
+
+
+# ---------- consulta ----------
+def termos(q: str) -> list:
+    # só letras/números: o texto do usuário nunca vira sintaxe do FTS
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFKD", q.lower()) if not unicodedata.combining(c)
+    )
+    return re.findall(r"\w+", sem_acento)[:BUSCA_MAX_TERMOS]
+
+
+def consulta(colunas: list, palavras: list, limit: int, depois: tuple | None = None):
+    """
+    SELECT de `colunas` (+ "rank") dos jogos que têm todas as palavras (a
+    última como prefixo: busca enquanto digita), ordenado por relevância.
+    `depois` = (rank, id) do último item da página anterior.
+    """
+    g = models.Game
+    q = select(*colunas)
+    if IS_SQLITE:
+        # ranqueia e corta só dentro do índice FTS; o join com jogos
+        # pega apenas as `limit` linhas que vão sair
+        match = " ".join([f'"{p}"' for p in palavras[:-1]] + [f'"{palavras[-1]}"*'])
+        rank = literal_column(f"bm25(jogos_fts, {PESO_NOME}, {PESO_DESCRICAO})")
+        melhores = (
+            select(_fts.c.rowid, rank.label("rank"))
+            .where(literal_column("jogos_fts").op("MATCH")(match))
+        )
+        if depois:
+            # bm25: menor = mais relevante
+            melhores = melhores.where(or_(rank > depois[0], and_(rank == depois[0], _fts.c.rowid > depois[1])))
+        melhores = melhores.order_by(rank, _fts.c.rowid).limit(limit).subquery()
+        return (
+            q.add_columns(melhores.c.rank)
+            .join(melhores, melhores.c.rowid == g.id)
+            .order_by(melhores.c.rank, g.id)
+        )
+    else:
+        doc = func.to_tsvector("simple", func.coalesce(g.nome, "") + " " + func.coalesce(g.descricao, ""))
+        consulta_ts = func.to_tsquery("simple", " & ".join(palavras[:-1] + [f"{palavras[-1]}:*"]))
+        rank = cast(func.ts_rank(doc, consulta_ts), Float)
+        q = q.add_columns(rank.label("rank")).where(doc.op("@@")(consulta_ts))
+        if depois:
+            q = q.where(or_(rank < depois[0], and_(rank == depois[0], g.id > depois[1])))
+        q = q.order_by(rank.desc(), g.id)
+    return q.limit(limit)
@@ -0,0 +1,130 @@
+# app/capas.py
+import os
+import hashlib
+import binascii
+import base64
+
+try:
+    from PIL import Image, ImageOps  # opcional: pip install Pillow
+except ImportError:
+    Image = None
+
+from app.arquivos import gravar_atomico, caminho_temporario
+
+# ================================
+# CAPAS DOS JOGOS (arquivos, fora do banco)
+# ================================
+# A capa colada como data URI no painel vira um arquivo em CAPAS_DIR com o
+# nome = sha256 do conteúdo; a linha do jogo guarda só o hash e o tipo.
+# As miniaturas (WebP/JPEG nos tamanhos de CAPAS_TAMANHOS) são geradas uma
+# vez, ao salvar a capa, e ficam ao lado do original.
+#
+# Sem Pillow instalado tudo continua funcionando, mas /capa entrega o
+# arquivo original em qualquer tamanho.
+CAPAS_DIR = os.getenv("CAPAS_DIR", os.path.join(os.getenv("DB_DIR", "/tmp/gameprime"), "capas"))
+CAPAS_TAMANHOS = [
+    tuple(int(n) for n in t.split("x"))
+    for t in os.getenv("CAPAS_TAMANHOS", "260x220,520x440").split(",")
+]
+CAPA_QUALIDADE = int(os.getenv("CAPA_QUALIDADE", "82"))
+CAPA_MAX_BYTES = int(os.getenv("CAPA_MAX_BYTES", str(10 * 1024 * 1024)))
+
+EXTENSOES = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+FORMATOS_MINIATURA = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def decodificar_data_uri(uri: str):
+    """
+    "data:image/png;base64,...." -> (bytes, "image/png"); None se não for data URI.
+    """
+    if not uri.startswith("data:") or "," not in uri:
+        return None
+    cabecalho, dados = uri[5:].split(",", 1)
+    mime = cabecalho.split(";")[0] or "application/octet-stream"
+    try:
+        dados = base64.b64decode("".join(dados.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return (dados, mime) if dados else None
+
+
+def caminho_original(capa_hash: str, capa_tipo: str) -> str:
+    return os.path.join(CAPAS_DIR, f"{capa_hash}.{EXTENSOES.get(capa_tipo, 'bin')}")
+
+
+def guardar(dados: bytes, mime: str) -> str:
+    """
+    Guarda a capa (se ainda não existe) e gera as miniaturas. Devolve o hash.
+    """
+    if len(dados) > CAPA_MAX_BYTES:
+        raise ValueError(f"Capa maior que {CAPA_MAX_BYTES} bytes")
+    if mime not in EXTENSOES:
+        raise ValueError(f"Tipo de imagem não suportado: {mime}")
+
+    capa_hash = hashlib.sha256(dados).hexdigest()
+    path = caminho_original(capa_hash, mime)
+    if not os.path.exists(path):
+        os.makedirs(CAPAS_DIR, exist_ok=True)
+        gravar_atomico(path, dados)
+
+    for w, h in CAPAS_TAMANHOS:
+        for formato in FORMATOS_MINIATURA:
+            miniatura(capa_hash, mime, w, h, formato)
+    return capa_hash
+
+
+def guardar_data_uri(uri: str):
+    """
+    data URI -> (hash, mime). None se não for uma data URI de imagem válida.
+    """
+    decodificada = decodificar_data_uri(uri)
+    if not decodificada:
+        return None
+    dados, mime = decodificada
+    return guardar(dados, mime), mime
+
+
+def miniatura(capa_hash: str, capa_tipo: str, w: int, h: int, formato: str):
+    """
+    Caminho e content-type da miniatura w x h (gera se ainda não existir).
+    Sem Pillow: o original.
+    """
+    original = caminho_original(capa_hash, capa_tipo)
+    if Image is None:
+        return original, capa_tipo
+
+    fmt_pil, mime = FORMATOS_MINIATURA[formato]
+    path = os.path.join(CAPAS_DIR, f"{capa_hash}_{w}x{h}.{formato}")
+    if os.path.exists(path):
+        return path, mime
+
+    try:
+        with Image.open(original) as img:
+            img = ImageOps.exif_transpose(img)
+            # preenche w x h cortando o excesso (mesmo enquadramento do card)
+            thumb = ImageOps.fit(img.convert("RGB"), (w, h), Image.LANCZOS)
+    except OSError:
+        # formato que o Pillow não abre: entrega o original
+        return original, capa_tipo
+    os.makedirs(CAPAS_DIR, exist_ok=True)
+    tmp = caminho_temporario(path)
+    thumb.save(tmp, fmt_pil, quality=CAPA_QUALIDADE)
+    os.replace(tmp, path)
+    return path, mime
+
+
+def url(jogo_id: int, capa_hash: str | None, versao_alternativa: str, tamanho: tuple | None = None) -> str:
+    # v = hash do conteúdo: a URL só muda quando a imagem muda (cache imutável)
+    v = capa_hash[:16] if capa_hash else versao_alternativa
+    u = f"/jogos/{jogo_id}/capa?v={v}"
+    if tamanho:
+        u += f"&w={tamanho[0]}&h={tamanho[1]}"
+    return u
@@ -0,0 +1,179 @@
+# app/catalogo.py
+import gzip
+import binascii
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, capas
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# ================================
+# CATÁLOGO PÚBLICO (/jogos)
+# ================================
+# O Explore abre o catálogo toda vez. Cada alteração de jogo incrementa um
+# contador de versão (tabela catalogo_versao) na mesma transação; o ETag do
+# catálogo sai desse número. Com If-None-Match igual a resposta é um 304 sem
+# corpo, e só a leitura de uma linha no banco.
+#
+# ?fields= escolhe as colunas. O link do Dropbox (dropbox_token) nunca sai
+# aqui, e capa_thumb é a URL da miniatura (/jogos/{id}/capa?v=&w=&h=) em
+# vez da imagem em si. genero é a lista de nomes (app/generos.py).
+CAMPOS = ("id", "nome", "descricao", "capa_url", "capa_thumb", "created_at", "genero")
+CAMPOS_PADRAO = ("id", "nome", "descricao", "capa_thumb")
+
+COMPRIMIR_MIN_BYTES = 1024
+
+
+# ---------- versão ----------
+ALTERACAO_UPSERT = "upsert"
+ALTERACAO_DELETE = "delete"
+
+
+def incrementar_versao(db: Session, jogo_id: int | None = None, tipo: str = ALTERACAO_UPSERT) -> int:
+    """
+    Nova versão do catálogo e, com jogo_id, o registro em game_changes
+    (/jogos/sync). Chamar antes do commit de quem altera jogos (mesma
+    transação). Devolve a versão nova.
+    """
+    n = db.execute(
+        update(models.CatalogoVersao)
+        .where(models.CatalogoVersao.id == 1)
+        .values(versao=models.CatalogoVersao.versao + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if n == 0:
+        db.add(models.CatalogoVersao(id=1, versao=1, log_desde=0))
+        versao = 1
+    else:
+        # a linha fica travada até o commit: ninguém pega o mesmo número
+        versao = db.execute(
+            select(models.CatalogoVersao.versao).where(models.CatalogoVersao.id == 1)
+        ).scalar()
+    if jogo_id is not None:
+        db.add(models.GameChange(versao=versao, jogo_id=jogo_id, tipo=tipo))
+    return versao
+
+
+async def versao_atual(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(models.CatalogoVersao.versao).where(models.CatalogoVersao.id == 1)
+    )
+    return result.scalar() or 0
+
+
+# ---------- projeção ----------
+def interpretar_campos(fields: str | None) -> tuple:
+    if not fields:
+        return CAMPOS_PADRAO
+    campos = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    invalidos = [c for c in campos if c not in CAMPOS]
+    if invalidos or not campos:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {invalidos}. Aceitos: {list(CAMPOS)}")
+    return campos
+
+
+def colunas(campos: tuple) -> list:
+    g = models.Game
+    cols = [g.id]
+    for c in campos:
+        if c in ("nome", "descricao", "capa_url", "created_at"):
+            cols.append(getattr(g, c))
+        elif c == "capa_thumb":
+            # só o necessário para montar a URL (não traz a capa em si)
+            cols.append(g.updated_at)
+            cols.append(g.capa_hash)
+            cols.append(
+                ((g.capa_hash.is_not(None)) | (func.length(func.coalesce(g.capa_url, "")) > 0)).label("tem_capa")
+            )
+    return cols
+
+
+def projetar(row, campos: tuple, generos_por_jogo: dict | None = None) -> dict:
+    item = {}
+    for c in campos:
+        if c == "genero":
+            item[c] = (generos_por_jogo or {}).get(row.id, [])
+        elif c == "capa_thumb":
+            item[c] = url_capa(row.id, row.capa_hash, row.updated_at, capas.CAPAS_TAMANHOS[0]) if row.tem_capa else None
+        elif c == "created_at":
+            item[c] = row.created_at.isoformat() if row.created_at else None
+        else:
+            item[c] = getattr(row, c)
+    return item
+
+
+def url_capa(jogo_id: int, capa_hash: str | None, updated_at, tamanho: tuple | None = None) -> str:
+    # capa externa (URL) não tem hash: versiona pela data de alteração do jogo
+    v = str(int(updated_at.timestamp() * 1000)) if updated_at else "0"
+    return capas.url(jogo_id, capa_hash, v, tamanho)
+
+
+# ---------- ETag / compressão ----------
+def etag(versao: int, campos: tuple, generos: tuple = ()) -> str:
+    variante = ",".join(campos) + ("|" + ",".join(generos) if generos else "")
+    return f'"cat-{versao}-{binascii.crc32(variante.encode()):08x}"'
+
+
+def etag_bate(if_none_match: str | None, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    base = tag.strip('"')
+    for t in if_none_match.split(","):
+        t = t.strip()
+        if t == "*":
+            return True
+        t = t.removeprefix("W/").strip('"')
+        # a versão comprimida tem o mesmo conteúdo: "cat-…-gzip" também vale
+        if t == base or t.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+def _aceita(accept_encoding: str | None, codificacao: str) -> bool:
+    for parte in (accept_encoding or "").split(","):
+        nome, _, params = parte.partition(";")
+        if nome.strip().lower() != codificacao:
+            continue
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def codificacao(accept_encoding: str | None, disponiveis) -> str | None:
+    # prefere brotli (menor) quando o cliente aceita os dois
+    for encoding in ("br", "gzip"):
+        if encoding in disponiveis and _aceita(accept_encoding, encoding):
+            return encoding
+    return None
+
+
+def comprimir(body: bytes, accept_encoding: str | None):
+    """
+    Devolve (corpo, content-encoding ou None). Prefere brotli se disponível.
+    """
+    if len(body) < COMPRIMIR_MIN_BYTES:
+        return body, None
+    encoding = codificacao(accept_encoding, ("br", "gzip") if brotli is not None else ("gzip",))
+    if encoding == "br":
+        return brotli.compress(body, quality=5), "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def etag_codificado(tag: str, encoding: str | None) -> str:
+    # ETag forte: representações com bytes diferentes precisam de tags diferentes
+    return f'{tag[:-1]}-{encoding}"' if encoding else tag
+
@@ -0,0 +1,138 @@
+# app/catalogo_snapshot.py
+import os
+import gzip
+import json
+import time
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, catalogo, generos
+
+# ================================
+# SNAPSHOT DO CATÁLOGO EM MEMÓRIA
+# ================================
+# O catálogo muda poucas vezes por dia, mas /jogos é aberto a cada Explore.
+# Aqui fica o JSON já serializado (e já comprimido em gzip/brotli) de cada
+# combinação de ?fields= pedida, junto com o ETag. Servir vira escolher os
+# bytes certos: sem consulta, sem montar dicts, sem json.dumps.
+#
+# Quem altera jogos chama invalidar() depois do commit; o próximo pedido
+# confere a versão no banco e remonta. Outros processos (workers) percebem a
+# mudança pela versão do catálogo, conferida no máximo a cada
+# CATALOGO_SNAPSHOT_TTL segundos.
+CATALOGO_SNAPSHOT_TTL = float(os.getenv("CATALOGO_SNAPSHOT_TTL", "2"))
+CATALOGO_SNAPSHOT_VARIANTES = int(os.getenv("CATALOGO_SNAPSHOT_VARIANTES", "16"))
+
+
+class Variante:
+    """
+    Um ?fields= do catálogo numa versão: corpo em cada codificação + ETag.
+    """
+
+    def __init__(self, versao: int, campos: tuple, body: bytes):
+        self.versao = versao
+        self.etag = catalogo.etag(versao, campos)
+        self.corpos = {None: body}
+        if len(body) >= catalogo.COMPRIMIR_MIN_BYTES:
+            # comprime uma vez só: dá para usar o nível máximo
+            self.corpos["gzip"] = gzip.compress(body, compresslevel=9)
+            if catalogo.brotli is not None:
+                self.corpos["br"] = catalogo.brotli.compress(body, quality=9)
+
+    def corpo(self, accept_encoding: str | None):
+        encoding = catalogo.codificacao(accept_encoding, self.corpos)
+        return self.corpos[encoding], encoding
+
+    def tamanho(self) -> int:
+        return sum(len(b) for b in self.corpos.values())
+
+
+class CatalogoSnapshot:
+    def __init__(self, ttl: float, max_variantes: int):
+        self.ttl = ttl
+        self.max_variantes = max_variantes
+
+        self.versao: int | None = None
+        self._conferido_em = 0.0
+        self._variantes = {}   # campos -> Variante
+        self._montando = asyncio.Lock()
+
+        self.hits = 0
+        self.montagens = 0
+        self.conferencias = 0
+        self.invalidacoes = 0
+
+    def invalidar(self):
+        # rotas admin (threadpool): só obriga a conferir a versão no próximo pedido
+        self._conferido_em = 0.0
+        self.invalidacoes += 1
+
+    async def _conferir_versao(self, db: AsyncSession):
+        agora = time.monotonic()
+        if agora - self._conferido_em < self.ttl:
+            return
+        versao = await catalogo.versao_atual(db)
+        self.conferencias += 1
+        self._conferido_em = agora
+        if versao != self.versao:
+            self.versao = versao
+            self._variantes = {}
+
+    async def obter(self, db: AsyncSession, campos: tuple) -> Variante:
+        await self._conferir_versao(db)
+        v = self._variantes.get(campos)
+        if v is not None and v.versao == self.versao:
+            self.hits += 1
+            return v
+
+        # um pedido monta, os outros esperam e reaproveitam
+        async with self._montando:
+            v = self._variantes.get(campos)
+            if v is None or v.versao != self.versao:
+                v = await self._montar(db, campos)
+        return v
+
+    async def _montar(self, db: AsyncSession, campos: tuple) -> Variante:
+        # versão e conteúdo na mesma transação de leitura: ETag e corpo batem
+        versao = await catalogo.versao_atual(db)
+        rows = (await db.execute(
+            select(*catalogo.colunas(campos)).order_by(models.Game.id)
+        )).all()
+        por_jogo = await generos.por_jogo(db, versao) if "genero" in campos else None
+        body = serializar(versao, [catalogo.projetar(r, campos, por_jogo) for r in rows])
+        # compressão fora do event loop (catálogo grande leva algumas centenas de ms)
+        v = await run_in_threadpool(Variante, versao, campos, body)
+        self.montagens += 1
+
+        if self.versao is None or versao > self.versao:
+            # outro processo alterou o catálogo depois da última conferência
+            self.versao = versao
+            self._variantes = {}
+            self._conferido_em = time.monotonic()
+        if versao == self.versao and (campos in self._variantes or len(self._variantes) < self.max_variantes):
+            self._variantes[campos] = v
+        return v
+
+    def stats(self) -> dict:
+        return {
+            "versao": self.versao,
+            "variantes": len(self._variantes),
+            "bytes": sum(v.tamanho() for v in self._variantes.values()),
+            "hits": self.hits,
+            "montagens": self.montagens,
+            "conferencias_versao": self.conferencias,
+            "invalidacoes": self.invalidacoes,
+        }
+
+
+def serializar(versao: int, jogos: list) -> bytes:
+    return json.dumps(
+        {"versao": versao, "jogos": jogos},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+snapshot = CatalogoSnapshot(CATALOGO_SNAPSHOT_TTL, CATALOGO_SNAPSHOT_VARIANTES)
@@ -0,0 +1,66 @@
+# app/catalogo_sync.py
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, catalogo, generos
+
+# ================================
+# SYNC INCREMENTAL DO CATÁLOGO (/jogos/sync)
+# ================================
+# add/edit/delete de jogo gravam em game_changes (jogo_id, tipo, versão do
+# catálogo) na mesma transação que incrementa a versão. O cliente guarda a
+# versão da cópia local e pede só o que mudou depois dela:
+#
+#   {"versao": 42, "upserts": [{...jogo...}], "removidos": [7]}
+#
+# Várias alterações do mesmo jogo viram uma só (a última). Quando não dá para
+# responder pelo log (versão anterior a catalogo_versao.log_desde, log
+# compactado pela manutenção, ou mudanças demais) a resposta é
+# {"versao": 42, "resync": true} e o cliente baixa o /jogos inteiro.
+SYNC_MAX_MUDANCAS = int(os.getenv("SYNC_MAX_MUDANCAS", "2000"))
+
+
+async def mudancas(db: AsyncSession, since: int, campos: tuple) -> dict:
+    # versão, log e jogos na mesma transação de leitura: resposta consistente
+    atual = (await db.execute(
+        select(models.CatalogoVersao.versao, models.CatalogoVersao.log_desde)
+        .where(models.CatalogoVersao.id == 1)
+    )).first()
+    versao, log_desde = (atual.versao, atual.log_desde or 0) if atual else (0, 0)
+
+    if since == versao:
+        return {"versao": versao, "upserts": [], "removidos": []}
+    if since > versao or since < log_desde:
+        # cópia de outro banco / log já compactado
+        return {"versao": versao, "resync": True}
+
+    rows = (await db.execute(
+        select(models.GameChange.jogo_id, models.GameChange.tipo)
+        .where(models.GameChange.versao > since, models.GameChange.versao <= versao)
+        .order_by(models.GameChange.id)
+        .limit(SYNC_MAX_MUDANCAS + 1)
+    )).all()
+    if len(rows) > SYNC_MAX_MUDANCAS:
+        return {"versao": versao, "resync": True}
+
+    ultimo = {}
+    for jogo_id, tipo in rows:
+        ultimo[jogo_id] = tipo
+    ids = [j for j, tipo in ultimo.items() if tipo == catalogo.ALTERACAO_UPSERT]
+
+    upserts, vivos = [], set()
+    if ids:
+        jogos = (await db.execute(
+            select(*catalogo.colunas(campos))
+            .where(models.Game.id.in_(ids))
+            .order_by(models.Game.id)
+        )).all()
+        por_jogo = await generos.por_jogo(db, versao) if "genero" in campos else None
+        upserts = [catalogo.projetar(r, campos, por_jogo) for r in jogos]
+        vivos = {r.id for r in jogos}
+
+    # apagado depois do upsert (ou sumiu): tombstone também
+    removidos = sorted(j for j in ultimo if j not in vivos)
+    return {"versao": versao, "upserts": upserts, "removidos": removidos}
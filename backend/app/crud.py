@@ -1,4 +1,9 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, case, update, or_, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 from app import models, schemas
 
@@ -13,16 +18,6 @@ def get_user_by_email(db: Session, email: str):
 
 
 def create_user(db: Session, user: schemas.UserCreate):
-
-    pw = user.password
-
-    # DEBUG (temporário)
-    print("DEBUG password type:", type(pw))
-    try:
-        print("DEBUG password bytes len:", len((pw or "").encode("utf-8")))
-        print("DEBUG password repr:", repr(pw))
-    except Exception as e:
-        print("DEBUG error inspecting password:", e)
     # schemas.py já validou <= 72 bytes, então aqui não explode.
     hashed_password = pwd_context.hash(user.password)
 
@@ -53,3 +48,192 @@ def authenticate_user(db: Session, email: str, password: str):
     if not verify_password(password, user.password):
         return None
     return user
+
+
+# ================================
+# PLANO DO USUÁRIO (colunas plan_* em users)
+# ================================
+def plano_status(plan_type: str | None, plan_expires_at: datetime | None, now: datetime | None = None) -> str:
+    if not plan_type:
+        return "SEM PLANO"
+    if plan_expires_at is None:
+        return "PERMANENTE"
+    if plan_expires_at < (now or datetime.utcnow()):
+        return "VENCIDO"
+    return "ATIVO"
+
+
+def plano_status_sql(now: datetime):
+    # mesma regra de plano_status, como expressão SQL (filtros/listagem)
+    return case(
+        (models.User.plan_type.is_(None), "SEM PLANO"),
+        (models.User.plan_expires_at.is_(None), "PERMANENTE"),
+        (models.User.plan_expires_at < now, "VENCIDO"),
+        else_="ATIVO",
+    )
+
+
+# ================================
+# LISTAGEM DE TOKENS (/admin/listar_tokens)
+# ================================
+def consulta_tokens(now: datetime, cursor: tuple | None = None, tipo: str | None = None,
+                    active: bool | None = None, expirado: bool | None = None):
+    """
+    SELECT (TokenDB, status) na ordem do cursor: created_at desc, desempate
+    pelo próprio token (ix_tokens_created_token / ix_tokens_livres).
+    """
+    t = models.TokenDB
+    # status pronto para a tela (o admin não precisa comparar datas)
+    status_token = case(
+        (t.active == False, "DISPONÍVEL"),
+        (t.expires_at.is_(None), "PERMANENTE"),
+        (or_(t.expirado == True, t.expires_at < now), "EXPIRADO"),
+        else_="ATIVO",
+    )
+    q = select(t, status_token.label("status"))
+    if cursor:
+        q = q.where(tuple_(t.created_at, t.token) < cursor)
+    if tipo:
+        q = q.where(t.type == tipo)
+    if active is not None:
+        q = q.where(t.active == active)
+    if expirado is True:
+        q = q.where(t.expires_at < now)
+    elif expirado is False:
+        q = q.where(or_(t.expires_at.is_(None), t.expires_at >= now))
+    return q.order_by(t.created_at.desc(), t.token.desc())
+
+
+# ================================
+# ATIVAÇÃO DE TOKEN (um UPDATE condicional)
+# ================================
+durations = {
+    "Teste Gratuito": timedelta(hours=3),
+    "Mensal": timedelta(days=30),
+    "Trimestral": timedelta(days=90),
+    "Anual": timedelta(days=365),
+    "Permanente": None
+}
+
+# motivo da falha -> (status HTTP, mensagem)
+FALHAS_ATIVACAO = {
+    "inexistente": (404, "Token inválido"),
+    "usado": (400, "Token já utilizado"),
+    "expirado": (400, "Token expirado"),
+}
+
+
+def _sql_ativar(token_str: str, user_id: int, now: datetime):
+    """
+    Marca o token como usado só se ele ainda estiver livre e válido. Com
+    duas ativações simultâneas do mesmo token, o banco deixa só uma
+    atualizar a linha; a outra não acha nada e falha.
+    """
+    expira = case(
+        *[(models.TokenDB.type == tipo, now + dur) for tipo, dur in durations.items() if dur],
+        else_=None,
+    )
+    return (
+        update(models.TokenDB)
+        .where(
+            models.TokenDB.token == token_str,
+            models.TokenDB.active == False,
+            or_(models.TokenDB.expires_at.is_(None), models.TokenDB.expires_at > now),
+        )
+        .values(active=True, user_id=user_id, activated_at=now, expires_at=expira)
+        .returning(models.TokenDB.token, models.TokenDB.type, models.TokenDB.expires_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _sql_plano(user_id: int, ativado):
+    # mesma transação da ativação (colunas plan_* de users)
+    return (
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(plan_type=ativado.type, plan_expires_at=ativado.expires_at, plan_token=ativado.token)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _motivo(token):
+    # só roda quando o UPDATE não pegou nenhuma linha: diz o porquê
+    if token is None:
+        return "inexistente"
+    if token.active:
+        return "usado"
+    return "expirado"
+
+
+def ativar_token(db: Session, token_str: str, user_id: int):
+    """
+    Devolve (ativado, motivo): ativado tem token/type/expires_at;
+    em caso de falha ativado é None e motivo é uma chave de FALHAS_ATIVACAO.
+    """
+    now = datetime.utcnow()
+    ativado = db.execute(_sql_ativar(token_str, user_id, now)).first()
+    if ativado is None:
+        db.rollback()
+        token = db.execute(
+            select(models.TokenDB.active).where(models.TokenDB.token == token_str)
+        ).first()
+        return None, _motivo(token)
+
+    db.execute(_sql_plano(user_id, ativado))
+    db.commit()
+    return ativado, None
+
+
+# ================================
+# VERSÕES ASYNC (AsyncSession)
+# ================================
+# bcrypt é CPU pesado (~centenas de ms): hash/verify vão para o threadpool
+# para não travar o event loop.
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email).limit(1))
+    return result.scalars().first()
+
+
+async def create_user_async(db: AsyncSession, user: schemas.UserCreate):
+    # bcrypt antes de tocar na sessão: a conexão escritora (pool de 1) não
+    # fica presa esperando o hash
+    hashed_password = await run_in_threadpool(pwd_context.hash, user.password)
+
+    db_user = models.User(
+        nome=user.nome,
+        email=user.email,
+        password=hashed_password,
+        is_active=True
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email_async(db, email)
+    # devolve a conexão de leitura antes do bcrypt (expire_on_commit=False:
+    # os atributos já carregados continuam legíveis)
+    await db.close()
+    if not user:
+        return None
+    if not await run_in_threadpool(verify_password, password, user.password):
+        return None
+    return user
+
+
+async def ativar_token_async(db: AsyncSession, token_str: str, user_id: int):
+    # mesma lógica de ativar_token
+    now = datetime.utcnow()
+    ativado = (await db.execute(_sql_ativar(token_str, user_id, now))).first()
+    if ativado is None:
+        await db.rollback()
+        token = (await db.execute(
+            select(models.TokenDB.active).where(models.TokenDB.token == token_str)
+        )).first()
+        return None, _motivo(token)
+
+    await db.execute(_sql_plano(user_id, ativado))
+    await db.commit()
+    return ativado, None
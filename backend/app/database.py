@@ -1,8 +1,9 @@
 # app/database.py
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 # 1) Permite configurar via env var (melhor na host)
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -14,11 +15,149 @@ if not DATABASE_URL:
     DB_PATH = os.path.join(db_dir, "gameprime.db")
     DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
+
+# ================================
+# PERFIL DO SQLITE
+# ================================
+# "wal" (padrão): journal WAL, 1 conexão escritora + pool de conexões só de
+#   leitura. Leitores não bloqueiam o escritor nem uns aos outros.
+# "legacy": uma única conexão compartilhada (StaticPool), como era antes.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "wal")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))       # por conexão
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def _sqlite_pragmas(somente_leitura: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cur = dbapi_connection.cursor()
+        if not somente_leitura:
+            # só vale em banco novo (antes da 1ª tabela); permite incremental_vacuum
+            cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cur.execute("PRAGMA journal_mode=WAL")  # fica gravado no arquivo do banco
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        if somente_leitura:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+    return on_connect
+
+
+if IS_SQLITE_MEMORY or (IS_SQLITE and SQLITE_PROFILE == "legacy"):
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    read_engine = engine
+
+elif IS_SQLITE:
+    # Escritor único: o SQLite só aceita uma escrita por vez. Com pool de 1
+    # conexão, escritas concorrentes esperam a vez no pool (fila em Python)
+    # em vez de disputar o lock do arquivo e falhar com "database is locked".
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(engine, "connect", _sqlite_pragmas(somente_leitura=False))
+
+    # Leitores: cada thread pega a sua conexão do pool (WAL = leitura em paralelo)
+    read_engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=DB_READ_POOL_SIZE,
+        max_overflow=DB_READ_POOL_SIZE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(read_engine, "connect", _sqlite_pragmas(somente_leitura=True))
+
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_SIZE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+    read_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessões só de leitura (listagens, login, checagem de plano)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
+
+
+# ================================
+# STACK ASSÍNCRONA (aiosqlite / asyncpg)
+# ================================
+# Mesmo banco, drivers async: as rotas quentes usam estas sessões direto no
+# event loop, sem passar pelo threadpool. ASYNC_DATABASE_URL permite apontar
+# o driver manualmente; senão é derivado de DATABASE_URL.
+def _url_async(url: str) -> str:
+    if url.startswith("sqlite+aiosqlite:") or "+asyncpg" in url:
+        return url
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefixo in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefixo):
+            return "postgresql+asyncpg://" + url[len(prefixo):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _url_async(DATABASE_URL)
+
+if IS_SQLITE_MEMORY or (IS_SQLITE and SQLITE_PROFILE == "legacy"):
+    # obs.: um banco :memory: do driver async é outro banco, separado do síncrono
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async_read_engine = async_engine
+
+elif IS_SQLITE:
+    # mesma disciplina do síncrono: 1 escritor + pool de leitores
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas(somente_leitura=False))
+
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=DB_READ_POOL_SIZE,
+        max_overflow=DB_READ_POOL_SIZE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(async_read_engine.sync_engine, "connect", _sqlite_pragmas(somente_leitura=True))
+
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_SIZE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+    async_read_engine = async_engine
+
+# expire_on_commit=False: objetos continuam legíveis depois do commit sem novo SELECT
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
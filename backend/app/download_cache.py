@@ -0,0 +1,208 @@
+# app/download_cache.py
+import os
+import stat
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from app import upstream
+
+# ================================
+# CACHE EM DISCO DOS ARQUIVOS DOS JOGOS
+# ================================
+# Quando um lançamento sai, centenas de usuários baixam o mesmo .zip ao mesmo
+# tempo. Com o cache ligado o arquivo vem do Dropbox uma vez e as próximas
+# requisições são servidas do disco local.
+#
+# DOWNLOAD_CACHE_MAX_BYTES=0 (padrão) desliga o cache.
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", os.path.join(os.getenv("DB_DIR", "/tmp/gameprime"), "cache"))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", "0"))
+
+# Por quanto tempo confiamos no ETag/tamanho do upstream antes de perguntar de novo (HEAD)
+DOWNLOAD_CACHE_META_TTL = float(os.getenv("DOWNLOAD_CACHE_META_TTL", "60"))
+
+SUFIXO_TEMP = ".part"
+
+# Um .part sem escrita há mais que isso é de processo que caiu. Os mais novos
+# podem ser spills vivos de outro worker usando o mesmo diretório (o
+# transmissor grava a cada pedaço; o upstream desiste em UPSTREAM_READ_TIMEOUT).
+DOWNLOAD_CACHE_PART_MAX_IDADE = float(os.getenv("DOWNLOAD_CACHE_PART_MAX_IDADE", "3600"))
+
+
+class DiskCache:
+    def __init__(self, diretorio: str, max_bytes: int):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()   # chave -> tamanho (ordem = LRU, mais recente no fim)
+        self._total = 0
+        self._preenchendo = set()        # chaves sendo baixadas agora
+        self._meta = {}                  # jogo_id -> (url, etag, tamanho, quando)
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_servidos = 0
+        self.preenchimentos = 0
+        self.remocoes = 0
+
+        if self.ativo:
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._carregar()
+
+    @property
+    def ativo(self) -> bool:
+        return self.max_bytes > 0
+
+    # ---------- índice ----------
+    def _carregar(self):
+        # reconstrói o índice a partir do disco (mais antigos primeiro)
+        arquivos = []
+        limite_part = time.time() - DOWNLOAD_CACHE_PART_MAX_IDADE
+        for fn in os.listdir(self.diretorio):
+            full = os.path.join(self.diretorio, fn)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            if fn.endswith(SUFIXO_TEMP):
+                # preenchimento interrompido (queda do processo); os recentes
+                # podem ser de outro worker e ficam
+                if st.st_mtime < limite_part:
+                    try:
+                        os.remove(full)
+                    except OSError:
+                        pass
+                continue
+            arquivos.append((st.st_mtime, fn, st.st_size))
+
+        arquivos.sort()
+        for _, fn, size in arquivos:
+            self._entradas[fn] = size
+            self._total += size
+        self._evict()
+
+    def caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, chave)
+
+    @staticmethod
+    def chave(jogo_id: int, etag: str, tamanho: int) -> str:
+        h = hashlib.sha1(f"{etag}|{tamanho}".encode("utf-8")).hexdigest()[:16]
+        return f"{jogo_id}-{h}"
+
+    def procurar(self, chave: str) -> str | None:
+        with self._lock:
+            if chave not in self._entradas:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.hits += 1
+        path = self.caminho(chave)
+        try:
+            os.utime(path)  # mtime = último uso (ordem LRU sobrevive a restart)
+        except OSError:
+            pass
+        return path
+
+    def contar_servido(self, n: int):
+        with self._lock:
+            self.bytes_servidos += n
+
+    def _evict(self):
+        # chamado com o lock (ou na carga inicial)
+        while self._total > self.max_bytes and self._entradas:
+            chave, size = self._entradas.popitem(last=False)
+            self._total -= size
+            self.remocoes += 1
+            try:
+                os.remove(self.caminho(chave))
+            except OSError:
+                pass
+
+    # ---------- preenchimento ----------
+    def pode_preencher(self, chave: str, tamanho: int) -> bool:
+        if not self.ativo or tamanho <= 0 or tamanho > self.max_bytes:
+            return False
+        with self._lock:
+            if chave in self._preenchendo or chave in self._entradas:
+                return False
+            self._preenchendo.add(chave)
+            return True
+
+    def concluir(self, chave: str, tmp_path: str, tamanho: int | None):
+        """
+        Fecha um preenchimento reservado com pode_preencher.
+        O arquivo só entra no cache (rename) se chegou inteiro;
+        tamanho None => falhou/cancelado: descarta o arquivo temporário.
+        """
+        with self._lock:
+            self._preenchendo.discard(chave)
+            if tamanho is None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            try:
+                os.replace(tmp_path, self.caminho(chave))  # rename atômico
+            except OSError:
+                return
+            self._entradas[chave] = tamanho
+            self._total += tamanho
+            self.preenchimentos += 1
+            self._evict()
+
+    # ---------- metadados do upstream ----------
+    async def metadados(self, jogo_id: int, url: str):
+        """
+        Devolve (etag, tamanho) do arquivo no upstream, usando HEAD.
+        O resultado fica guardado por DOWNLOAD_CACHE_META_TTL segundos.
+        """
+        agora = time.monotonic()
+        m = self._meta.get(jogo_id)
+        if m and m[0] == url and agora - m[3] < DOWNLOAD_CACHE_META_TTL:
+            return m[1], m[2]
+
+        r = await upstream.abrir_stream(url, method="HEAD")
+        await r.aclose()
+        if r.status_code >= 400:
+            return None, 0
+
+        etag = r.headers.get("etag") or r.headers.get("last-modified")
+        tamanho = int(r.headers.get("content-length") or 0)
+        self._meta[jogo_id] = (url, etag, tamanho, agora)
+        return etag, tamanho
+
+    def stats(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "ativo": self.ativo,
+                "max_bytes": self.max_bytes,
+                "bytes_em_cache": self._total,
+                "arquivos": len(self._entradas),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "bytes_servidos": self.bytes_servidos,
+                "preenchimentos": self.preenchimentos,
+                "remocoes": self.remocoes,
+            }
+
+
+def bytes_do_range(rng: str | None, tamanho: int) -> int:
+    # quantos bytes um Range (já validado por upstream.interpretar_range) vai entregar
+    if not rng:
+        return tamanho
+    inicio, _, fim = rng[6:].partition("-")
+    if not inicio:
+        return min(int(fim), tamanho)
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    return max(0, fim - inicio + 1)
+
+
+cache = DiskCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES)
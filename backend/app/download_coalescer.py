@@ -0,0 +1,327 @@
+# app/download_coalescer.py
+import os
+import shutil
+import asyncio
+import hashlib
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from app import upstream
+from app.download_cache import cache, DOWNLOAD_CACHE_DIR, SUFIXO_TEMP
+
+# ================================
+# DOWNLOADS SIMULTÂNEOS DO MESMO JOGO (single-flight)
+# ================================
+# N pessoas baixando o mesmo jogo ao mesmo tempo = 1 conexão no upstream.
+# A primeira requisição abre o upstream; uma tarefa em segundo plano grava os
+# bytes num arquivo temporário (spill) e cada cliente lê desse arquivo no seu
+# próprio ritmo. Um cliente lento nunca segura os rápidos nem o upstream.
+#
+# Se o cache em disco estiver ligado e o arquivo couber, o spill vira a
+# entrada do cache quando termina (rename atômico).
+#
+# O spill ocupa o arquivo inteiro em disco. Sem Content-Length, acima de
+# DOWNLOAD_SPILL_MAX_BYTES (soma dos spills vivos) ou se o disco ficaria com
+# menos de DOWNLOAD_SPILL_MIN_LIVRE livres, não há spill: o download vira
+# proxy simples.
+DOWNLOAD_COALESCE = os.getenv("DOWNLOAD_COALESCE", "1") == "1"
+DOWNLOAD_SPILL_DIR = os.getenv("DOWNLOAD_SPILL_DIR", DOWNLOAD_CACHE_DIR)
+DOWNLOAD_SPILL_MAX_BYTES = int(os.getenv("DOWNLOAD_SPILL_MAX_BYTES", str(10 * 1024 ** 3)))
+DOWNLOAD_SPILL_MIN_LIVRE = int(os.getenv("DOWNLOAD_SPILL_MIN_LIVRE", str(2 * 1024 ** 3)))
+
+
+class Transmissao:
+    def __init__(self, chave: str, cacheavel: bool):
+        self.chave = chave
+        self.cacheavel = cacheavel    # chave do cache (ETag/tamanho) conhecida
+        self.vai_para_cache = False
+
+        self.status_code = 0
+        self.headers = {}
+        self.tamanho = 0
+        self.escritos = 0
+        self.concluido = False
+        self.erro: Exception | None = None
+        self.leitores = 0
+        self.direto: httpx.Response | None = None   # sem spill (fora do orçamento)
+
+        self._reservas = 0       # vagas de leitor pegas em Coalescedor.transmissao
+        self._em_disco = 0       # bytes deste spill no orçamento do coalescedor
+        self._liberado = False
+
+        self.spill_path = os.path.join(
+            DOWNLOAD_SPILL_DIR, f"{chave}.{os.getpid()}.{id(self)}{SUFIXO_TEMP}"
+        )
+        self._pronto = asyncio.Event()
+        self._cond = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+        self._bombeando = False
+        self._parar = False
+
+    # ---------- upstream (uma vez) ----------
+    async def iniciar(self, url: str):
+        try:
+            r = await upstream.abrir_stream(url)
+        except Exception as e:
+            self.erro = e
+            self.concluido = True
+            self._pronto.set()
+            raise
+
+        self.status_code = r.status_code
+        self.headers = upstream.headers_de_resposta(r)
+        self.tamanho = int(r.headers.get("content-length") or 0)
+
+        if r.status_code != 200:
+            # nada para compartilhar; quem chamou decide o que fazer com o status
+            await r.aclose()
+            self.concluido = True
+            self._pronto.set()
+            return
+
+        self._em_disco = coalescedor._reservar_disco(self.tamanho)
+        if not self._em_disco:
+            # não cabe no disco: quem abriu repassa a resposta direto ao cliente
+            self.direto = r
+            self.concluido = True
+            self._pronto.set()
+            return
+
+        if self.cacheavel:
+            self.vai_para_cache = cache.pode_preencher(self.chave, self.tamanho)
+
+        try:
+            f = open(self.spill_path, "wb")
+        except OSError:
+            coalescedor._devolver_disco(self._em_disco)
+            self._em_disco = 0
+            self.direto = r
+            self.concluido = True
+            self._pronto.set()
+            return
+        self._task = asyncio.create_task(self._bombear(r, f))
+        self._pronto.set()
+
+    async def esperar_pronto(self):
+        await self._pronto.wait()
+        if self.erro:
+            raise self.erro
+
+    async def _bombear(self, r: httpx.Response, f):
+        self._bombeando = True
+        try:
+            if self._parar:
+                raise asyncio.CancelledError()
+            async for chunk in upstream.iterar_e_fechar(r):
+                await run_in_threadpool(_gravar, f, chunk)
+                self.escritos += len(chunk)
+                async with self._cond:
+                    self._cond.notify_all()
+            if self.tamanho and self.escritos != self.tamanho:
+                raise httpx.ReadError("Upstream encerrou antes do fim do arquivo")
+            if self.vai_para_cache:
+                await run_in_threadpool(os.fsync, f.fileno())
+        except BaseException as e:
+            self.erro = e if isinstance(e, Exception) else httpx.ReadError("Download cancelado")
+            raise
+        finally:
+            await r.aclose()  # já fechada por iterar_e_fechar, exceto se parou antes
+            f.close()
+            self.concluido = True
+            coalescedor._remover(self)
+
+            if self.vai_para_cache:
+                # ok -> rename para o cache; falha -> descarta
+                cache.concluir(self.chave, self.spill_path, None if self.erro else self.escritos)
+            self._talvez_liberar()
+
+            async with self._cond:
+                self._cond.notify_all()
+
+    # ---------- leitores (um por cliente) ----------
+    def _sair(self):
+        self.leitores -= 1
+        if (self.leitores == 0 and self._reservas == 0 and not self.concluido
+                and not self.vai_para_cache and self._task):
+            # ninguém mais está ouvindo e não vai para o cache: para o upstream
+            coalescedor._remover(self)
+            if self._bombeando:
+                self._task.cancel()
+            else:
+                # cancel() antes do primeiro passo pularia o finally de _bombear
+                self._parar = True
+        self._talvez_liberar()
+
+    def _talvez_liberar(self):
+        """
+        Terminada a transmissão e sem leitores nem reservas, apaga o spill
+        (se não virou entrada do cache) e devolve os bytes ao orçamento.
+        Quem ainda lê tem o próprio fd: o arquivo pode sumir do diretório.
+        """
+        if self._liberado or not self.concluido:
+            return
+        if not self.vai_para_cache and (self.leitores or self._reservas):
+            return
+        self._liberado = True
+        coalescedor._devolver_disco(self._em_disco)
+        if not self.vai_para_cache:
+            self._apagar_spill()
+
+    def _apagar_spill(self):
+        try:
+            os.remove(self.spill_path)
+        except OSError:
+            pass
+
+
+class Leitor:
+    """
+    Um cliente lendo o spill pelo próprio fd, no seu ritmo.
+    O fd é aberto em Coalescedor.transmissao, enquanto a vaga está
+    reservada; a vaga é devolvida no fim, no erro, no aclose ou quando o
+    leitor é coletado sem nunca ter sido lido (resposta abortada).
+    """
+
+    def __init__(self, t: Transmissao, f):
+        self.t = t
+        self._f = f
+        self._pos = 0
+        t.leitores += 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        t = self.t
+        try:
+            while True:
+                if self._f is None:
+                    raise StopAsyncIteration
+                if self._pos < t.escritos:
+                    n = min(upstream.DOWNLOAD_CHUNK_SIZE, t.escritos - self._pos)
+                    data = await run_in_threadpool(self._f.read, n)
+                    self._pos += len(data)
+                    return data
+
+                if t.concluido:
+                    if t.erro:
+                        raise t.erro
+                    raise StopAsyncIteration
+
+                async with t._cond:
+                    await t._cond.wait_for(lambda: t.escritos > self._pos or t.concluido)
+        except BaseException:
+            self.fechar()
+            raise
+
+    async def aclose(self):
+        self.fechar()
+
+    def fechar(self):
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        self.t._sair()
+
+    def __del__(self):
+        self.fechar()
+
+
+def _gravar(f, chunk: bytes):
+    f.write(chunk)
+    f.flush()  # leitores leem pelo próprio fd: os bytes precisam estar no arquivo
+
+
+class Coalescedor:
+    def __init__(self):
+        self._voos = {}    # chave -> Transmissao em andamento
+        self.abertas = 0   # conexões abertas no upstream
+        self.juncoes = 0   # requisições que pegaram carona numa transmissão existente
+        self.em_disco = 0  # bytes reservados pelos spills vivos
+        self.sem_spill = 0  # transmissões que viraram proxy simples (orçamento/disco)
+
+    @staticmethod
+    def chave_por_url(jogo_id: int, url: str) -> str:
+        return f"{jogo_id}-u{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}"
+
+    async def transmissao(self, chave: str, url: str, cacheavel: bool):
+        """
+        Entra na transmissão em andamento para `chave` ou abre uma nova.
+        Registrar antes do primeiro await garante que duas requisições
+        simultâneas nunca abram duas conexões; a vaga de leitor também é
+        reservada antes do primeiro await, então o spill não é apagado antes
+        de o fd deste leitor estar aberto.
+
+        Devolve (transmissao, corpo); corpo é None se o upstream não
+        respondeu 200. Devolve None se a transmissão ficou sem spill e esta
+        requisição não foi a que abriu o upstream: quem chamou faz o proxy.
+        """
+        t = self._voos.get(chave)
+        abriu = t is None
+        if abriu:
+            t = Transmissao(chave, cacheavel)
+            self._voos[chave] = t
+            self.abertas += 1
+        else:
+            self.juncoes += 1
+
+        t._reservas += 1
+        try:
+            if abriu:
+                try:
+                    await t.iniciar(url)
+                finally:
+                    if t.concluido:
+                        self._remover(t)
+            await t.esperar_pronto()
+
+            if t.direto is not None:
+                if abriu:
+                    self.sem_spill += 1
+                    return t, upstream.iterar_e_fechar(t.direto)
+                return None
+            if t.status_code != 200:
+                return t, None
+            f = open(t.spill_path, "rb")  # fd continua válido mesmo após rename/remoção
+            return t, Leitor(t, f)
+        finally:
+            t._reservas -= 1
+            t._talvez_liberar()
+
+    def _reservar_disco(self, tamanho: int) -> int:
+        """Bytes reservados para o spill (0 = não cabe: sem spill)."""
+        if not tamanho or self.em_disco + tamanho > DOWNLOAD_SPILL_MAX_BYTES:
+            return 0
+        try:
+            os.makedirs(DOWNLOAD_SPILL_DIR, exist_ok=True)
+            livre = shutil.disk_usage(DOWNLOAD_SPILL_DIR).free
+        except OSError:
+            return 0
+        if livre - tamanho < DOWNLOAD_SPILL_MIN_LIVRE:
+            return 0
+        self.em_disco += tamanho
+        return tamanho
+
+    def _devolver_disco(self, tamanho: int):
+        self.em_disco -= tamanho
+
+    def _remover(self, t: Transmissao):
+        if self._voos.get(t.chave) is t:
+            del self._voos[t.chave]
+
+    def stats(self) -> dict:
+        return {
+            "ativo": DOWNLOAD_COALESCE,
+            "em_andamento": len(self._voos),
+            "leitores": sum(t.leitores for t in self._voos.values()),
+            "conexoes_upstream": self.abertas,
+            "juncoes": self.juncoes,
+            "spill_bytes": self.em_disco,
+            "spill_max_bytes": DOWNLOAD_SPILL_MAX_BYTES,
+            "sem_spill": self.sem_spill,
+        }
+
+
+coalescedor = Coalescedor()
@@ -4,6 +4,7 @@ import zipfile
 import requests
 import threading
 import hashlib
+import shutil
 from PyQt6.QtCore import QObject, pyqtSignal
 
 
@@ -119,7 +120,34 @@ def find_main_exe(install_dir: str) -> str:
 # =========================
 # DOWNLOAD + EXTRACT
 # =========================
-def baixar_jogo(game_name: str, download_url: str, card=None) -> DownloadSignals:
+def _carregar_metadados(metadados_url: str | None) -> dict:
+    # tamanho/SHA-256 do zip (servidor calcula em segundo plano); opcional
+    if not metadados_url:
+        return {}
+    try:
+        r = requests.get(metadados_url, timeout=5)
+        dados = r.json() if r.status_code == 200 else {}
+    except Exception:
+        return {}
+    return dados if dados.get("status") == "ok" else {}
+
+
+def _mesmo_arquivo(headers, metadados: dict) -> bool:
+    # ETag e Content-Length da resposta contra os guardados na inspeção;
+    # o que faltar de um dos lados não conta
+    def sem_fraco(etag):
+        return etag[2:] if etag.startswith("W/") else etag
+
+    etag = headers.get("etag")
+    if etag and metadados.get("etag") and sem_fraco(etag) != sem_fraco(metadados["etag"]):
+        return False
+    tamanho = headers.get("content-length")
+    if tamanho and metadados.get("tamanho") and int(tamanho) != metadados["tamanho"]:
+        return False
+    return True
+
+
+def baixar_jogo(game_name: str, download_url: str, card=None, metadados_url: str | None = None) -> DownloadSignals:
     """
     Baixa e instala o jogo (ZIP) em:
       %LOCALAPPDATA%\\PrimeX\\games\\<game_name>\\
@@ -138,11 +166,19 @@ def baixar_jogo(game_name: str, download_url: str, card=None) -> DownloadSignals
       signals.install_dir
       signals.exe_relpath
       signals.exe_enc_path
+
+    metadados_url (GET /jogos/{id}/metadados, opcional): lido já na thread do
+    download. Confere espaço em disco antes de começar, usa o tamanho do zip
+    no progresso e o SHA-256 para validar o arquivo baixado. O exe_principal
+    (já escolhido pelo servidor no diretório central do zip) evita varrer a
+    pasta instalada.
     """
     signals = DownloadSignals()
 
     def run():
         try:
+            metadados = _carregar_metadados(metadados_url)
+
             safe_name = "".join(c for c in game_name if c not in r'\/:*?"<>|').strip()
             if not safe_name:
                 raise Exception("Nome do jogo inválido.")
@@ -152,11 +188,27 @@ def baixar_jogo(game_name: str, download_url: str, card=None) -> DownloadSignals
 
             temp_zip = os.path.join(GAMES_DIR, f"{safe_name}.zip")
 
+            # --- espaço em disco: zip + arquivos extraídos ---
+            necessario = (metadados.get("tamanho") or 0) + (metadados.get("tamanho_descompactado") or 0)
+            if necessario:
+                livre = shutil.disk_usage(GAMES_DIR).free
+                if livre < necessario:
+                    raise Exception(
+                        f"Espaço insuficiente: precisa de {necessario / 1024**3:.1f} GB, "
+                        f"livre {livre / 1024**3:.1f} GB."
+                    )
+            sha = None
+
             # --- download ---
             with requests.get(download_url, stream=True, timeout=120) as r:
                 r.raise_for_status()
 
-                total_length = int(r.headers.get("content-length") or 0)
+                # SHA-256 só vale se o servidor está mandando o mesmo arquivo
+                # que foi inspecionado (zip pode ter sido trocado no upstream)
+                if metadados.get("sha256") and _mesmo_arquivo(r.headers, metadados):
+                    sha = hashlib.sha256()
+
+                total_length = int(r.headers.get("content-length") or 0) or (metadados.get("tamanho") or 0)
                 downloaded = 0
                 last_pct = -1
 
@@ -165,6 +217,8 @@ def baixar_jogo(game_name: str, download_url: str, card=None) -> DownloadSignals
                         if not chunk:
                             continue
                         f.write(chunk)
+                        if sha:
+                            sha.update(chunk)
                         downloaded += len(chunk)
 
                         if total_length > 0:
@@ -173,6 +227,13 @@ def baixar_jogo(game_name: str, download_url: str, card=None) -> DownloadSignals
                                 last_pct = pct
                                 signals.progress.emit(pct)
 
+            if sha and sha.hexdigest() != metadados["sha256"]:
+                try:
+                    os.remove(temp_zip)
+                except Exception:
+                    pass
+                raise Exception("Arquivo baixado está corrompido (SHA-256 não confere). Tente novamente.")
+
             # --- valida zip e extrai ---
             with zipfile.ZipFile(temp_zip, "r") as zf:
                 zf.extractall(install_dir)
@@ -184,7 +245,15 @@ def baixar_jogo(game_name: str, download_url: str, card=None) -> DownloadSignals
                 pass
 
             # --- detectar exe principal ---
-            main_exe = find_main_exe(install_dir)
+            main_exe = ""
+            if metadados.get("exe_principal"):
+                # caminho do zip usa "/"; mesma regra do find_main_exe
+                main_exe = os.path.join(install_dir, *metadados["exe_principal"].split("/"))
+                dentro = os.path.commonpath([os.path.realpath(main_exe), os.path.realpath(install_dir)])
+                if dentro != os.path.realpath(install_dir) or not os.path.isfile(main_exe):
+                    main_exe = ""
+            if not main_exe:
+                main_exe = find_main_exe(install_dir)
             if not main_exe:
                 # Não trava o jogo se não achar exe (pode ser emulador, etc)
                 # mas devolve infos vazias
@@ -8,17 +8,20 @@ load_dotenv(dotenv_path)
 
 DROPBOX_ACCESS_TOKEN = os.getenv("DROPBOX_ACCESS_TOKEN")
 
-if not DROPBOX_ACCESS_TOKEN:
-    raise ValueError("❌ DROPBOX_ACCESS_TOKEN não foi encontrado no .env")
+# O cliente só é criado no primeiro uso: importar este módulo não fala com o Dropbox
+_dbx = None
 
-dbx = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
+def get_client() -> dropbox.Dropbox:
+    global _dbx
+    if _dbx is None:
+        if not DROPBOX_ACCESS_TOKEN:
+            raise ValueError("❌ DROPBOX_ACCESS_TOKEN não foi encontrado no .env")
+        _dbx = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
+    return _dbx
 
 def get_temporary_link(dropbox_path: str) -> str:
     try:
-        link = dbx.files_get_temporary_link(dropbox_path)
+        link = get_client().files_get_temporary_link(dropbox_path)
         return link.link
     except Exception as e:
         raise RuntimeError(f"Erro ao obter link temporário: {e}")
-
-
-print("🔐 Token carregado:", DROPBOX_ACCESS_TOKEN[:20], "...")  # Não mostra tudo por segurança
@@ -0,0 +1,208 @@
+# app/generos.py
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from sqlalchemy import select, delete, insert, func, and_
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Genero, JogoGenero
+
+# ================================
+# GÊNEROS DOS JOGOS (facetas)
+# ================================
+# generos (nome + chave normalizada) e jogos_generos (n:n). O filtro
+# /jogos?genero=RPG&genero=Ação devolve os jogos que têm TODOS os gêneros
+# pedidos (interseção); /jogos/generos conta quantos jogos cada gênero tem
+# dentro da seleção atual, para o menu mostrar "RPG (12)".
+#
+# Os resultados ficam em memória por versão do catálogo (catalogo_versao):
+# toda alteração de jogo incrementa a versão, então o cache se invalida
+# sozinho, inclusive entre processos.
+GENEROS_CACHE_MAX = int(os.getenv("GENEROS_CACHE_MAX", "256"))
+GENERO_MAX_CHARS = 50
+GENEROS_POR_JOGO = 20
+GENEROS_FILTRO_MAX = 10
+
+
+def chave(nome: str) -> str:
+    # "Ação", "acao", " AÇÃO " -> "acao"
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFKD", nome.casefold()) if not unicodedata.combining(c)
+    )
+    return " ".join(sem_acento.split())
+
+
+def normalizar(nomes) -> list:
+    """
+    Lista do painel -> [(nome, chave)] sem vazios nem repetidos.
+    Aceita lista ou texto separado por vírgula.
+    """
+    if isinstance(nomes, str):
+        nomes = nomes.split(",")
+    vistos = OrderedDict()
+    for n in nomes or []:
+        nome = re.sub(r"\s+", " ", str(n)).strip()[:GENERO_MAX_CHARS]
+        if nome and chave(nome) not in vistos:
+            vistos[chave(nome)] = nome
+    if len(vistos) > GENEROS_POR_JOGO:
+        raise HTTPException(status_code=400, detail=f"Máximo de {GENEROS_POR_JOGO} gêneros por jogo")
+    return [(nome, k) for k, nome in vistos.items()]
+
+
+def chaves_filtro(generos: list | None) -> tuple:
+    chaves = tuple(sorted({chave(g) for g in generos or [] if g and g.strip()}))
+    if len(chaves) > GENEROS_FILTRO_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo de {GENEROS_FILTRO_MAX} gêneros no filtro")
+    return chaves
+
+
+# ---------- escrita (rotas admin, síncronas) ----------
+def definir(db: Session, jogo_id: int, nomes) -> list:
+    """
+    Troca os gêneros do jogo. Chamar na mesma transação que incrementa a
+    versão do catálogo.
+    """
+    pares = normalizar(nomes)
+    ids = []
+    for nome, k in pares:
+        genero_id = db.execute(select(Genero.id).where(Genero.chave == k)).scalar()
+        if genero_id is None:
+            novo = Genero(nome=nome, chave=k)
+            db.add(novo)
+            db.flush()
+            genero_id = novo.id
+        ids.append(genero_id)
+
+    db.execute(delete(JogoGenero).where(JogoGenero.jogo_id == jogo_id))
+    if ids:
+        db.execute(insert(JogoGenero), [{"jogo_id": jogo_id, "genero_id": g} for g in ids])
+    return [nome for nome, _ in pares]
+
+
+def remover_jogo(db: Session, jogo_id: int):
+    # SQLite sem PRAGMA foreign_keys não aplica o ON DELETE CASCADE
+    db.execute(delete(JogoGenero).where(JogoGenero.jogo_id == jogo_id))
+
+
+# ---------- consultas ----------
+def jogos_com_todos(chaves: tuple):
+    # ids dos jogos que têm todos os gêneros (via ix_jogos_generos_genero)
+    return (
+        select(JogoGenero.jogo_id)
+        .join(Genero, Genero.id == JogoGenero.genero_id)
+        .where(Genero.chave.in_(chaves))
+        .group_by(JogoGenero.jogo_id)
+        .having(func.count() == len(chaves))
+    )
+
+
+def consulta_por_jogo():
+    return (
+        select(JogoGenero.jogo_id, Genero.nome)
+        .join(Genero, Genero.id == JogoGenero.genero_id)
+        .order_by(JogoGenero.jogo_id, Genero.nome)
+    )
+
+
+def agrupar(rows) -> dict:
+    # [(jogo_id, nome)] -> {jogo_id: [nomes]}
+    mapa = {}
+    for jogo_id, nome in rows:
+        mapa.setdefault(jogo_id, []).append(nome)
+    return mapa
+
+
+async def _por_jogo(db: AsyncSession) -> dict:
+    return agrupar((await db.execute(consulta_por_jogo())).all())
+
+
+async def _contagens(db: AsyncSession, chaves: tuple) -> list:
+    juncao = JogoGenero.genero_id == Genero.id
+    if chaves:
+        juncao = and_(juncao, JogoGenero.jogo_id.in_(jogos_com_todos(chaves)))
+    rows = (await db.execute(
+        select(Genero.nome, Genero.chave, func.count(JogoGenero.jogo_id))
+        .outerjoin(JogoGenero, juncao)
+        .group_by(Genero.id, Genero.nome, Genero.chave)
+        .order_by(Genero.nome)
+    )).all()
+    return [{"genero": nome, "chave": k, "total": total} for nome, k, total in rows]
+
+
+# ---------- cache por versão do catálogo ----------
+class FacetasCache:
+    def __init__(self, max_itens: int):
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._versao = None
+        self._entradas = OrderedDict()   # (tipo, ...) -> valor
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    def consultar(self, versao: int, chave_cache: tuple):
+        with self._lock:
+            if versao != self._versao:
+                return self._falta()
+            if chave_cache not in self._entradas:
+                return self._falta()
+            self._entradas.move_to_end(chave_cache)
+            self.hits += 1
+            return self._entradas[chave_cache]
+
+    def _falta(self):
+        self.misses += 1
+        return None
+
+    def guardar(self, versao: int, chave_cache: tuple, valor):
+        if self.max_itens <= 0:
+            return valor
+        with self._lock:
+            if self._versao is not None and versao < self._versao:
+                return valor   # leitura atrasada: não sobrescreve a versão nova
+            if versao != self._versao:
+                if self._entradas:
+                    self.invalidacoes += 1
+                self._entradas.clear()
+                self._versao = versao
+            self._entradas[chave_cache] = valor
+            self._entradas.move_to_end(chave_cache)
+            while len(self._entradas) > self.max_itens:
+                self._entradas.popitem(last=False)
+        return valor
+
+    async def obter(self, versao: int, chave_cache: tuple, carregar):
+        valor = self.consultar(versao, chave_cache)
+        if valor is None:
+            valor = self.guardar(versao, chave_cache, await carregar())
+        return valor
+
+    def stats(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "versao": self._versao,
+                "entradas": len(self._entradas),
+                "max_itens": self.max_itens,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "invalidacoes": self.invalidacoes,
+            }
+
+
+facetas = FacetasCache(GENEROS_CACHE_MAX)
+
+
+async def por_jogo(db: AsyncSession, versao: int) -> dict:
+    return await facetas.obter(versao, ("por_jogo",), lambda: _por_jogo(db))
+
+
+async def contagens(db: AsyncSession, versao: int, chaves: tuple) -> list:
+    return await facetas.obter(versao, ("contagens", chaves), lambda: _contagens(db, chaves))
@@ -0,0 +1,130 @@
+# app/link_resolver.py
+import os
+import time
+import asyncio
+from collections import Counter
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import dropbox_handler
+
+# ================================
+# LINKS TEMPORÁRIOS DO DROPBOX (cache + refresh antecipado)
+# ================================
+# files_get_temporary_link devolve um link válido por 4 horas. Guardamos o
+# link por caminho e renovamos em segundo plano antes de vencer, então uma
+# requisição de download quase nunca espera a API do Dropbox.
+LINK_TTL = float(os.getenv("DROPBOX_LINK_TTL", str(4 * 3600)))
+# margem de segurança: não entregamos link com menos que isso de vida
+LINK_MARGEM = float(os.getenv("DROPBOX_LINK_MARGEM", "600"))
+# a partir de que idade (fração do TTL) o link é renovado em segundo plano
+LINK_REFRESH_FRACAO = float(os.getenv("DROPBOX_LINK_REFRESH_FRACAO", "0.5"))
+
+# pré-busca periódica dos jogos mais baixados
+LINK_PREFETCH_TOP = int(os.getenv("DROPBOX_LINK_PREFETCH_TOP", "50"))
+LINK_PREFETCH_INTERVALO = float(os.getenv("DROPBOX_LINK_PREFETCH_INTERVALO", "600"))
+LINK_PREFETCH_CONCORRENCIA = int(os.getenv("DROPBOX_LINK_PREFETCH_CONCORRENCIA", "8"))
+
+
+class LinkResolver:
+    def __init__(self):
+        self._links = {}        # caminho -> (link, obtido_em)
+        self._em_voo = {}       # caminho -> asyncio.Task (single-flight)
+        self.usos = Counter()   # caminho -> nº de downloads (para a pré-busca)
+
+        self.hits = 0
+        self.misses = 0
+        self.renovacoes = 0
+        self.erros = 0
+
+    async def resolver(self, caminho: str) -> str:
+        self.usos[caminho] += 1
+        agora = time.monotonic()
+
+        atual = self._links.get(caminho)
+        if atual:
+            link, obtido_em = atual
+            idade = agora - obtido_em
+            if idade < LINK_TTL - LINK_MARGEM:
+                self.hits += 1
+                if idade >= LINK_TTL * LINK_REFRESH_FRACAO:
+                    self._buscar(caminho)  # renova sem fazer ninguém esperar
+                return link
+
+        self.misses += 1
+        return await self._buscar(caminho)
+
+    def _buscar(self, caminho: str) -> asyncio.Task:
+        # uma única chamada à API por caminho, não importa quantos pedem juntos
+        task = self._em_voo.get(caminho)
+        if task is None:
+            task = asyncio.create_task(self._buscar_agora(caminho))
+            task.add_done_callback(_consumir_erro)  # renovação em segundo plano não tem quem aguarde
+            self._em_voo[caminho] = task
+        return task
+
+    async def _buscar_agora(self, caminho: str) -> str:
+        try:
+            link = await run_in_threadpool(dropbox_handler.get_temporary_link, caminho)
+            if caminho in self._links:
+                self.renovacoes += 1
+            self._links[caminho] = (link, time.monotonic())
+            return link
+        except Exception:
+            self.erros += 1
+            raise
+        finally:
+            self._em_voo.pop(caminho, None)
+
+    def invalidar(self, caminho: str):
+        self._links.pop(caminho, None)
+
+    # ---------- pré-busca ----------
+    async def prefetch(self, caminhos):
+        sem = asyncio.Semaphore(LINK_PREFETCH_CONCORRENCIA)
+        agora = time.monotonic()
+
+        async def um(caminho):
+            atual = self._links.get(caminho)
+            if atual and agora - atual[1] < LINK_TTL * LINK_REFRESH_FRACAO:
+                return
+            async with sem:
+                try:
+                    await self._buscar(caminho)
+                except Exception:
+                    pass  # fica para a próxima; o download ainda resolve sob demanda
+
+        await asyncio.gather(*(um(c) for c in caminhos))
+
+    def mais_baixados(self, n: int = LINK_PREFETCH_TOP) -> list:
+        return [c for c, _ in self.usos.most_common(n)]
+
+    async def loop_prefetch(self, caminhos_iniciais):
+        """
+        Tarefa de fundo: na subida pré-busca `caminhos_iniciais()` e depois,
+        a cada LINK_PREFETCH_INTERVALO, os jogos mais baixados.
+        """
+        caminhos = await run_in_threadpool(caminhos_iniciais)
+        while True:
+            await self.prefetch(caminhos)
+            await asyncio.sleep(LINK_PREFETCH_INTERVALO)
+            caminhos = self.mais_baixados() or caminhos
+
+    def stats(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            "links": len(self._links),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+            "renovacoes": self.renovacoes,
+            "erros": self.erros,
+        }
+
+
+def _consumir_erro(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+resolver = LinkResolver()
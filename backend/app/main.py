@@ -1,14 +1,21 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-import dropbox
-import requests
-import uuid
+from datetime import datetime
+import asyncio
+import httpx
 from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey
 from sqlalchemy.orm import sessionmaker, Session, relationship
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, RedirectResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
 import traceback
-from app import models, schemas, crud
+from app import models, schemas, crud, upstream, download_cache, dropbox_handler, link_resolver, paginacao, migrations, tokens_lote, catalogo, capas, busca, generos, catalogo_sync
+from app.catalogo_snapshot import snapshot, serializar
+from app.publicacao import publicador
+from app.metadados import enriquecedor, METADADOS_ATIVO
+from app import metadados
+from app.manutencao import manutencao, MANUTENCAO_INTERVALO
+from app.plano_cache import planos
+from app.download_coalescer import coalescedor, DOWNLOAD_COALESCE
 from fastapi.responses import JSONResponse
 from fastapi import Body
 from fastapi.middleware.cors import CORSMiddleware
@@ -20,7 +27,10 @@ print("✅ CARREGOU app/main.py")
 # ================================
 # BANCO DE DADOS (SQLite)
 # ================================
-from app.database import SessionLocal, engine  # ✅ usa o mesmo engine/Base do projeto
+from app.database import SessionLocal, ReadSessionLocal, engine  # ✅ usa o mesmo engine/Base do projeto
+from app.database import AsyncSessionLocal, AsyncReadSessionLocal, async_engine, async_read_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 
 # Cria tabelas UMA vez, no mesmo banco
 #Fmodels.Base.metadata.create_all(bind=engine)
@@ -51,6 +61,14 @@ from app.database import DATABASE_URL
 @app.on_event("startup")
 def on_startup():
     models.Base.metadata.create_all(bind=engine)
+    migrations.aplicar_migracoes(engine)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await upstream.close_client()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 def _write_test():
     try:
@@ -73,6 +91,21 @@ def _write_test():
 def health():
     return {"ok": True}
 
+
+@app.get("/admin/metricas")
+def metricas():
+    return {
+        "download_cache": download_cache.cache.stats(),
+        "download_coalescer": coalescedor.stats(),
+        "links_dropbox": link_resolver.resolver.stats(),
+        "planos": planos.stats(),
+        "manutencao": manutencao.stats(),
+        "generos": generos.facetas.stats(),
+        "catalogo_snapshot": snapshot.stats(),
+        "catalogo_publicado": publicador.stats() if publicador else None,
+        "metadados": enriquecedor.stats(),
+    }
+
 def get_db():
     db = SessionLocal()
     try:
@@ -80,18 +113,36 @@ def get_db():
     finally:
         db.close()
 
+# versões async (rotas quentes: rodam no event loop, sem threadpool)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 # ================================
 # ROTAS - USUÁRIOS / REGISTRO
 # ================================
 @app.post("/register")
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(
+    user: schemas.UserCreate,
+    db: AsyncSession = Depends(get_async_db),
+    leitura: AsyncSession = Depends(get_async_read_db),
+):
     try:
-        existing_user = crud.get_user_by_email(db, user.email)
+        # consulta na leitora: a escritora só é usada no INSERT, depois do bcrypt
+        existing_user = await crud.get_user_by_email_async(leitura, user.email)
+        await leitura.close()
         if existing_user:
             return JSONResponse(status_code=400, content={"detail": "Usuário já existe"})
-        print("DEBUG password repr:", repr(user.password))
-        print("DEBUG password bytes:", len(user.password.encode("utf-8")))
-        new_user = crud.create_user(db, user)
+        try:
+            new_user = await crud.create_user_async(db, user)
+        except IntegrityError:
+            # outro cadastro com o mesmo email entrou entre a consulta e o INSERT
+            await db.rollback()
+            return JSONResponse(status_code=400, content={"detail": "Usuário já existe"})
         return JSONResponse(status_code=200, content={
             "id": new_user.id,
             "nome": new_user.nome,
@@ -110,14 +161,16 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 # Rota de login
 # ================================
 @app.post("/login", response_model=schemas.UserResponse)
-def login_user(user: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login_user(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_read_db)):
     # Autentica usuário usando crud
-    db_user = crud.authenticate_user(db, email=user.email, password=user.password)
+    db_user = await crud.authenticate_user_async(db, email=user.email, password=user.password)
     if not db_user:
         raise HTTPException(status_code=400, detail="Email ou senha incorretos")
 
-    # Retorna dados do usuário (id, nome, email, is_active, created_at)
-    return db_user
+    # Retorna dados do usuário (id, nome, email, is_active, created_at) + plano atual
+    resp = schemas.UserResponse.model_validate(db_user)
+    resp.plano_status = crud.plano_status(db_user.plan_type, db_user.plan_expires_at)
+    return resp
 
 # ================================
 # MODELOS ADICIONAIS (Jogos e Tokens)
@@ -126,80 +179,92 @@ def login_user(user: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 def ativar_token_db(token_str: str, user_id: int, db: Session):
-    token = db.query(TokenDB).filter(
-        TokenDB.token == token_str,
-        TokenDB.active == False
-    ).first()
-
-    if not token:
-        return None
+    ativado, _ = crud.ativar_token(db, token_str, user_id)
+    if ativado:
+        planos.invalidar(user_id)
+    return ativado
 
-    # verifica expiração
-    if token.expires_at and token.expires_at < datetime.utcnow():
-        return None
 
-    token.active = True
-    token.activated_at = datetime.utcnow()
-    token.user_id = user_id
-
-    db.commit()
-    db.refresh(token)
-    return token
 
+from sqlalchemy import select, and_, func
 
-from sqlalchemy import desc
+STATUS_PLANO = ("ATIVO", "VENCIDO", "PERMANENTE", "SEM PLANO")
 
 @app.get("/admin/listar_usuarios")
-def listar_usuarios(db: Session = Depends(get_db)):
-    users = db.query(models.User).order_by(models.User.id.desc()).all()
-
-    result = []
+async def listar_usuarios(
+    after: str | None = None,
+    limit: int | None = None,
+    status: str | None = None,   # ATIVO / VENCIDO / PERMANENTE / SEM PLANO / BANIDO
+    email: str | None = None,    # prefixo do email
+    db: AsyncSession = Depends(get_async_read_db)
+):
     now = datetime.utcnow()
-
-    for u in users:
-        # pega o token mais recente ATIVADO (ou seja: já usado pelo usuário)
-        tok = (
-            db.query(TokenDB)
-            .filter(TokenDB.user_id == u.id, TokenDB.active == True)
-            .order_by(desc(TokenDB.activated_at))
-            .first()
+    limit = paginacao.limitar(limit)
+
+    # plano vem das colunas plan_* de users; o join pela PK do token só traz activated_at
+    plano_status = crud.plano_status_sql(now)
+
+    q = (
+        select(
+            models.User.id,
+            models.User.nome,
+            models.User.email,
+            models.User.is_active,
+            models.User.created_at,
+            models.User.plan_token,
+            models.User.plan_type,
+            models.User.plan_expires_at,
+            # token do plano pode já ter ido para tokens_archive
+            func.coalesce(TokenDB.activated_at, models.TokenArchive.activated_at).label("activated_at"),
+            plano_status.label("plano_status"),
         )
+        .outerjoin(TokenDB, TokenDB.token == models.User.plan_token)
+        .outerjoin(models.TokenArchive, models.TokenArchive.token == models.User.plan_token)
+    )
 
-        token_info = None
-        plano_status = "SEM PLANO"
+    cursor = paginacao.decodificar_cursor(after, int)
+    if cursor:
+        q = q.where(models.User.id < cursor[0])
+    if email:
+        q = q.where(paginacao.filtro_prefixo(models.User.email, email))
+    if status:
+        status = status.upper()
+        if status == "BANIDO":
+            q = q.where(models.User.is_active == False)
+        elif status in STATUS_PLANO:
+            q = q.where(plano_status == status)
+        else:
+            raise HTTPException(status_code=400, detail=f"Status inválido: {status}")
+
+    rows = (await db.execute(q.order_by(models.User.id.desc()).limit(limit + 1))).all()
+    rows, proximo = paginacao.pagina(rows, limit, lambda u: paginacao.codificar_cursor(u.id))
 
-        if tok:
+    result = []
+    for u in rows:
+        token_info = None
+        if u.plan_token:
             token_info = {
-                "token": tok.token,
-                "type": tok.type,
-                "activated_at": tok.activated_at.isoformat() if tok.activated_at else None,
-                "expires_at": tok.expires_at.isoformat() if tok.expires_at else None,
+                "token": u.plan_token,
+                "type": u.plan_type,
+                "activated_at": u.activated_at.isoformat() if u.activated_at else None,
+                "expires_at": u.plan_expires_at.isoformat() if u.plan_expires_at else None,
             }
 
-            if tok.expires_at:
-                if tok.expires_at < now:
-                    plano_status = "VENCIDO"
-                else:
-                    plano_status = "ATIVO"
-            else:
-                # ativado e sem expiração => permanente
-                plano_status = "PERMANENTE"
-
-        # Se usuário estiver banido, status geral vira BANIDO
-        user_status = "ATIVO" if getattr(u, "is_active", True) else "BANIDO"
+        is_active = True if u.is_active is None else u.is_active
 
         result.append({
             "id": u.id,
             "nome": u.nome,
             "email": u.email,
-            "is_active": getattr(u, "is_active", True),
-            "created_at": u.created_at.isoformat() if getattr(u, "created_at", None) else None,
-            "user_status": user_status,
-            "plano_status": plano_status,
+            "is_active": is_active,
+            "created_at": u.created_at.isoformat() if u.created_at else None,
+            # Se usuário estiver banido, status geral vira BANIDO
+            "user_status": "ATIVO" if is_active else "BANIDO",
+            "plano_status": u.plano_status,
             "token_info": token_info,
         })
 
-    return {"usuarios": result}
+    return {"usuarios": result, "next": proximo}
 
 
 @app.put("/admin/banir_usuario/{user_id}")
@@ -210,6 +275,7 @@ def banir_usuario(user_id: int, db: Session = Depends(get_db)):
 
     u.is_active = False
     db.commit()
+    planos.invalidar(user_id)
     return {"message": "Usuário banido com sucesso", "id": u.id}
 
 
@@ -221,37 +287,133 @@ def desbanir_usuario(user_id: int, db: Session = Depends(get_db)):
 
     u.is_active = True
     db.commit()
+    planos.invalidar(user_id)
     return {"message": "Usuário desbanido com sucesso", "id": u.id}
 
 
-def usuario_tem_plano_ativo(user_id: int, db: Session):
-    token = db.query(TokenDB).filter(
-        TokenDB.user_id == user_id,
-        TokenDB.active == True
-    ).order_by(TokenDB.created_at.desc()).first()
-
-    if not token:
-        return False
+async def usuario_tem_plano_ativo_async(user_id: int, db: AsyncSession):
+    # cache em memória: só vai ao banco no primeiro download (ou após invalidar)
+    pode = planos.consultar(user_id)
+    if pode is not None:
+        return pode
 
-    # verifica expiração
-    if token.expires_at and token.expires_at < datetime.utcnow():
-        return False
+    geracao = planos.geracao(user_id)
+    result = await db.execute(
+        select(models.User.is_active, models.User.plan_type, models.User.plan_expires_at)
+        .where(models.User.id == user_id)
+    )
+    row = result.first()
+    if not row:
+        # usuário inexistente: guarda também, para não martelar o banco
+        return planos.guardar(user_id, geracao, False, False, None)
 
-    return True
+    ativo = True if row[0] is None else row[0]  # NULL = ativo (legado)
+    return planos.guardar(user_id, geracao, ativo, bool(row[1]), row[2])
 
 
 # ================================
 # CONFIGURAÇÕES DO DROPBOX
 # ================================
-DROPBOX_TOKEN = "SEU_TOKEN_AQUI"
-DROPBOX_FOLDER = "/jogos"
-dbx = dropbox.Dropbox(DROPBOX_TOKEN)
-
 def transformar_link_dropbox(link: str) -> str:
     if "dropbox.com" in link:
         return link.replace("?dl=0", "?dl=1").replace("www.dropbox.com", "dl.dropboxusercontent.com")
     return link
 
+# Modo padrão de /jogos/{id}/download:
+#   "proxy"    -> os bytes passam pelo servidor (suporta Range)
+#   "redirect" -> valida o plano e responde 307 para o link do arquivo
+# ?modo=redirect só vale com DOWNLOAD_MODE=redirect e para jogo guardado como
+# caminho do Dropbox (link temporário do link_resolver, expira em ~4h). Link
+# compartilhado é permanente: entregá-lo dispensaria o plano daí em diante,
+# então sempre passa pelo proxy.
+DOWNLOAD_MODES = ("proxy", "redirect")
+DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "proxy")
+
+async def resolver_link_download(link: str) -> str:
+    """
+    Converte o que está salvo em Game.dropbox_token numa URL baixável.
+    Caminho do Dropbox ("/jogos/x.zip") vira link temporário (vale ~4h, vem
+    do cache do link_resolver); link compartilhado já é direto
+    (ver transformar_link_dropbox).
+    """
+    if link.startswith("/"):
+        return await link_resolver.resolver.resolver(link)
+    return link
+
+
+def _caminhos_dropbox_recentes():
+    # jogos guardados como caminho do Dropbox, mais novos primeiro (lançamentos = mais baixados)
+    db = ReadSessionLocal()
+    try:
+        jogos = (
+            db.query(models.Game.dropbox_token)
+            .filter(models.Game.dropbox_token.like("/%"))
+            .order_by(models.Game.id.desc())
+            .limit(link_resolver.LINK_PREFETCH_TOP)
+            .all()
+        )
+        return [j.dropbox_token for j in jogos]
+    finally:
+        db.close()
+
+
+_tarefa_prefetch = None
+
+@app.on_event("startup")
+async def iniciar_prefetch_links():
+    global _tarefa_prefetch
+    if dropbox_handler.DROPBOX_ACCESS_TOKEN:
+        _tarefa_prefetch = asyncio.create_task(
+            link_resolver.resolver.loop_prefetch(_caminhos_dropbox_recentes)
+        )
+
+@app.on_event("shutdown")
+async def parar_prefetch_links():
+    if _tarefa_prefetch:
+        _tarefa_prefetch.cancel()
+
+
+_tarefa_manutencao = None
+
+@app.on_event("startup")
+async def iniciar_manutencao():
+    # varredura de tokens vencidos/arquivamento + otimização do banco
+    global _tarefa_manutencao
+    if MANUTENCAO_INTERVALO > 0:
+        _tarefa_manutencao = asyncio.create_task(manutencao.loop())
+
+@app.on_event("shutdown")
+async def parar_manutencao():
+    if _tarefa_manutencao:
+        _tarefa_manutencao.cancel()
+
+_tarefa_publicacao = None
+
+@app.on_event("startup")
+async def iniciar_publicacao():
+    # catálogo estático em CATALOGO_PUBLICAR_DIR (app/publicacao.py)
+    global _tarefa_publicacao
+    if publicador:
+        _tarefa_publicacao = asyncio.create_task(publicador.loop())
+
+@app.on_event("shutdown")
+async def parar_publicacao():
+    if _tarefa_publicacao:
+        _tarefa_publicacao.cancel()
+
+@app.on_event("startup")
+async def iniciar_metadados():
+    # tamanho/lista de arquivos/exe dos .zip (app/metadados.py)
+    if not METADADOS_ATIVO:
+        return
+    enriquecedor.iniciar(resolver_link_download)
+    for jogo_id in await run_in_threadpool(enriquecedor.pendentes_no_banco):
+        enriquecedor.agendar(jogo_id)
+
+@app.on_event("shutdown")
+async def parar_metadados():
+    enriquecedor.parar()
+
 # ================================
 # MODELOS Pydantic
 # ================================
@@ -260,13 +422,42 @@ class GameCreate(BaseModel):
     descricao: str
     dropbox_token: str
     capa_url: str | None = None
+    genero: list[str] | str | None = None   # None = mantém os gêneros atuais
 
 class TokenRequest(BaseModel):
     type: str
+    quantidade: int = 10
+
+class TokenLoteRequest(BaseModel):
+    type: str
+    quantidade: int
+    formato: str = "csv"   # csv / ndjson
 
 # ================================
 # ROTAS - JOGOS
 # ================================
+def aplicar_capa(db_jogo: models.Game, capa_url: str | None):
+    """
+    data URI -> arquivo em CAPAS_DIR (capa_hash); URL externa fica em capa_url.
+    """
+    capa = (capa_url or "").strip()
+    if db_jogo.id and capa.startswith(f"/jogos/{db_jogo.id}/capa"):
+        return  # painel reenviou a URL atual: capa não mudou
+
+    if capa.startswith("data:"):
+        try:
+            guardada = capas.guardar_data_uri(capa)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not guardada:
+            raise HTTPException(status_code=400, detail="Capa inválida")
+        db_jogo.capa_hash, db_jogo.capa_tipo = guardada
+        db_jogo.capa_url = ""
+    else:
+        db_jogo.capa_url = capa
+        db_jogo.capa_hash = None
+        db_jogo.capa_tipo = None
+
 @app.post("/admin/adicionar_jogo")
 def adicionar_jogo(jogo: GameCreate, db: Session = Depends(get_db)):
     dropbox_token = transformar_link_dropbox(jogo.dropbox_token)
@@ -274,36 +465,68 @@ def adicionar_jogo(jogo: GameCreate, db: Session = Depends(get_db)):
         nome=jogo.nome,
         descricao=jogo.descricao,
         dropbox_token=dropbox_token,
-        capa_url=jogo.capa_url or ""
     )
+    aplicar_capa(novo, jogo.capa_url)
     db.add(novo)
+    db.flush()   # precisa do id
+    if jogo.genero is not None:
+        generos.definir(db, novo.id, jogo.genero)
+    catalogo.incrementar_versao(db, novo.id)
     db.commit()
+    snapshot.invalidar()
+    enriquecedor.agendar(novo.id)
     db.refresh(novo)
     return {"message": "Jogo adicionado com sucesso", "id": novo.id}
 
 @app.get("/admin/listar_jogos")
-def listar_jogos(db: Session = Depends(get_db)):
-    jogos = db.query(models.Game).all()
+async def listar_jogos(
+    after: str | None = None,
+    limit: int | None = None,
+    nome: str | None = None,   # prefixo do nome
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    limit = paginacao.limitar(limit)
+    q = select(models.Game)
+
+    cursor = paginacao.decodificar_cursor(after, int)
+    if cursor:
+        q = q.where(models.Game.id > cursor[0])
+    if nome:
+        q = q.where(paginacao.filtro_prefixo(models.Game.nome, nome))
+
+    jogos = (await db.execute(q.order_by(models.Game.id).limit(limit + 1))).scalars().all()
+    jogos, proximo = paginacao.pagina(jogos, limit, lambda j: paginacao.codificar_cursor(j.id))
+    por_jogo = await generos.por_jogo(db, await catalogo.versao_atual(db))
+
     return {"jogos": [
         {
             "id": j.id,
             "nome": j.nome,
             "descricao": j.descricao,
             "dropbox_token": j.dropbox_token,
-            "capa_url": j.capa_url
+            "capa_url": catalogo.url_capa(j.id, j.capa_hash, j.updated_at) if j.capa_hash else j.capa_url,
+            "genero": por_jogo.get(j.id, [])
         } for j in jogos
-    ]}
+    ], "next": proximo}
 
 @app.put("/admin/editar_jogo/{jogo_id}")
 def editar_jogo(jogo_id: int, jogo: GameCreate, db: Session = Depends(get_db)):
     db_jogo = db.query(models.Game).filter(models.Game.id == jogo_id).first()
     if not db_jogo:
         raise HTTPException(status_code=404, detail="Jogo não encontrado")
+    link_resolver.resolver.invalidar(db_jogo.dropbox_token)
+    link_antigo = db_jogo.dropbox_token
     db_jogo.nome = jogo.nome
     db_jogo.descricao = jogo.descricao
     db_jogo.dropbox_token = transformar_link_dropbox(jogo.dropbox_token)
-    db_jogo.capa_url = jogo.capa_url or ""
+    aplicar_capa(db_jogo, jogo.capa_url)
+    if jogo.genero is not None:
+        generos.definir(db, db_jogo.id, jogo.genero)
+    catalogo.incrementar_versao(db, db_jogo.id)
     db.commit()
+    snapshot.invalidar()
+    if db_jogo.dropbox_token != link_antigo:
+        enriquecedor.agendar(jogo_id)
     return {"message": "Jogo atualizado com sucesso"}
 
 @app.delete("/admin/deletar_jogo/{jogo_id}")
@@ -311,24 +534,280 @@ def deletar_jogo(jogo_id: int, db: Session = Depends(get_db)):
     db_jogo = db.query(models.Game).filter(models.Game.id == jogo_id).first()
     if not db_jogo:
         raise HTTPException(status_code=404, detail="Jogo não encontrado")
+    link_resolver.resolver.invalidar(db_jogo.dropbox_token)
+    generos.remover_jogo(db, db_jogo.id)
+    metadados.remover_jogo(db, db_jogo.id)
     db.delete(db_jogo)
+    catalogo.incrementar_versao(db, jogo_id, catalogo.ALTERACAO_DELETE)
     db.commit()
+    snapshot.invalidar()
     return {"message": "Jogo deletado com sucesso"}
 
+@app.get("/jogos/{jogo_id}/metadados")
+async def metadados_jogo(jogo_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Tamanho, nº de arquivos, tamanho descompactado, exe e (se calculado)
+    SHA-256 do .zip. 404 enquanto a tarefa de fundo ainda não olhou o jogo.
+    """
+    arquivo = await db.get(models.JogoArquivo, jogo_id)
+    if not arquivo:
+        raise HTTPException(status_code=404, detail="Metadados ainda não disponíveis")
+    return metadados.para_dict(arquivo)
+
+@app.get("/jogos/{jogo_id}/files")
+async def arquivos_jogo(request: Request, jogo_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Diretório central do .zip: {"colunas": [...], "arquivos": [[path,
+    tamanho_compactado, tamanho, crc32, offset, metodo], ...]}. Sai do arquivo
+    pré-gerado pela tarefa de metadados; se ainda não existe, inspeciona agora.
+    """
+    row = (await db.execute(
+        select(
+            models.Game.dropbox_token, models.JogoArquivo.status, models.JogoArquivo.erro,
+            models.JogoArquivo.verificado_em,
+        )
+        .outerjoin(models.JogoArquivo, and_(
+            models.JogoArquivo.jogo_id == models.Game.id,
+            models.JogoArquivo.fonte == models.Game.dropbox_token,
+        ))
+        .where(models.Game.id == jogo_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Jogo não encontrado")
+    fonte, status, erro, verificado_em = row
+    path = metadados.caminho_listagem(jogo_id, fonte)
+
+    if status != "ok" or not os.path.exists(path):
+        # erro recente: responde o erro; mais velho que o intervalo de
+        # nova tentativa, inspeciona de novo como se não houvesse linha
+        if status == "erro" and (not METADADOS_ATIVO or not metadados.erro_vencido(verificado_em)):
+            raise HTTPException(status_code=502, detail=f"Não foi possível ler o zip: {erro}")
+        if not METADADOS_ATIVO:
+            raise HTTPException(status_code=404, detail="Listagem não disponível")
+        try:
+            await enriquecedor.garantir(jogo_id)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Não foi possível ler o zip: {e!r}")
+        if not os.path.exists(path):
+            raise HTTPException(status_code=502, detail="Não foi possível ler o zip")
+
+    # mtime no ETag: reinspeção do mesmo link (zip trocado no upstream) muda a tag
+    st = os.stat(path)
+    etag = f'"files-{jogo_id}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if catalogo.etag_bate(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    if catalogo.codificacao(request.headers.get("accept-encoding"), ("gzip",)) == "gzip":
+        headers["ETag"] = catalogo.etag_codificado(etag, "gzip")
+        headers["Content-Encoding"] = "gzip"
+        return FileResponse(path, media_type="application/json", headers=headers)
+    headers["ETag"] = etag
+    # cliente sem gzip (raro): descompacta fora do event loop
+    body = await run_in_threadpool(metadados.ler_listagem, path)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/admin/jogos/{jogo_id}/metadados")
+def reprocessar_metadados(jogo_id: int):
+    if not METADADOS_ATIVO:
+        raise HTTPException(status_code=400, detail="METADADOS_ATIVO desligado")
+    enriquecedor.agendar(jogo_id)
+    return {"message": "Metadados agendados"}
+
+@app.post("/admin/publicar_catalogo")
+def publicar_catalogo():
+    # publica agora (sem esperar o próximo ciclo); reescreve mesmo sem mudança
+    if not publicador:
+        raise HTTPException(status_code=400, detail="CATALOGO_PUBLICAR_DIR não configurado")
+    versao = publicador.publicar(forcar=True)
+    return {"message": "Catálogo publicado", "versao": versao}
+
+
+# ================================
+# ROTAS - CATÁLOGO PÚBLICO
+# ================================
+@app.get("/jogos")
+async def catalogo_jogos(
+    request: Request,
+    fields: str | None = None,   # ex.: id,nome,capa_thumb
+    genero: list[str] = Query([]),   # ?genero=RPG&genero=Ação -> jogos com os dois
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    campos = catalogo.interpretar_campos(fields)
+    chaves = generos.chaves_filtro(genero)
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    accept_encoding = request.headers.get("accept-encoding")
+
+    if not chaves:
+        # catálogo inteiro: bytes prontos do snapshot em memória
+        variante = await snapshot.obter(db, campos)
+        if catalogo.etag_bate(if_none_match, variante.etag):
+            return Response(status_code=304, headers={**headers, "ETag": variante.etag})
+        body, encoding = variante.corpo(accept_encoding)
+        headers["ETag"] = catalogo.etag_codificado(variante.etag, encoding)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    versao = await catalogo.versao_atual(db)
+    tag = catalogo.etag(versao, campos, chaves)
+    if catalogo.etag_bate(if_none_match, tag):
+        return Response(status_code=304, headers={**headers, "ETag": tag})
+
+    # mesma transação de leitura da versão: ETag e conteúdo batem
+    async def carregar():
+        q = (
+            select(*catalogo.colunas(campos))
+            .where(models.Game.id.in_(generos.jogos_com_todos(chaves)))
+            .order_by(models.Game.id)
+        )
+        rows = (await db.execute(q)).all()
+        por_jogo = await generos.por_jogo(db, versao) if "genero" in campos else None
+        return [catalogo.projetar(r, campos, por_jogo) for r in rows]
+
+    # interseção de facetas: guardada até a próxima alteração do catálogo
+    jogos = await generos.facetas.obter(versao, ("jogos", campos, chaves), carregar)
+    body = serializar(versao, jogos)
+
+    body, encoding = catalogo.comprimir(body, accept_encoding)
+    headers["ETag"] = catalogo.etag_codificado(tag, encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/jogos/busca")
+async def buscar_jogos(
+    q: str,
+    limit: int | None = None,
+    after: str | None = None,   # "next" da página anterior
+    fields: str | None = None,   # mesma projeção do /jogos
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    palavras = busca.termos(q)
+    if not palavras:
+        return {"jogos": [], "next": None}
+
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit deve ser >= 1")
+    limit = min(limit or busca.BUSCA_LIMIT_PADRAO, busca.BUSCA_LIMIT_MAXIMO)
+
+    # cursor (rank, id): continua do último item, na mesma ordem de relevância
+    depois = paginacao.decodificar_cursor(after, float, int)
+    campos = catalogo.interpretar_campos(fields)
+    rows = (await db.execute(busca.consulta(catalogo.colunas(campos), palavras, limit + 1, depois))).all()
+    rows, proximo = paginacao.pagina(rows, limit, lambda r: paginacao.codificar_cursor(r.rank, r.id))
+    por_jogo = await generos.por_jogo(db, await catalogo.versao_atual(db)) if "genero" in campos else None
+    return {"jogos": [catalogo.projetar(r, campos, por_jogo) for r in rows], "next": proximo}
+
+
+@app.get("/jogos/sync")
+async def sincronizar_catalogo(
+    since: int,
+    fields: str | None = None,   # mesma projeção do /jogos (id sempre vai)
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Só o que mudou desde a versão `since` da cópia local do cliente.
+    """
+    campos = catalogo.interpretar_campos(fields)
+    if "id" not in campos:
+        campos = ("id",) + campos
+    return await catalogo_sync.mudancas(db, since, campos)
+
+
+@app.get("/jogos/generos")
+async def contagem_generos(
+    genero: list[str] = Query([]),   # seleção atual do menu
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Quantos jogos cada gênero tem dentro da seleção (interseção) atual.
+    """
+    chaves = generos.chaves_filtro(genero)
+    versao = await catalogo.versao_atual(db)
+    return {"versao": versao, "generos": await generos.contagens(db, versao, chaves)}
+
+
+@app.get("/jogos/{jogo_id}/capa")
+async def capa_jogo(
+    request: Request,
+    jogo_id: int,
+    w: int | None = None,
+    h: int | None = None,
+    v: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    result = await db.execute(
+        select(models.Game.capa_url, models.Game.capa_hash, models.Game.capa_tipo)
+        .where(models.Game.id == jogo_id)
+    )
+    jogo = result.first()
+    if not jogo or not (jogo.capa_hash or jogo.capa_url):
+        raise HTTPException(status_code=404, detail="Capa não encontrada")
+
+    if not jogo.capa_hash:
+        # capa externa (URL colada no painel)
+        if jogo.capa_url.startswith(("http://", "https://")):
+            return RedirectResponse(jogo.capa_url, status_code=302)
+        raise HTTPException(status_code=404, detail="Capa não encontrada")
+
+    versao = jogo.capa_hash[:16]   # mesmo v de capas.url
+    if v == versao:
+        # URL leva o hash do conteúdo: pode ficar no cache para sempre
+        headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    else:
+        # sem ?v= ou com o de uma capa antiga: a mesma URL vai mudar de
+        # conteúdo quando a capa for trocada, então revalida pelo ETag
+        headers = {"Cache-Control": "no-cache"}
+    formato = None
+    if w or h:
+        if (w, h) not in capas.CAPAS_TAMANHOS:
+            aceitos = [f"{a}x{b}" for a, b in capas.CAPAS_TAMANHOS]
+            raise HTTPException(status_code=400, detail=f"Tamanho inválido. Aceitos: {aceitos}")
+        formato = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        headers["Vary"] = "Accept"
+    headers["ETag"] = f'"capa-{versao}-{w or 0}x{h or 0}-{formato or "original"}"'
+    if catalogo.etag_bate(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if formato:
+        path, mime = await run_in_threadpool(capas.miniatura, jogo.capa_hash, jogo.capa_tipo, w, h, formato)
+    else:
+        path, mime = capas.caminho_original(jogo.capa_hash, jogo.capa_tipo), jogo.capa_tipo
+
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Capa não encontrada")
+    return FileResponse(path, media_type=mime, headers=headers)
+
 # ================================
 # ROTAS - TOKENS
 # ================================
-durations = {
-    "Teste Gratuito": timedelta(hours=3),
-    "Mensal": timedelta(days=30),
-    "Trimestral": timedelta(days=90),
-    "Anual": timedelta(days=365),
-    "Permanente": None
-}
+# criar_token devolve JSON: limite baixo; lotes grandes vão para criar_tokens_lote
+CRIAR_TOKEN_MAX = int(os.getenv("CRIAR_TOKEN_MAX", "1000"))
+
+durations = crud.durations  # tipo de plano -> duração (None = permanente)
 
 @app.get("/admin/listar_tokens")
-def listar_tokens(db: Session = Depends(get_db)):
-    tokens = db.query(TokenDB).order_by(TokenDB.created_at.desc()).all()
+async def listar_tokens(
+    after: str | None = None,
+    limit: int | None = None,
+    type: str | None = None,
+    active: bool | None = None,
+    expirado: bool | None = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    now = datetime.utcnow()
+    limit = paginacao.limitar(limit)
+
+    # ordem estável: created_at desc, desempate pelo próprio token
+    cursor = paginacao.decodificar_cursor(after, datetime, str)
+    q = crud.consulta_tokens(now, cursor, type, active, expirado).limit(limit + 1)
+    rows = (await db.execute(q)).all()
+    rows, proximo = paginacao.pagina(
+        rows, limit, lambda r: paginacao.codificar_cursor(r.TokenDB.created_at, r.TokenDB.token)
+    )
 
     return {
         "tokens": [
@@ -339,10 +818,12 @@ def listar_tokens(db: Session = Depends(get_db)):
                 "expires_at": t.expires_at.isoformat() if t.expires_at else None,
                 "activated_at": t.activated_at.isoformat() if t.activated_at else None,
                 "user_id": t.user_id,
-                "active": t.active
+                "active": t.active,
+                "status": status
             }
-            for t in tokens
-        ]
+            for t, status in rows
+        ],
+        "next": proximo
     }
 
 
@@ -350,77 +831,214 @@ from fastapi import Body
 
 
 @app.post("/admin/criar_token")
-def criar_token(request: TokenRequest = Body(...), db: Session = Depends(get_db)):
-    print("CRIA_TOKEN ✅ MAIN.PY - type:", request.type)
-
+def criar_token(request: TokenRequest = Body(...)):
     if request.type not in durations:
         raise HTTPException(
             status_code=400,
             detail=f"Tipo inválido: {request.type}. Aceitos: {list(durations.keys())}"
         )
 
-    qtd = 10
-    tokens_criados = []
-    now = datetime.utcnow()
-    dur = durations[request.type]  # ✅ garante que é timedelta ou None
-
-    for _ in range(qtd):
-        token_str = str(uuid.uuid4())
-        expiration = None
-
-        db.add(TokenDB(
-            token=token_str,
-            type=request.type,
-            created_at=now,
-            expires_at=None,
-            active=False
-        ))
+    qtd = request.quantidade
+    if not 1 <= qtd <= CRIAR_TOKEN_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"quantidade deve estar entre 1 e {CRIAR_TOKEN_MAX} (lotes maiores: /admin/criar_tokens_lote)"
+        )
 
-        tokens_criados.append({
-            "token": token_str,
-            "type": request.type,
-            "expires_at": expiration.isoformat() if expiration else None
-        })
+    lote = tokens_lote.Lote(request.type, qtd)
+    lote.inserir(engine)
 
-    db.commit()
+    tokens_criados = [
+        {"token": t, "type": request.type, "expires_at": None}
+        for t in lote.tokens()
+    ]
     return {"tokens": tokens_criados, "count": len(tokens_criados)}
 
 
+@app.post("/admin/criar_tokens_lote")
+def criar_tokens_lote(request: TokenLoteRequest = Body(...)):
+    """
+    Gera `quantidade` tokens numa transação e devolve em streaming
+    (CSV ou NDJSON), sem montar um JSON gigante em memória.
+    """
+    if request.type not in durations:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo inválido: {request.type}. Aceitos: {list(durations.keys())}"
+        )
+    if not 1 <= request.quantidade <= tokens_lote.TOKEN_LOTE_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"quantidade deve estar entre 1 e {tokens_lote.TOKEN_LOTE_MAX}"
+        )
+    formato = request.formato.lower()
+    if formato not in tokens_lote.FORMATOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato inválido: {request.formato}. Aceitos: {list(tokens_lote.FORMATOS)}"
+        )
+
+    lote = tokens_lote.Lote(request.type, request.quantidade)
+    lote.inserir(engine)
+
+    return StreamingResponse(
+        lote.exportar(formato),
+        media_type=tokens_lote.FORMATOS[formato],
+        headers={
+            "Content-Disposition": f"attachment; filename=tokens_{lote.quantidade}.{formato}",
+            "X-Tokens-Count": str(lote.quantidade),
+        },
+    )
+
+
 
 # ================================
 # ROTAS - DOWNLOAD DE JOGOS
 # ================================
-@app.get("/jogos/{jogo_id}/download")
-def baixar_jogo(
+async def _jogo_para_download(jogo_id: int, user_id: int):
+    async with AsyncReadSessionLocal() as db:
+        # 🔐 valida plano
+        if not await usuario_tem_plano_ativo_async(user_id, db):
+            raise HTTPException(
+                status_code=403,
+                detail="Usuário sem plano ativo"
+            )
+
+        # + ETag da última inspeção do mesmo link (zip trocado -> reinspeciona)
+        result = await db.execute(
+            select(models.Game.nome, models.Game.dropbox_token, models.JogoArquivo.etag)
+            .outerjoin(models.JogoArquivo, and_(
+                models.JogoArquivo.jogo_id == models.Game.id,
+                models.JogoArquivo.fonte == models.Game.dropbox_token,
+            ))
+            .where(models.Game.id == jogo_id)
+        )
+        jogo = result.first()
+        if not jogo:
+            raise HTTPException(status_code=404, detail="Jogo não encontrado")
+
+        return jogo.nome, jogo.dropbox_token, jogo.etag
+
+
+@app.api_route("/jogos/{jogo_id}/download", methods=["GET", "HEAD"])
+async def baixar_jogo(
+    request: Request,
     jogo_id: int,
     user_id: int,   # ← obrigatório
-    db: Session = Depends(get_db)
+    modo: str | None = None,
 ):
-    # 🔐 valida plano
-    if not usuario_tem_plano_ativo(user_id, db):
-        raise HTTPException(
-            status_code=403,
-            detail="Usuário sem plano ativo"
-        )
+    modo = modo or DOWNLOAD_MODE
+    if modo not in DOWNLOAD_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo inválido: {modo}. Aceitos: {list(DOWNLOAD_MODES)}")
 
-    jogo = db.query(models.Game).filter(models.Game.id == jogo_id).first()
-    if not jogo:
-        raise HTTPException(status_code=404, detail="Jogo não encontrado")
+    nome, link, etag_inspecionado = await _jogo_para_download(jogo_id, user_id)
 
     try:
-        r = requests.get(jogo.dropbox_token, stream=True)
-        r.raise_for_status()
+        url = await resolver_link_download(link)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
 
+    if modo == "redirect" and DOWNLOAD_MODE == "redirect" and link.startswith("/"):
+        # plano já validado: o cliente baixa direto do upstream, sem passar pelo servidor
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+
+    # Range / If-Range são repassados ao upstream (retomar download, download em partes)
+    try:
+        rng = upstream.interpretar_range(request.headers.get("range"))
+    except upstream.RangeInvalido as e:
+        raise HTTPException(status_code=416, detail=str(e))
+
+    # 💾 cache em disco: se o arquivo (mesmo ETag/tamanho) já está local, serve do disco
+    cache = download_cache.cache
+    chave = None
+    if cache.ativo:
+        try:
+            etag, tamanho = await cache.metadados(jogo_id, url)
+        except httpx.HTTPError:
+            etag, tamanho = None, 0
+
+        enriquecedor.conferir_etag(jogo_id, etag_inspecionado, etag)
+        if etag and tamanho:
+            chave = cache.chave(jogo_id, etag, tamanho)
+            path = cache.procurar(chave)
+            if path:
+                if request.method != "HEAD":
+                    cache.contar_servido(download_cache.bytes_do_range(rng, tamanho))
+                return FileResponse(
+                    path,
+                    media_type="application/octet-stream",
+                    headers={
+                        "Content-Disposition": f"attachment; filename={nome}.zip",
+                        "ETag": etag,
+                    }
+                )
+
+    # 🔀 downloads completos simultâneos do mesmo arquivo compartilham uma conexão
+    #    (None: sem spill, fora do orçamento de disco -> proxy simples abaixo)
+    voo = None
+    if request.method == "GET" and not rng and (DOWNLOAD_COALESCE or chave):
+        try:
+            voo = await coalescedor.transmissao(
+                chave or coalescedor.chave_por_url(jogo_id, url), url, cacheavel=chave is not None
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Tempo esgotado ao conectar no servidor de arquivos")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    if voo is not None:
+        t, corpo = voo
+        if corpo is None:
+            raise HTTPException(status_code=502, detail=f"Servidor de arquivos respondeu {t.status_code}")
+
+        enriquecedor.conferir_etag(jogo_id, etag_inspecionado, t.headers.get("Etag"))
+        headers = dict(t.headers)
+        headers["Content-Disposition"] = f"attachment; filename={nome}.zip"
         return StreamingResponse(
-            r.iter_content(chunk_size=1024*1024),
+            corpo,
             media_type="application/octet-stream",
-            headers={
-                "Content-Disposition": f"attachment; filename={jogo.nome}.zip"
-            }
+            headers=headers
         )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    fwd = {}
+    if rng:
+        fwd["Range"] = rng
+        if request.headers.get("if-range"):
+            fwd["If-Range"] = request.headers["if-range"]
+
+    try:
+        r = await upstream.abrir_stream(url, headers=fwd, method=request.method)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao conectar no servidor de arquivos")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    if r.status_code == 416:
+        await r.aclose()
+        headers = {}
+        if r.headers.get("content-range"):
+            headers["Content-Range"] = r.headers["content-range"]
+        raise HTTPException(status_code=416, detail="Intervalo fora do arquivo", headers=headers)
+
+    if r.status_code >= 400:
+        await r.aclose()
+        raise HTTPException(status_code=502, detail=f"Servidor de arquivos respondeu {r.status_code}")
+
+    headers = upstream.headers_de_resposta(r)
+    enriquecedor.conferir_etag(jogo_id, etag_inspecionado, headers.get("Etag"))
+    headers["Content-Disposition"] = f"attachment; filename={nome}.zip"
+    status_code = 206 if r.status_code == 206 else 200
+
+    if request.method == "HEAD":
+        await r.aclose()
+        return Response(status_code=status_code, headers=headers, media_type="application/octet-stream")
+
+    return StreamingResponse(
+        upstream.iterar_e_fechar(r),
+        status_code=status_code,
+        media_type="application/octet-stream",
+        headers=headers
+    )
 
 
 
@@ -444,33 +1062,18 @@ def ativar_token_servico(token: str, user_id: int, db: Session = Depends(get_db)
 
 
 @app.post("/token/ativar")
-def ativar_token(data: TokenActivateRequest, db: Session = Depends(get_db)):
-    token_db = db.query(TokenDB).filter(TokenDB.token == data.token).first()
-
-    if not token_db:
-        raise HTTPException(status_code=404, detail="Token inválido")
+async def ativar_token(data: TokenActivateRequest, db: AsyncSession = Depends(get_async_db)):
+    # UPDATE condicional: checagem e ativação numa única instrução (sem corrida)
+    ativado, motivo = await crud.ativar_token_async(db, data.token, data.user_id)
 
-    if token_db.active:
-        raise HTTPException(status_code=400, detail="Token já utilizado")
-
-    if token_db.expires_at and token_db.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="Token expirado")
-
-    # Marca token como usado
-    now = datetime.utcnow()
-    dur = durations.get(token_db.type)
-
-    token_db.active = True
-    token_db.activated_at = now
-    token_db.user_id = data.user_id
-
-    if dur:
-        token_db.expires_at = now + dur
+    if not ativado:
+        status_code, detail = crud.FALHAS_ATIVACAO[motivo]
+        raise HTTPException(status_code=status_code, detail=detail)
 
-    db.commit()
+    planos.invalidar(data.user_id)
 
     return {
         "message": "Token ativado com sucesso",
-        "plano": token_db.type,
-        "expires_at": token_db.expires_at
+        "plano": ativado.type,
+        "expires_at": ativado.expires_at
     }
@@ -0,0 +1,182 @@
+# app/manutencao.py
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete, insert, or_, literal, func
+
+from app.database import engine, IS_SQLITE
+from app.models import TokenDB, TokenArchive, GameChange, CatalogoVersao
+
+# ================================
+# MANUTENÇÃO EM SEGUNDO PLANO
+# ================================
+# Roda dentro do app, de tempos em tempos:
+# - marca tokens cujo plano venceu (tokens.expirado), em lotes
+# - move para tokens_archive os tokens usados que venceram há mais de
+#   TOKEN_ARQUIVO_DIAS dias (a tabela "tokens" fica só com o que importa)
+# - compacta game_changes (log do /jogos/sync) mais antigo que GAME_CHANGES_DIAS
+# - SQLite: PRAGMA optimize (ANALYZE quando precisa) e incremental_vacuum;
+#   Postgres: ANALYZE (o vacuum fica com o autovacuum)
+#
+# Cada lote é uma transação curta: a conexão escritora nunca fica presa por
+# muito tempo e as ativações de token não esperam a varredura inteira.
+MANUTENCAO_INTERVALO = float(os.getenv("MANUTENCAO_INTERVALO", "600"))   # 0 = desligada
+MANUTENCAO_OTIMIZAR_INTERVALO = float(os.getenv("MANUTENCAO_OTIMIZAR_INTERVALO", str(6 * 3600)))
+TOKEN_SWEEP_LOTE = int(os.getenv("TOKEN_SWEEP_LOTE", "1000"))
+TOKEN_ARQUIVO_DIAS = int(os.getenv("TOKEN_ARQUIVO_DIAS", "30"))   # 0 = não arquiva
+GAME_CHANGES_DIAS = int(os.getenv("GAME_CHANGES_DIAS", "90"))   # 0 = não compacta
+SQLITE_VACUUM_PAGINAS = int(os.getenv("SQLITE_VACUUM_PAGINAS", "2000"))
+
+_COLUNAS_ARQUIVO = ("token", "type", "active", "created_at", "activated_at", "expires_at", "user_id")
+
+
+def consulta_vencidos(now: datetime):
+    # tokens usados com plano vencido e ainda não marcados (ix_tokens_expiracao_ativos)
+    return select(TokenDB.token).where(
+        TokenDB.active == True,
+        TokenDB.expires_at < now,
+        or_(TokenDB.expirado.is_(None), TokenDB.expirado == False),
+    )
+
+
+def consulta_arquivaveis(limite: datetime):
+    # tokens usados que venceram antes de `limite` (ix_tokens_expiracao_ativos)
+    return select(TokenDB.token).where(TokenDB.active == True, TokenDB.expires_at < limite)
+
+
+class Manutencao:
+    def __init__(self):
+        self.marcados = 0
+        self.arquivados = 0
+        self.mudancas_compactadas = 0
+        self.otimizacoes = 0
+        self.paginas_liberadas = 0
+        self.erros = 0
+        self.ultima_varredura: datetime | None = None
+        self.ultima_otimizacao: datetime | None = None
+        self.duracao_ultima = 0.0
+
+    # ---------- tokens ----------
+    def marcar_vencidos(self, now: datetime) -> int:
+        total = 0
+        while True:
+            lote = consulta_vencidos(now).limit(TOKEN_SWEEP_LOTE).scalar_subquery()
+            with engine.begin() as conn:
+                n = conn.execute(
+                    update(TokenDB).where(TokenDB.token.in_(lote)).values(expirado=True)
+                ).rowcount
+            total += n
+            if n < TOKEN_SWEEP_LOTE:
+                return total
+
+    def arquivar(self, now: datetime) -> int:
+        if TOKEN_ARQUIVO_DIAS <= 0:
+            return 0
+        limite = now - timedelta(days=TOKEN_ARQUIVO_DIAS)
+        cols = [TokenDB.__table__.c[c] for c in _COLUNAS_ARQUIVO]
+
+        total = 0
+        while True:
+            with engine.begin() as conn:
+                tokens = conn.execute(
+                    consulta_arquivaveis(limite).limit(TOKEN_SWEEP_LOTE)
+                ).scalars().all()
+                if not tokens:
+                    return total
+
+                # copia e apaga na mesma transação: o token nunca some das duas tabelas
+                conn.execute(
+                    insert(TokenArchive).from_select(
+                        list(_COLUNAS_ARQUIVO) + ["archived_at"],
+                        select(*cols, literal(now)).where(TokenDB.token.in_(tokens)),
+                    )
+                )
+                conn.execute(delete(TokenDB).where(TokenDB.token.in_(tokens)))
+            total += len(tokens)
+            if len(tokens) < TOKEN_SWEEP_LOTE:
+                return total
+
+    # ---------- log do catálogo ----------
+    def compactar_mudancas(self, now: datetime) -> int:
+        if GAME_CHANGES_DIAS <= 0:
+            return 0
+        limite = now - timedelta(days=GAME_CHANGES_DIAS)
+        with engine.begin() as conn:
+            corte = conn.execute(
+                select(func.max(GameChange.versao)).where(GameChange.criado_em < limite)
+            ).scalar()
+            if corte is None:
+                return 0
+            n = conn.execute(delete(GameChange).where(GameChange.versao <= corte)).rowcount
+            # cliente com versão anterior ao corte passa a receber resync
+            conn.execute(
+                update(CatalogoVersao)
+                .where(CatalogoVersao.id == 1, or_(CatalogoVersao.log_desde.is_(None), CatalogoVersao.log_desde < corte))
+                .values(log_desde=corte)
+            )
+        return n
+
+    # ---------- banco ----------
+    def otimizar(self):
+        with engine.connect() as conn:
+            if IS_SQLITE:
+                conn.exec_driver_sql("PRAGMA optimize")
+                # só funciona com auto_vacuum=INCREMENTAL (bancos criados depois
+                # desta versão; bancos antigos precisam de um VACUUM manual)
+                if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+                    livres = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+                    conn.exec_driver_sql(f"PRAGMA incremental_vacuum({SQLITE_VACUUM_PAGINAS})")
+                    self.paginas_liberadas += min(livres, SQLITE_VACUUM_PAGINAS)
+            else:
+                conn.exec_driver_sql("ANALYZE tokens")
+                conn.exec_driver_sql("ANALYZE users")
+            conn.commit()
+        self.otimizacoes += 1
+        self.ultima_otimizacao = datetime.utcnow()
+
+    def varrer(self, otimizar: bool = False):
+        inicio = time.monotonic()
+        now = datetime.utcnow()
+        self.marcados += self.marcar_vencidos(now)
+        self.arquivados += self.arquivar(now)
+        self.mudancas_compactadas += self.compactar_mudancas(now)
+        if otimizar:
+            self.otimizar()
+        self.ultima_varredura = now
+        self.duracao_ultima = time.monotonic() - inicio
+
+    async def loop(self):
+        """
+        Tarefa de fundo: varre a cada MANUTENCAO_INTERVALO e otimiza o banco
+        a cada MANUTENCAO_OTIMIZAR_INTERVALO.
+        """
+        ultima_otimizacao = time.monotonic()
+        while True:
+            otimizar = time.monotonic() - ultima_otimizacao >= MANUTENCAO_OTIMIZAR_INTERVALO
+            try:
+                await run_in_threadpool(self.varrer, otimizar)
+                if otimizar:
+                    ultima_otimizacao = time.monotonic()
+            except Exception as e:
+                self.erros += 1
+                print("⚠️ Manutenção falhou:", repr(e))
+            await asyncio.sleep(MANUTENCAO_INTERVALO)
+
+    def stats(self) -> dict:
+        return {
+            "tokens_marcados_expirados": self.marcados,
+            "tokens_arquivados": self.arquivados,
+            "mudancas_catalogo_compactadas": self.mudancas_compactadas,
+            "otimizacoes": self.otimizacoes,
+            "paginas_liberadas": self.paginas_liberadas,
+            "erros": self.erros,
+            "ultima_varredura": self.ultima_varredura.isoformat() if self.ultima_varredura else None,
+            "ultima_otimizacao": self.ultima_otimizacao.isoformat() if self.ultima_otimizacao else None,
+            "duracao_ultima_s": round(self.duracao_ultima, 3),
+        }
+
+
+manutencao = Manutencao()
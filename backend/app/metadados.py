@@ -0,0 +1,495 @@
+# app/metadados.py
+import io
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import zipfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, delete, update, and_, or_
+
+from app import models, upstream
+from app.database import SessionLocal
+from app.arquivos import gravar_atomico
+
+# ================================
+# METADADOS DO ARQUIVO DO JOGO (segundo plano)
+# ================================
+# Depois de adicionar/editar um jogo, uma tarefa de fundo olha o .zip no
+# upstream sem baixá-lo:
+# - HEAD: tamanho, ETag e content-type
+# - Range: só o fim do arquivo (EOCD) e o diretório central do zip, de onde
+#   saem a lista de arquivos, o tamanho descompactado e o .exe principal
+#   (mesma regra do find_main_exe do cliente)
+# - METADADOS_SHA256=1: lê o arquivo inteiro em streaming (cliente async
+#   compartilhado do upstream, no event loop) e guarda o SHA-256
+#
+# A leitura do zip (zipfile é síncrono) roda num executor próprio com
+# METADADOS_CONCORRENCIA threads: não ocupa o threadpool das rotas.
+#
+# O resultado fica em jogos_arquivo. O cliente usa para checar espaço em
+# disco antes de baixar, mostrar progresso e conferir o download.
+#
+# A listagem completa do diretório central (/jogos/{id}/files) vai para
+# LISTAGENS_DIR já serializada e em gzip, um arquivo por jogo+link: servir é
+# mandar o arquivo, sem tocar no upstream nem montar JSON no pedido.
+#
+# Inspeção que falhou (link fora do ar, upstream instável) volta para a fila
+# depois de METADADOS_RETENTAR_ERRO segundos, contados de verificado_em.
+# Download que vê um ETag do upstream diferente do inspecionado (zip trocado
+# no mesmo link) agenda outra inspeção, no máximo uma por jogo a cada
+# METADADOS_REINSPECAO_MIN segundos.
+METADADOS_ATIVO = os.getenv("METADADOS_ATIVO", "1") == "1"
+METADADOS_SHA256 = os.getenv("METADADOS_SHA256", "0") == "1"
+METADADOS_CONCORRENCIA = int(os.getenv("METADADOS_CONCORRENCIA", "2"))
+METADADOS_RETENTAR_ERRO = float(os.getenv("METADADOS_RETENTAR_ERRO", "3600"))
+METADADOS_REINSPECAO_MIN = float(os.getenv("METADADOS_REINSPECAO_MIN", "300"))
+ZIP_CAUDA_BYTES = int(os.getenv("ZIP_CAUDA_BYTES", str(128 * 1024)))   # EOCD + comentário (até 64 KB)
+ZIP_DIRETORIO_MAX_BYTES = int(os.getenv("ZIP_DIRETORIO_MAX_BYTES", str(64 * 1024 * 1024)))
+LISTAGENS_DIR = os.getenv("LISTAGENS_DIR", os.path.join(os.getenv("DB_DIR", "/tmp/gameprime"), "listagens"))
+
+# uma linha por arquivo do zip, nesta ordem (offset = cabeçalho local)
+COLUNAS_LISTAGEM = ("path", "tamanho_compactado", "tamanho", "crc32", "offset", "metodo")
+
+# mesma regra do downloader do cliente (find_main_exe)
+EXE_IGNORAR_PREFIXOS = (
+    "unins", "uninstall", "setup", "installer", "install",
+    "vcredist", "dxsetup", "crashreport", "ucrt", "unitycrashhandler",
+)
+EXE_IGNORAR = {"launcher.exe", "steam.exe", "epicgameslauncher.exe"}
+EXE_MIN_BYTES = 200 * 1024
+
+
+class ErroMetadados(Exception):
+    pass
+
+
+# ---------- leitura remota ----------
+class ArquivoRemoto(io.RawIOBase):
+    """
+    Arquivo somente-leitura sobre requisições Range: o zipfile faz seek/read
+    e só os trechos lidos saem da rede. O fim do arquivo (onde fica o
+    diretório central) é buscado uma vez e servido da memória.
+    """
+
+    def __init__(self, client: httpx.Client, url: str, tamanho: int):
+        self.client = client
+        self.url = url
+        self.tamanho = tamanho
+        self.pos = 0
+        self.requisicoes = 0
+        self.bytes_lidos = 0
+
+        inicio = max(0, tamanho - ZIP_CAUDA_BYTES)
+        self._cauda_inicio = inicio
+        self._cauda = self._buscar(inicio, tamanho - 1)
+
+    def _buscar(self, inicio: int, fim: int) -> bytes:
+        r = self.client.get(
+            self.url, headers={"Range": f"bytes={inicio}-{fim}", "Accept-Encoding": "identity"}
+        )
+        self.requisicoes += 1
+        if r.status_code == 200 and inicio == 0 and len(r.content) == self.tamanho:
+            dados = r.content[: fim + 1]   # arquivo pequeno: upstream mandou tudo
+        elif r.status_code == 206:
+            dados = r.content
+        else:
+            raise ErroMetadados(f"Upstream não aceitou Range (HTTP {r.status_code})")
+        if len(dados) != fim - inicio + 1:
+            raise ErroMetadados("Resposta Range com tamanho inesperado")
+        self.bytes_lidos += len(dados)
+        return dados
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = self.tamanho + offset
+        self.pos = max(0, self.pos)
+        return self.pos
+
+    def read(self, n: int = -1) -> bytes:
+        if self.pos >= self.tamanho:
+            return b""
+        fim = self.tamanho if n is None or n < 0 else min(self.tamanho, self.pos + n)
+        if fim - self.pos > ZIP_DIRETORIO_MAX_BYTES:
+            raise ErroMetadados("Leitura grande demais (o zip seria baixado inteiro)")
+        if self.pos >= self._cauda_inicio:
+            o = self.pos - self._cauda_inicio
+            dados = self._cauda[o: o + (fim - self.pos)]
+        else:
+            dados = self._buscar(self.pos, fim - 1)
+        self.pos += len(dados)
+        return dados
+
+    def readinto(self, b) -> int:
+        dados = self.read(len(b))
+        b[: len(dados)] = dados
+        return len(dados)
+
+
+def _tamanho_e_headers(client: httpx.Client, url: str):
+    r = client.head(url, headers={"Accept-Encoding": "identity"})
+    if r.status_code < 400 and r.headers.get("content-length"):
+        return int(r.headers["content-length"]), r.headers
+
+    # upstream sem HEAD: 1 byte via Range e o total vem no Content-Range
+    r = client.get(url, headers={"Range": "bytes=0-0", "Accept-Encoding": "identity"})
+    total = r.headers.get("content-range", "").rpartition("/")[2]
+    if r.status_code == 206 and total.isdigit():
+        return int(total), r.headers
+    raise ErroMetadados(f"Não foi possível descobrir o tamanho (HTTP {r.status_code})")
+
+
+def escolher_exe(entradas) -> str | None:
+    candidatos = []
+    for info in entradas:
+        nome = info.filename.rsplit("/", 1)[-1].lower()
+        if not nome.endswith(".exe") or nome in EXE_IGNORAR:
+            continue
+        if any(nome.startswith(p) for p in EXE_IGNORAR_PREFIXOS) or info.file_size < EXE_MIN_BYTES:
+            continue
+        candidatos.append((info.file_size, info.filename))
+    return max(candidatos)[1] if candidatos else None
+
+
+async def sha256_remoto(url: str) -> str:
+    # arquivo inteiro (pode levar horas num zip de vários GB): fica no event
+    # loop, esperando rede, sem prender thread nenhuma
+    h = hashlib.sha256()
+    r = await upstream.abrir_stream(url)
+    try:
+        r.raise_for_status()
+        async for chunk in r.aiter_raw(upstream.DOWNLOAD_CHUNK_SIZE):
+            h.update(chunk)
+    finally:
+        await r.aclose()
+    return h.hexdigest()
+
+
+def inspecionar(url: str) -> dict:
+    """
+    Metadados do .zip em `url` (bloqueante: rodar no executor de metadados).
+    O SHA-256 é calculado à parte (sha256_remoto).
+    """
+    timeout = httpx.Timeout(
+        connect=upstream.UPSTREAM_CONNECT_TIMEOUT, read=upstream.UPSTREAM_READ_TIMEOUT,
+        write=upstream.UPSTREAM_READ_TIMEOUT, pool=upstream.UPSTREAM_POOL_TIMEOUT,
+    )
+    with httpx.Client(timeout=timeout, follow_redirects=True) as client:
+        tamanho, headers = _tamanho_e_headers(client, url)
+        info = {
+            "tamanho": tamanho,
+            "etag": headers.get("etag"),
+            "content_type": (headers.get("content-type") or "").split(";")[0].strip() or None,
+        }
+        if tamanho == 0:
+            raise ErroMetadados("Arquivo vazio")
+
+        remoto = ArquivoRemoto(client, url, tamanho)
+        try:
+            with zipfile.ZipFile(remoto) as zf:
+                entradas = [e for e in zf.infolist() if not e.is_dir()]
+        except zipfile.BadZipFile as e:
+            raise ErroMetadados(f"Não é um zip válido: {e}")
+
+        info["arquivos"] = len(entradas)
+        info["tamanho_descompactado"] = sum(e.file_size for e in entradas)
+        info["exe_principal"] = escolher_exe(entradas)
+        info["_requisicoes"] = remoto.requisicoes
+        info["_listagem"] = serializar_listagem(entradas)
+        return info
+
+
+# ---------- listagem (/jogos/{id}/files) ----------
+def serializar_listagem(entradas) -> bytes:
+    # linhas em vez de objetos: 100k entradas sem repetir as chaves
+    body = json.dumps({
+        "colunas": COLUNAS_LISTAGEM,
+        "arquivos": [
+            [e.filename, e.compress_size, e.file_size, e.CRC, e.header_offset, e.compress_type]
+            for e in entradas
+        ],
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def caminho_listagem(jogo_id: int, fonte: str) -> str:
+    # link no nome: jogo editado nunca serve a listagem do zip antigo
+    h = hashlib.sha1(fonte.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(LISTAGENS_DIR, f"{jogo_id}-{h}.json.gz")
+
+
+def _gravar_listagem(jogo_id: int, fonte: str, dados: bytes):
+    os.makedirs(LISTAGENS_DIR, exist_ok=True)
+    path = caminho_listagem(jogo_id, fonte)
+    gravar_atomico(path, dados)
+    _remover_listagens(jogo_id, manter=os.path.basename(path))
+
+
+def ler_listagem(path: str) -> bytes:
+    # JSON descompactado, para cliente sem gzip
+    with gzip.open(path, "rb") as f:
+        return f.read()
+
+
+def _remover_listagens(jogo_id: int, manter: str | None = None):
+    try:
+        nomes = os.listdir(LISTAGENS_DIR)
+    except OSError:
+        return
+    for nome in nomes:
+        if nome.startswith(f"{jogo_id}-") and nome.endswith(".json.gz") and nome != manter:
+            try:
+                os.remove(os.path.join(LISTAGENS_DIR, nome))
+            except OSError:
+                pass
+
+
+# ---------- fila de fundo ----------
+def _novo_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max(1, METADADOS_CONCORRENCIA), thread_name_prefix="metadados")
+
+
+class Enriquecedor:
+    def __init__(self):
+        self._fila: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pendentes = set()
+        self._tarefas = []
+        self._em_andamento = {}   # jogo_id -> Task (garantir)
+        self._etag_conferido = {}  # jogo_id -> quando agendou por ETag diferente (monotonic)
+        self._executor = _novo_executor()
+
+        self.processados = 0
+        self.erros = 0
+        self.descartados = 0
+        self.requisicoes_range = 0
+        self.etags_mudados = 0
+
+    def iniciar(self, resolver_url):
+        """
+        Sobe os workers (no startup). resolver_url(dropbox_token) -> URL baixável.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._fila = asyncio.Queue()
+        self._resolver_url = resolver_url
+        self._tarefas = [asyncio.create_task(self._worker()) for _ in range(max(1, METADADOS_CONCORRENCIA))]
+        self._tarefas.append(asyncio.create_task(self._retentar_erros()))
+
+    def parar(self):
+        for t in self._tarefas:
+            t.cancel()
+        self._tarefas = []
+        # zip em leitura termina sozinho; o que estava na fila do executor cai.
+        # Threads só nascem no primeiro uso, então o novo executor não custa nada.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = _novo_executor()
+
+    def agendar(self, jogo_id: int):
+        # chamado das rotas admin (threadpool) depois do commit
+        if self._loop is None or jogo_id in self._pendentes:
+            return
+        self._pendentes.add(jogo_id)
+        self._loop.call_soon_threadsafe(self._fila.put_nowait, jogo_id)
+
+    def conferir_etag(self, jogo_id: int, inspecionado: str | None, upstream_etag: str | None):
+        """
+        Chamado no download com o ETag que o upstream mandou agora. Mesmo
+        critério da chave do download_cache: ETag diferente = outro arquivo.
+        """
+        if not inspecionado or not upstream_etag or inspecionado == upstream_etag:
+            return
+        agora = time.monotonic()
+        if agora - self._etag_conferido.get(jogo_id, -METADADOS_REINSPECAO_MIN) < METADADOS_REINSPECAO_MIN:
+            return
+        self._etag_conferido[jogo_id] = agora
+        self.etags_mudados += 1
+        self.agendar(jogo_id)
+
+    def pendentes_no_banco(self) -> list:
+        # sem metadados, com metadados de outro link (jogo editado) ou com
+        # erro há mais de METADADOS_RETENTAR_ERRO
+        a = models.JogoArquivo
+        limite = _limite_erro()
+        with SessionLocal() as db:
+            return db.execute(
+                select(models.Game.id)
+                .outerjoin(a, a.jogo_id == models.Game.id)
+                .where(or_(
+                    a.jogo_id.is_(None),
+                    a.fonte != models.Game.dropbox_token,
+                    and_(a.status == "erro", a.verificado_em < limite),
+                ))
+                .order_by(models.Game.id)
+            ).scalars().all()
+
+    async def _retentar_erros(self):
+        while True:
+            await asyncio.sleep(max(60.0, METADADOS_RETENTAR_ERRO / 4))
+            try:
+                for jogo_id in await run_in_threadpool(self.pendentes_no_banco):
+                    self.agendar(jogo_id)
+            except Exception as e:
+                print("⚠️ Varredura de metadados falhou:", repr(e))
+
+    async def _worker(self):
+        while True:
+            jogo_id = await self._fila.get()
+            self._pendentes.discard(jogo_id)
+            try:
+                await self.garantir(jogo_id)
+            except Exception as e:
+                self.erros += 1
+                print(f"⚠️ Metadados do jogo {jogo_id} falharam:", repr(e))
+
+    async def garantir(self, jogo_id: int):
+        """
+        Inspeciona o jogo e espera. Fila e pedidos de /files (que não esperam a
+        fila chegar no jogo) do mesmo jogo compartilham a mesma inspeção.
+        """
+        tarefa = self._em_andamento.get(jogo_id)
+        if tarefa is None:
+            tarefa = asyncio.create_task(self.processar(jogo_id))
+            self._em_andamento[jogo_id] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(jogo_id, None))
+        await asyncio.shield(tarefa)
+
+    async def processar(self, jogo_id: int):
+        fonte = await run_in_threadpool(_fonte_atual, jogo_id)
+        if fonte is None:
+            return   # jogo apagado
+        url = None
+        try:
+            url = await self._resolver_url(fonte)
+            info = await asyncio.get_running_loop().run_in_executor(self._executor, inspecionar, url)
+            self.requisicoes_range += info.pop("_requisicoes", 0)
+            status, erro = "ok", None
+        except Exception as e:
+            # qualquer falha (link, upstream, zip) fica registrada só neste jogo
+            info, status, erro = {}, "erro", str(e)[:300] or e.__class__.__name__
+            self.erros += 1
+            if not isinstance(e, (ErroMetadados, httpx.HTTPError)):
+                print(f"⚠️ Metadados do jogo {jogo_id} falharam:", repr(e))
+        if not await run_in_threadpool(_gravar, jogo_id, fonte, status, erro, info):
+            self.descartados += 1
+            return
+        self.processados += 1
+
+        # tamanho/lista já estão gravados; o SHA-256 (download inteiro) vem depois
+        if status == "ok" and METADADOS_SHA256:
+            try:
+                sha = await sha256_remoto(url)
+            except Exception as e:
+                self.erros += 1
+                print(f"⚠️ SHA-256 do jogo {jogo_id} falhou:", repr(e))
+                return
+            await run_in_threadpool(_gravar_sha256, jogo_id, fonte, sha)
+
+    def stats(self) -> dict:
+        return {
+            "ativo": METADADOS_ATIVO,
+            "na_fila": self._fila.qsize() if self._fila else 0,
+            "processados": self.processados,
+            "erros": self.erros,
+            "descartados": self.descartados,
+            "requisicoes_range": self.requisicoes_range,
+            "etags_mudados": self.etags_mudados,
+            "sha256": METADADOS_SHA256,
+            "listagens_dir": LISTAGENS_DIR,
+        }
+
+
+def _limite_erro() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=METADADOS_RETENTAR_ERRO)
+
+
+def erro_vencido(verificado_em: datetime | None) -> bool:
+    # inspeção com erro que já pode ser tentada de novo
+    return verificado_em is None or verificado_em < _limite_erro()
+
+
+def _fonte_atual(jogo_id: int) -> str | None:
+    with SessionLocal() as db:
+        return db.execute(
+            select(models.Game.dropbox_token).where(models.Game.id == jogo_id)
+        ).scalar()
+
+
+def _gravar(jogo_id: int, fonte: str, status: str, erro: str | None, info: dict) -> bool:
+    with SessionLocal() as db:
+        # jogo editado (ou apagado) durante a inspeção: resultado velho, descarta
+        atual = db.execute(select(models.Game.dropbox_token).where(models.Game.id == jogo_id)).scalar()
+        if atual != fonte:
+            return False
+        if status == "erro":
+            # reinspeção do mesmo link que falhou: o último resultado bom fica
+            anterior = db.execute(
+                select(models.JogoArquivo.status)
+                .where(models.JogoArquivo.jogo_id == jogo_id, models.JogoArquivo.fonte == fonte)
+            ).scalar()
+            if anterior == "ok":
+                return True
+        if info.get("_listagem") is not None:
+            _gravar_listagem(jogo_id, fonte, info["_listagem"])
+        db.merge(models.JogoArquivo(
+            jogo_id=jogo_id, fonte=fonte, status=status, erro=erro,
+            verificado_em=datetime.utcnow(),
+            tamanho=info.get("tamanho"), etag=info.get("etag"),
+            content_type=info.get("content_type"), sha256=info.get("sha256"),
+            arquivos=info.get("arquivos"), tamanho_descompactado=info.get("tamanho_descompactado"),
+            exe_principal=info.get("exe_principal"),
+        ))
+        db.commit()
+        return True
+
+
+def _gravar_sha256(jogo_id: int, fonte: str, sha: str):
+    with SessionLocal() as db:
+        # só se o jogo ainda aponta para o mesmo link que foi lido
+        db.execute(
+            update(models.JogoArquivo)
+            .where(models.JogoArquivo.jogo_id == jogo_id, models.JogoArquivo.fonte == fonte)
+            .values(sha256=sha)
+        )
+        db.commit()
+
+
+def remover_jogo(db, jogo_id: int):
+    db.execute(delete(models.JogoArquivo).where(models.JogoArquivo.jogo_id == jogo_id))
+    _remover_listagens(jogo_id)
+
+
+def para_dict(a: models.JogoArquivo) -> dict:
+    return {
+        "status": a.status,
+        "erro": a.erro,
+        "tamanho": a.tamanho,
+        "etag": a.etag,
+        "content_type": a.content_type,
+        "sha256": a.sha256,
+        "arquivos": a.arquivos,
+        "tamanho_descompactado": a.tamanho_descompactado,
+        "exe_principal": a.exe_principal,
+        "verificado_em": a.verificado_em.isoformat() if a.verificado_em else None,
+    }
+
+
+enriquecedor = Enriquecedor()
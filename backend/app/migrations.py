@@ -0,0 +1,220 @@
+# app/migrations.py
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
+
+from app.database import Base
+
+# ================================
+# MIGRAÇÕES DE SCHEMA (versionadas)
+# ================================
+# create_all só cria tabelas que não existem: não adiciona índice nem coluna
+# num banco que já está em produção. Cada migração abaixo roda uma única vez
+# por banco e fica registrada em schema_migrations.
+#
+# Para mudar o schema: altere models.py (bancos novos) e acrescente aqui uma
+# migração com o próximo número (bancos existentes). Nunca edite uma
+# migração que já foi publicada.
+#
+# Vários workers sobem juntos: cada migração roda numa transação com lock
+# exclusivo (BEGIN IMMEDIATE no SQLite, advisory lock no Postgres) e
+# schema_migrations é relida sob o lock. Os passos também são idempotentes
+# (IF NOT EXISTS / checagem antes do ALTER).
+MIGRACOES_LOCK_TIMEOUT = float(os.getenv("MIGRACOES_LOCK_TIMEOUT", "600"))
+_PG_LOCK_MIGRACOES = 7_310_001   # chave do pg_advisory_xact_lock
+
+
+def _criar_indice(conn, tabela: str, nome: str):
+    # cria o índice declarado em models.py (se ainda não existir); índice que
+    # saiu de models.py numa migração posterior não é mais criado
+    idx = next((i for i in Base.metadata.tables[tabela].indexes if i.name == nome), None)
+    if idx is not None:
+        conn.execute(CreateIndex(idx, if_not_exists=True))
+
+
+def _recriar_indice(conn, tabela: str, nome: str):
+    # definição mudou em models.py: o create com checkfirst não atualizaria
+    conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+    _criar_indice(conn, tabela, nome)
+
+
+def _m001_indices_tokens(conn):
+    for nome in (
+        "ix_tokens_user_active_activated",
+        "ix_tokens_active_expires",
+        "ix_tokens_created_token",
+        "ix_tokens_expiracao_ativos",
+    ):
+        _criar_indice(conn, "tokens", nome)
+
+
+def _adicionar_coluna(conn, tabela: str, nome: str):
+    # ALTER TABLE com o tipo declarado em models.py (se a coluna ainda não existir)
+    if nome in {c["name"] for c in inspect(conn).get_columns(tabela)}:
+        return
+    col = Base.metadata.tables[tabela].c[nome]
+    tipo = col.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {nome} {tipo}"))
+
+
+def _m002_plano_em_users(conn):
+    for nome in ("plan_type", "plan_expires_at", "plan_token"):
+        _adicionar_coluna(conn, "users", nome)
+
+    # backfill: plano = último token ativado do usuário (mesma regra da ativação)
+    conn.execute(text(
+        "UPDATE users SET plan_token = ("
+        " SELECT t.token FROM tokens t"
+        " WHERE t.user_id = users.id AND t.active"
+        " ORDER BY t.activated_at DESC LIMIT 1"
+        ") WHERE plan_token IS NULL"
+    ))
+    conn.execute(text(
+        "UPDATE users SET"
+        " plan_type = (SELECT t.type FROM tokens t WHERE t.token = users.plan_token),"
+        " plan_expires_at = (SELECT t.expires_at FROM tokens t WHERE t.token = users.plan_token)"
+        " WHERE plan_token IS NOT NULL"
+    ))
+
+
+def _m003_tokens_expirado(conn):
+    # tokens_archive é tabela nova: create_all já cria
+    _adicionar_coluna(conn, "tokens", "expirado")
+
+
+def _m004_jogos_updated_at(conn):
+    _adicionar_coluna(conn, "jogos", "updated_at")
+    conn.execute(text("UPDATE jogos SET updated_at = created_at WHERE updated_at IS NULL"))
+
+
+def _m005_capas_para_arquivos(conn):
+    from app import capas
+
+    _adicionar_coluna(conn, "jogos", "capa_hash")
+    _adicionar_coluna(conn, "jogos", "capa_tipo")
+
+    # uma capa por vez: data URIs podem ter centenas de KB cada
+    ids = [r[0] for r in conn.execute(text("SELECT id FROM jogos WHERE capa_url LIKE 'data:%'"))]
+    for jogo_id in ids:
+        uri = conn.execute(text("SELECT capa_url FROM jogos WHERE id = :id"), {"id": jogo_id}).scalar()
+        try:
+            guardada = capas.guardar_data_uri(uri or "")
+        except ValueError as e:
+            print(f"⚠️ Capa do jogo {jogo_id} mantida no banco:", e)
+            continue
+        if not guardada:
+            continue
+        capa_hash, mime = guardada
+        conn.execute(
+            text("UPDATE jogos SET capa_hash = :h, capa_tipo = :t, capa_url = '' WHERE id = :id"),
+            {"h": capa_hash, "t": mime, "id": jogo_id},
+        )
+
+    # URLs das capas mudaram: invalida o ETag do catálogo
+    if ids and not conn.execute(text("UPDATE catalogo_versao SET versao = versao + 1 WHERE id = 1")).rowcount:
+        conn.execute(text("INSERT INTO catalogo_versao (id, versao) VALUES (1, 1)"))
+
+
+def _m006_busca_jogos(conn):
+    from app import busca
+    busca.criar_indice(conn)
+
+
+def _m007_generos(conn):
+    for tabela in ("generos", "jogos_generos"):
+        Base.metadata.tables[tabela].create(conn, checkfirst=True)
+    _criar_indice(conn, "jogos_generos", "ix_jogos_generos_genero")
+
+
+def _m008_game_changes(conn):
+    Base.metadata.tables["game_changes"].create(conn, checkfirst=True)
+    _adicionar_coluna(conn, "catalogo_versao", "log_desde")
+    # o que aconteceu antes desta migração não está no log: cliente com
+    # versão mais antiga recebe resync
+    conn.execute(text("UPDATE catalogo_versao SET log_desde = versao WHERE log_desde IS NULL"))
+
+
+def _m009_jogos_arquivo(conn):
+    # preenchida pela tarefa de fundo na subida (jogos sem metadados)
+    Base.metadata.tables["jogos_arquivo"].create(conn, checkfirst=True)
+
+
+def _m010_indices_parciais_tokens(conn):
+    # (active, expires_at) empatava com o parcial e o SQLite nunca escolhia o
+    # parcial; e "WHERE active" não casava com o "active = 1" das consultas
+    conn.execute(text("DROP INDEX IF EXISTS ix_tokens_active_expires"))
+    _recriar_indice(conn, "tokens", "ix_tokens_expiracao_ativos")
+    _criar_indice(conn, "tokens", "ix_tokens_livres")
+
+
+MIGRACOES = [
+    (1, "índices compostos/parciais em tokens", _m001_indices_tokens),
+    (2, "plano atual desnormalizado em users", _m002_plano_em_users),
+    (3, "tokens.expirado (varredura de vencidos)", _m003_tokens_expirado),
+    (4, "jogos.updated_at (URL versionada da capa)", _m004_jogos_updated_at),
+    (5, "capas em data URI -> arquivos (CAPAS_DIR)", _m005_capas_para_arquivos),
+    (6, "índice full-text de jogos (FTS5 / tsvector)", _m006_busca_jogos),
+    (7, "gêneros dos jogos (generos / jogos_generos)", _m007_generos),
+    (8, "log de alterações do catálogo (game_changes)", _m008_game_changes),
+    (9, "metadados do .zip dos jogos (jogos_arquivo)", _m009_jogos_arquivo),
+    (10, "índices parciais de tokens que o planner usa", _m010_indices_parciais_tokens),
+]
+
+
+def _travar(conn):
+    """
+    Lock exclusivo até o fim da transação de `conn`.
+    SQLite: BEGIN IMMEDIATE explícito também faz o DDL entrar na transação
+    (o pysqlite só abre transação antes de INSERT/UPDATE/DELETE; sem isso
+    cada CREATE/ALTER vira um commit próprio).
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _PG_LOCK_MIGRACOES})
+    elif conn.dialect.name == "sqlite":
+        # busy_timeout da conexão é curto; uma migração longa de outro worker
+        # pode segurar o lock por mais tempo
+        limite = time.monotonic() + MIGRACOES_LOCK_TIMEOUT
+        while True:
+            try:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                return
+            except OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() > limite:
+                    raise
+
+
+def aplicar_migracoes(engine):
+    with engine.begin() as conn:
+        _travar(conn)
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " descricao VARCHAR(200),"
+            " applied_at TIMESTAMP"
+            ")"
+        ))
+        feitas = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for versao, descricao, fn in MIGRACOES:
+        if versao in feitas:
+            continue
+        # migração + registro na mesma transação, sob o lock: ou aplica tudo
+        # ou nada, e só um worker aplica
+        with engine.begin() as conn:
+            _travar(conn)
+            aplicada = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": versao}
+            ).first()
+            if aplicada:
+                # outro worker aplicou enquanto esperávamos o lock
+                continue
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, descricao, applied_at) VALUES (:v, :d, :t)"),
+                {"v": versao, "d": descricao, "t": datetime.utcnow()},
+            )
+        print(f"✅ Migração {versao} aplicada: {descricao}")
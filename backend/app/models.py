@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Text, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base  # Certifique-se de que este Base é o mesmo usado no main.py
@@ -15,6 +15,11 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # plano atual (cópia do último token ativado): checar plano = ler 1 linha
+    plan_type = Column(String(20), nullable=True)
+    plan_expires_at = Column(DateTime, nullable=True)   # NULL com plan_type = permanente
+    plan_token = Column(String(64), nullable=True)
+
     subscriptions = relationship("Subscription", back_populates="user")
 
 
@@ -25,8 +30,72 @@ class Game(Base):
     nome = Column(String, index=True, nullable=False)
     descricao = Column(Text, default="")
     dropbox_token = Column(String, nullable=False)
-    capa_url = Column(String, default="")
+    capa_url = Column(String, default="")          # só URL externa; imagem enviada vai para capa_hash
+    capa_hash = Column(String(64), nullable=True)  # sha256 do arquivo em CAPAS_DIR (app/capas.py)
+    capa_tipo = Column(String(30), nullable=True)  # content-type do original
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class JogoArquivo(Base):
+    # metadados do .zip do jogo, preenchidos em segundo plano (app/metadados.py)
+    __tablename__ = "jogos_arquivo"
+
+    jogo_id = Column(Integer, ForeignKey("jogos.id", ondelete="CASCADE"), primary_key=True)
+    fonte = Column(String, nullable=False)          # dropbox_token inspecionado (mudou = refazer)
+    status = Column(String(20), nullable=False)     # ok / erro
+    erro = Column(String(300), nullable=True)
+
+    tamanho = Column(BigInteger, nullable=True)     # bytes do .zip
+    etag = Column(String(200), nullable=True)
+    content_type = Column(String(100), nullable=True)
+    sha256 = Column(String(64), nullable=True)      # só com METADADOS_SHA256=1
+    arquivos = Column(Integer, nullable=True)       # nº de arquivos dentro do zip
+    tamanho_descompactado = Column(BigInteger, nullable=True)
+    exe_principal = Column(String(500), nullable=True)
+    verificado_em = Column(DateTime, default=datetime.utcnow)
+
+
+class Genero(Base):
+    __tablename__ = "generos"
+
+    id = Column(Integer, primary_key=True)
+    nome = Column(String(50), nullable=False)               # como aparece no menu ("Ação")
+    chave = Column(String(50), nullable=False, unique=True) # sem acento/minúsculo ("acao")
+
+
+class JogoGenero(Base):
+    # jogo <-> gênero (n:n). A PK já atende "gêneros do jogo"; o índice
+    # (genero_id, jogo_id) atende "jogos do gênero" sem ler a tabela
+    __tablename__ = "jogos_generos"
+
+    jogo_id = Column(Integer, ForeignKey("jogos.id", ondelete="CASCADE"), primary_key=True)
+    genero_id = Column(Integer, ForeignKey("generos.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_jogos_generos_genero", "genero_id", "jogo_id"),
+    )
+
+
+class CatalogoVersao(Base):
+    # linha única (id=1): incrementada a cada alteração de jogo (ETag do catálogo)
+    __tablename__ = "catalogo_versao"
+
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    # game_changes tem tudo que aconteceu depois desta versão (antes: compactado)
+    log_desde = Column(Integer, nullable=True, default=0)
+
+
+class GameChange(Base):
+    # log de alterações do catálogo: /jogos/sync?since= devolve só o que mudou
+    __tablename__ = "game_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    versao = Column(Integer, nullable=False, index=True)   # versão do catálogo após a alteração
+    jogo_id = Column(Integer, nullable=False)
+    tipo = Column(String(10), nullable=False)               # "upsert" / "delete"
+    criado_em = Column(DateTime, default=datetime.utcnow)
 
 class TokenDB(Base):
     __tablename__ = "tokens"
@@ -41,7 +110,45 @@ class TokenDB(Base):
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
+    # marcado pela varredura de fundo (app/manutencao.py) quando o plano vence
+    expirado = Column(Boolean, default=False, nullable=True)
+
+    __table_args__ = (
+        # token mais recente ativado de um usuário (plano / listar_usuarios)
+        Index("ix_tokens_user_active_activated", "user_id", "active", text("activated_at DESC")),
+        # listar_tokens: ordem estável created_at desc, token desc
+        Index("ix_tokens_created_token", text("created_at DESC"), text("token DESC")),
+        # listar_tokens?active=false: tokens ainda não usados, já na ordem da listagem
+        Index(
+            "ix_tokens_livres", text("created_at DESC"), text("token DESC"),
+            sqlite_where=text("active = 0"), postgresql_where=text("NOT active"),
+        ),
+        # só tokens já usados que expiram (varredura de vencidos / arquivamento).
+        # SQLite só usa índice parcial se o WHERE da consulta contém o do
+        # índice: "active = 1" é como o SQLAlchemy escreve active == True
+        Index(
+            "ix_tokens_expiracao_ativos", "expires_at",
+            sqlite_where=text("active = 1"), postgresql_where=text("active"),
+        ),
+    )
+
+
+
+class TokenArchive(Base):
+    # tokens usados cujo plano venceu há mais de TOKEN_ARQUIVO_DIAS:
+    # saem de "tokens" para a tabela quente continuar pequena
+    __tablename__ = "tokens_archive"
+
+    token = Column(String(64), primary_key=True)
+    type = Column(String(20), nullable=False)
+    active = Column(Boolean, nullable=False)
+
+    created_at = Column(DateTime)
+    activated_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
 
+    user_id = Column(Integer, nullable=True, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
 
 
 class AccessCode(Base):
@@ -0,0 +1,66 @@
+# app/paginacao.py
+import json
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+# ================================
+# PAGINAÇÃO POR CURSOR (keyset)
+# ================================
+# As listagens devolvem no máximo `limit` itens e um cursor opaco em "next".
+# A próxima página é pedida com ?after=<cursor>. O cursor guarda a chave de
+# ordenação do último item, então cada página é uma busca no índice (não um
+# OFFSET que fica mais lento quanto mais fundo se vai).
+LIMIT_PADRAO = 100
+LIMIT_MAXIMO = 1000
+
+
+def limitar(limit: int | None) -> int:
+    if limit is None:
+        return LIMIT_PADRAO
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit deve ser >= 1")
+    return min(limit, LIMIT_MAXIMO)
+
+
+def codificar_cursor(*valores) -> str:
+    vals = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    raw = json.dumps(vals, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str | None, *tipos) -> tuple | None:
+    """
+    Decodifica um cursor de codificar_cursor convertendo cada valor para o
+    tipo esperado (int, str ou datetime). Cursor inválido => 400.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        vals = json.loads(raw)
+        if len(vals) != len(tipos):
+            raise ValueError
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(vals, tipos)
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def filtro_prefixo(coluna, prefixo: str):
+    # "começa com" como intervalo (>= prefixo e < prefixo+U+FFFF): usa o índice da coluna
+    return (coluna >= prefixo) & (coluna < prefixo + "\uffff")
+
+
+def pagina(rows: list, limit: int, cursor_de):
+    """
+    `rows` deve ter sido buscado com limit + 1: o item extra só indica que
+    existe próxima página. Devolve (itens, next).
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, cursor_de(rows[-1])
+    return rows, None
@@ -0,0 +1,110 @@
+# app/plano_cache.py
+import os
+import time
+import threading
+from datetime import datetime
+from collections import OrderedDict
+
+# ================================
+# CACHE DE PLANO POR USUÁRIO (entitlement)
+# ================================
+# Todo download pergunta "esse usuário pode baixar?". Em vez de ir no banco
+# toda vez, guardamos por usuário se ele está ativo (não banido), se tem plano
+# e quando o plano vence. A checagem vira um lookup + comparação de relógio.
+#
+# Quem altera plano ou banimento chama invalidar(user_id) logo após o commit.
+# invalidar também sobe a geração do usuário: quem vai ao banco pega
+# geracao(user_id) antes da consulta e passa para guardar, que não grava se
+# houve invalidação no meio (senão a leitura velha voltaria para o cache
+# depois do pop e ficaria até o TTL).
+# PLANO_CACHE_TTL é só uma rede de segurança para quando há mais de um
+# processo (a invalidação é local a cada processo).
+PLANO_CACHE_MAX = int(os.getenv("PLANO_CACHE_MAX", "10000"))
+PLANO_CACHE_TTL = float(os.getenv("PLANO_CACHE_TTL", "300"))
+
+
+class PlanoCache:
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+
+        # rotas síncronas (threadpool) também invalidam: precisa de lock
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()   # user_id -> (ativo, tem_plano, expira, guardado_em)
+        self._geracoes = {}              # user_id -> nº de invalidações (só quem já foi invalidado)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self.remocoes = 0
+        self.descartes = 0
+
+    def consultar(self, user_id: int) -> bool | None:
+        """
+        True/False se o usuário está no cache, None se precisa ir ao banco.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            e = self._entradas.get(user_id)
+            if e is None or agora - e[3] >= self.ttl:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(user_id)
+            self.hits += 1
+        ativo, tem_plano, expira, _ = e
+        return _pode_baixar(ativo, tem_plano, expira)
+
+    def geracao(self, user_id: int) -> int:
+        # pegar ANTES de consultar o banco
+        with self._lock:
+            return self._geracoes.get(user_id, 0)
+
+    def guardar(self, user_id: int, geracao: int, ativo: bool, tem_plano: bool, expira: datetime | None) -> bool:
+        """
+        Guarda o que veio do banco e devolve se pode baixar. geracao é a de
+        antes da consulta: se mudou, a leitura pode ser anterior à alteração e
+        só vale para este pedido.
+        """
+        if self.max_itens > 0:
+            with self._lock:
+                if self._geracoes.get(user_id, 0) != geracao:
+                    self.descartes += 1
+                    return _pode_baixar(ativo, tem_plano, expira)
+                self._entradas[user_id] = (ativo, tem_plano, expira, time.monotonic())
+                self._entradas.move_to_end(user_id)
+                while len(self._entradas) > self.max_itens:
+                    self._entradas.popitem(last=False)
+                    self.remocoes += 1
+        return _pode_baixar(ativo, tem_plano, expira)
+
+    def invalidar(self, user_id: int | None):
+        if user_id is None:
+            return
+        with self._lock:
+            self._geracoes[user_id] = self._geracoes.get(user_id, 0) + 1
+            if self._entradas.pop(user_id, None) is not None:
+                self.invalidacoes += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "usuarios": len(self._entradas),
+                "max_itens": self.max_itens,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "invalidacoes": self.invalidacoes,
+                "remocoes": self.remocoes,
+                "descartes": self.descartes,
+            }
+
+
+def _pode_baixar(ativo: bool, tem_plano: bool, expira: datetime | None) -> bool:
+    # expira None com plano = permanente
+    if not ativo or not tem_plano:
+        return False
+    return expira is None or expira >= datetime.utcnow()
+
+
+planos = PlanoCache(PLANO_CACHE_MAX, PLANO_CACHE_TTL)
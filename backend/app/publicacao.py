@@ -0,0 +1,175 @@
+# app/publicacao.py
+import os
+import gzip
+import json
+import shutil
+import asyncio
+import hashlib
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app import models, catalogo, capas, generos
+from app.database import ReadSessionLocal
+from app.arquivos import gravar_atomico, caminho_temporario
+
+# ================================
+# PUBLICAÇÃO ESTÁTICA DO CATÁLOGO
+# ================================
+# Com CATALOGO_PUBLICAR_DIR definido, a cada versão nova do catálogo o app
+# escreve nesse diretório:
+#
+#   catalog-<versao>.json.gz   catálogo completo (imutável)
+#   capas/<hash>_<w>x<h>.webp  miniaturas dos cards (nome = conteúdo, imutável)
+#   latest.json                {"versao", "catalogo", ...} -> aponta o atual
+#
+# Qualquer servidor de arquivos (nginx, CDN, python -m http.server) serve o
+# Explore a partir daí; a API fica só com login, plano e download. Caminhos
+# dentro do catálogo são relativos ao diretório. Sugestão de cache: latest.json
+# com "no-cache", todo o resto com "max-age=31536000, immutable".
+#
+# Os arquivos são escritos com tmp + rename: quem lê nunca vê um catálogo pela
+# metade, e latest.json só muda depois que o catálogo novo está no lugar.
+CATALOGO_PUBLICAR_DIR = os.getenv("CATALOGO_PUBLICAR_DIR", "")   # vazio = desligado
+CATALOGO_PUBLICAR_INTERVALO = float(os.getenv("CATALOGO_PUBLICAR_INTERVALO", "5"))
+CATALOGO_PUBLICAR_MANTER = int(os.getenv("CATALOGO_PUBLICAR_MANTER", "3"))   # versões antigas no disco
+
+CAMPOS_PUBLICADOS = ("id", "nome", "descricao", "capa_thumb", "genero")
+FORMATO_MINIATURA = "webp"
+
+
+class Publicador:
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self.publicada: int | None = None
+        self.publicacoes = 0
+        self.erros = 0
+        self.ultima_publicacao: datetime | None = None
+        self.bytes_ultima = 0
+
+    def versao_no_disco(self) -> int | None:
+        try:
+            with open(os.path.join(self.diretorio, "latest.json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("versao")
+        except (OSError, ValueError):
+            return None
+
+    # ---------- capas ----------
+    def _publicar_capa(self, jogo_id: int, capa_hash: str, capa_tipo: str) -> str | None:
+        w, h = capas.CAPAS_TAMANHOS[0]
+        origem, _ = capas.miniatura(capa_hash, capa_tipo, w, h, FORMATO_MINIATURA)
+        if not os.path.exists(origem):
+            print(f"⚠️ Capa do jogo {jogo_id} não encontrada:", origem)
+            return None
+        nome = os.path.basename(origem)
+        destino = os.path.join(self.diretorio, "capas", nome)
+        if not os.path.exists(destino):
+            # mesmo conteúdo = mesmo nome: copia uma vez só
+            tmp = caminho_temporario(destino)
+            try:
+                os.link(origem, tmp)
+            except OSError:
+                shutil.copyfile(origem, tmp)
+            os.replace(tmp, destino)
+        return f"capas/{nome}"
+
+    # ---------- catálogo ----------
+    def publicar(self, forcar: bool = False) -> int | None:
+        """
+        Publica a versão atual do catálogo se ela ainda não está no disco.
+        Devolve a versão publicada (None se nada mudou).
+        """
+        g = models.Game
+        with ReadSessionLocal() as db:
+            versao = db.execute(
+                select(models.CatalogoVersao.versao).where(models.CatalogoVersao.id == 1)
+            ).scalar() or 0
+            if not forcar and versao == self.versao_no_disco():
+                self.publicada = versao   # outro worker já publicou
+                return None
+            rows = db.execute(
+                select(*catalogo.colunas(CAMPOS_PUBLICADOS), g.capa_tipo, g.capa_url)
+                .order_by(g.id)
+            ).all()
+            por_jogo = generos.agrupar(db.execute(generos.consulta_por_jogo()).all())
+
+        os.makedirs(os.path.join(self.diretorio, "capas"), exist_ok=True)
+        jogos = []
+        for r in rows:
+            item = catalogo.projetar(r, CAMPOS_PUBLICADOS, por_jogo)
+            if r.capa_hash:
+                item["capa_thumb"] = self._publicar_capa(r.id, r.capa_hash, r.capa_tipo)
+            elif (r.capa_url or "").startswith(("http://", "https://")):
+                item["capa_thumb"] = r.capa_url
+            else:
+                item["capa_thumb"] = None
+            jogos.append(item)
+
+        body = json.dumps(
+            {"versao": versao, "jogos": jogos}, ensure_ascii=False, separators=(",", ":"),
+        ).encode("utf-8")
+        compactado = gzip.compress(body, compresslevel=9, mtime=0)
+        nome = f"catalog-{versao}.json.gz"
+        gravar_atomico(os.path.join(self.diretorio, nome), compactado)
+
+        # o ponteiro por último: só aponta para arquivo que já existe
+        agora = datetime.utcnow()
+        gravar_atomico(os.path.join(self.diretorio, "latest.json"), json.dumps({
+            "versao": versao,
+            "catalogo": nome,
+            "bytes": len(compactado),
+            "sha256": hashlib.sha256(compactado).hexdigest(),
+            "campos": list(CAMPOS_PUBLICADOS),
+            "gerado_em": agora.isoformat(),
+        }).encode("utf-8"))
+
+        self._limpar(versao)
+        self.publicada = versao
+        self.publicacoes += 1
+        self.ultima_publicacao = agora
+        self.bytes_ultima = len(compactado)
+        return versao
+
+    def _limpar(self, atual: int):
+        # mantém as últimas versões: cliente que leu o latest.json anterior
+        # ainda consegue baixar o catálogo que ele apontava
+        versoes = []
+        for nome in os.listdir(self.diretorio):
+            if nome.startswith("catalog-") and nome.endswith(".json.gz"):
+                try:
+                    versoes.append(int(nome[len("catalog-"):-len(".json.gz")]))
+                except ValueError:
+                    continue
+        for v in sorted(versoes)[:-max(CATALOGO_PUBLICAR_MANTER, 1)]:
+            if v != atual:
+                try:
+                    os.remove(os.path.join(self.diretorio, f"catalog-{v}.json.gz"))
+                except OSError:
+                    pass
+
+    async def loop(self):
+        """
+        Tarefa de fundo: confere a versão do catálogo a cada
+        CATALOGO_PUBLICAR_INTERVALO e publica quando mudou.
+        """
+        while True:
+            try:
+                await run_in_threadpool(self.publicar)
+            except Exception as e:
+                self.erros += 1
+                print("⚠️ Publicação do catálogo falhou:", repr(e))
+            await asyncio.sleep(CATALOGO_PUBLICAR_INTERVALO)
+
+    def stats(self) -> dict:
+        return {
+            "diretorio": self.diretorio,
+            "versao_publicada": self.publicada,
+            "publicacoes": self.publicacoes,
+            "erros": self.erros,
+            "ultima_publicacao": self.ultima_publicacao.isoformat() if self.ultima_publicacao else None,
+            "bytes_ultima": self.bytes_ultima,
+        }
+
+
+publicador = Publicador(CATALOGO_PUBLICAR_DIR) if CATALOGO_PUBLICAR_DIR else None
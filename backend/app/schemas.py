@@ -34,6 +34,9 @@ class UserResponse(BaseModel):
     email: EmailStr
     is_active: bool
     created_at: datetime
+    plan_type: str | None = None
+    plan_expires_at: datetime | None = None
+    plano_status: str = "SEM PLANO"   # ATIVO / VENCIDO / PERMANENTE / SEM PLANO
 
     class Config:
         from_attributes = True
@@ -0,0 +1,76 @@
+# app/tokens_lote.py
+import os
+import json
+from datetime import datetime
+
+from app.models import TokenDB
+
+# ================================
+# GERAÇÃO DE TOKENS EM LOTE (revenda)
+# ================================
+# Lotes de 10k–100k tokens: os bytes aleatórios saem de uma única chamada a
+# os.urandom (CSPRNG do sistema), a inserção é feita em blocos com
+# executemany numa transação só e a resposta é gerada linha a linha.
+#
+# Só o hex de cada token fica em memória (3,2 MB para 100k); a string do
+# UUID é montada de novo na hora de inserir e na hora de exportar.
+TOKEN_LOTE_MAX = int(os.getenv("TOKEN_LOTE_MAX", "200000"))
+TOKEN_LOTE_CHUNK = int(os.getenv("TOKEN_LOTE_CHUNK", "5000"))
+
+FORMATOS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Lote:
+    def __init__(self, tipo: str, quantidade: int):
+        self.tipo = tipo
+        self.quantidade = quantidade
+        self.criado_em = datetime.utcnow()
+
+        # uuid4 "na mão": marca versão (4) e variante (RFC 4122) em cada bloco
+        # de 16 bytes e guarda tudo em hex; formatar vira só fatiar a string
+        b = bytearray(os.urandom(16 * quantidade))
+        b[6::16] = bytes((x & 0x0F) | 0x40 for x in b[6::16])
+        b[8::16] = bytes((x & 0x3F) | 0x80 for x in b[8::16])
+        self._hex = b.hex()
+
+    def tokens(self, inicio: int = 0, fim: int | None = None):
+        # mesmo formato do criar_token antigo: str(uuid.uuid4())
+        h = self._hex
+        for i in range(inicio, self.quantidade if fim is None else fim):
+            o = 32 * i
+            yield f"{h[o:o + 8]}-{h[o + 8:o + 12]}-{h[o + 12:o + 16]}-{h[o + 16:o + 20]}-{h[o + 20:o + 32]}"
+
+    def inserir(self, engine):
+        # tudo ou nada: um lote pela metade não pode ficar no banco
+        tabela = TokenDB.__table__
+        with engine.begin() as conn:
+            for inicio in range(0, self.quantidade, TOKEN_LOTE_CHUNK):
+                fim = min(inicio + TOKEN_LOTE_CHUNK, self.quantidade)
+                conn.execute(tabela.insert(), [
+                    {"token": t, "type": self.tipo, "active": False, "created_at": self.criado_em}
+                    for t in self.tokens(inicio, fim)
+                ])
+
+    def exportar(self, formato: str):
+        if formato == "csv":
+            yield "token,type,created_at\n"
+            criado = self.criado_em.isoformat()
+            linhas = (f"{t},{self.tipo},{criado}\n" for t in self.tokens())
+        else:
+            linhas = (
+                json.dumps({"token": t, "type": self.tipo, "created_at": self.criado_em.isoformat()}) + "\n"
+                for t in self.tokens()
+            )
+
+        # junta algumas linhas por pedaço: menos idas ao socket
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) >= 1000:
+                yield "".join(bloco)
+                bloco = []
+        if bloco:
+            yield "".join(bloco)
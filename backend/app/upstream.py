@@ -0,0 +1,125 @@
+# app/upstream.py
+import os
+import httpx
+
+# ================================
+# CLIENTE HTTP COMPARTILHADO (upstream dos downloads)
+# ================================
+# Um único AsyncClient por processo: reaproveita conexões (keep-alive) com o
+# Dropbox e limita quantas conexões simultâneas abrimos no upstream.
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "60"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "10"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "500"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "100"))
+
+# Tamanho de cada pedaço enviado ao cliente
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                connect=UPSTREAM_CONNECT_TIMEOUT,
+                read=UPSTREAM_READ_TIMEOUT,
+                write=UPSTREAM_READ_TIMEOUT,
+                pool=UPSTREAM_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            ),
+            follow_redirects=True,  # links do Dropbox redirecionam para o servidor de conteúdo
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def abrir_stream(url: str, headers: dict | None = None, method: str = "GET") -> httpx.Response:
+    """
+    Abre a requisição no upstream sem ler o corpo.
+    Quem chama é responsável por fechar a resposta (iterar_e_fechar faz isso).
+    """
+    client = get_client()
+    h = {"Accept-Encoding": "identity"}  # queremos os bytes crus (Content-Length confiável)
+    h.update(headers or {})
+    req = client.build_request(method, url, headers=h)
+    return await client.send(req, stream=True)
+
+
+async def iterar_e_fechar(r: httpx.Response):
+    """
+    Repassa o corpo do upstream em pedaços.
+    O StreamingResponse só pede o próximo pedaço depois de entregar o anterior
+    ao cliente, então um cliente lento segura a leitura do upstream (backpressure)
+    em vez de acumular tudo em memória.
+    """
+    try:
+        async for chunk in r.aiter_raw(DOWNLOAD_CHUNK_SIZE):
+            if chunk:
+                yield chunk
+    finally:
+        await r.aclose()
+
+
+# ================================
+# RANGE (download retomável)
+# ================================
+class RangeInvalido(Exception):
+    pass
+
+
+def interpretar_range(valor: str | None) -> str | None:
+    """
+    Valida o header Range recebido do cliente e devolve o valor a repassar
+    ao upstream (ou None para baixar o arquivo inteiro).
+
+    Aceita um único intervalo: "bytes=100-", "bytes=100-199" ou "bytes=-500".
+    Vários intervalos ("bytes=0-10,20-30") levantam RangeInvalido (416).
+    Sintaxe desconhecida é ignorada, como manda a RFC 9110.
+    """
+    if not valor:
+        return None
+
+    valor = valor.strip()
+    if not valor.lower().startswith("bytes="):
+        return None
+
+    spec = valor[6:].strip()
+    if "," in spec:
+        raise RangeInvalido("Múltiplos intervalos não são suportados")
+
+    inicio, sep, fim = spec.partition("-")
+    inicio, fim = inicio.strip(), fim.strip()
+    if not sep or (not inicio and not fim):
+        return None
+    if (inicio and not inicio.isdigit()) or (fim and not fim.isdigit()):
+        return None
+    if inicio and fim and int(fim) < int(inicio):
+        raise RangeInvalido("Intervalo inválido")
+
+    return f"bytes={inicio}-{fim}"
+
+
+# headers do upstream que o cliente precisa para retomar/segmentar o download
+HEADERS_REPASSADOS = ("content-length", "content-range", "accept-ranges", "etag", "last-modified")
+
+
+def headers_de_resposta(r: httpx.Response) -> dict:
+    headers = {}
+    for nome in HEADERS_REPASSADOS:
+        if r.headers.get(nome):
+            headers[nome.title()] = r.headers[nome]
+    if r.status_code == 206 and "Accept-Ranges" not in headers:
+        headers["Accept-Ranges"] = "bytes"
+    return headers
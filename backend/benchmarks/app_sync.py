@@ -0,0 +1,23 @@
+# benchmarks/app_sync.py
+from fastapi import HTTPException
+
+from app import crud, schemas
+from app.database import ReadSessionLocal
+from app.main import app
+
+# ================================
+# APP + ROTAS SÍNCRONAS DE COMPARAÇÃO (só para benchmarks/async_sync.py)
+# ================================
+# O /login como era antes da pilha async: def no threadpool, sessão e crud
+# síncronos. A ativação síncrona já existe no app (/ativar_token).
+
+
+@app.post("/bench/sync/login", response_model=schemas.UserResponse)
+def login_sync(user: schemas.UserLogin):
+    with ReadSessionLocal() as db:
+        db_user = crud.authenticate_user(db, email=user.email, password=user.password)
+        if not db_user:
+            raise HTTPException(status_code=400, detail="Email ou senha incorretos")
+        resp = schemas.UserResponse.model_validate(db_user)
+        resp.plano_status = crud.plano_status(db_user.plan_type, db_user.plan_expires_at)
+        return resp
@@ -0,0 +1,70 @@
+# benchmarks/async_sync.py
+import asyncio
+import argparse
+import itertools
+
+import httpx
+
+import comum
+
+# ================================
+# PILHA ASYNC x PILHA SÍNCRONA
+# ================================
+# As mesmas operações pelos dois caminhos, no mesmo servidor e banco:
+# - login: /login (async) x /bench/sync/login (def + sessão síncrona, ver app_sync.py)
+# - ativação: /token/ativar (async) x /ativar_token (def + sessão síncrona)
+# em cada nível de concorrência. O caminho síncrono paga o salto para o
+# threadpool do anyio (40 threads) em todo pedido.
+#
+#   python benchmarks/async_sync.py --pedidos 2000 --concorrencia 1,16,64
+
+
+async def rodar(url: str, usuarios: int, pedidos: int, niveis: list):
+    tokens = itertools.count()
+    limites = httpx.Limits(max_connections=max(niveis))
+
+    def login(rota):
+        async def pedido(i):
+            return await c.post(rota, json={"email": f"u{i % usuarios + 1}@bench.x", "password": comum.SENHA})
+        return pedido
+
+    async def ativar_async(i):
+        token = f"BENCH-{next(tokens):08d}"
+        return await c.post("/token/ativar", json={"token": token, "user_id": i % usuarios + 1})
+
+    async def ativar_sync(i):
+        token = f"BENCH-{next(tokens):08d}"
+        return await c.post("/ativar_token", params={"token": token, "user_id": i % usuarios + 1})
+
+    casos = (
+        ("login async", login("/login")),
+        ("login sync", login("/bench/sync/login")),
+        ("ativação async", ativar_async),
+        ("ativação sync", ativar_sync),
+    )
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limites) as c:
+        for concorrencia in niveis:
+            print(f"\nconcorrência {concorrencia}")
+            for nome, pedido in casos:
+                await comum.carga(pedido, min(50, pedidos), concorrencia)   # aquece
+                comum.imprimir(f"  {nome}", await comum.carga(pedido, pedidos, concorrencia))
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--pedidos", type=int, default=2000, help="por caso e nível")
+    p.add_argument("--concorrencia", default="1,16,64")
+    p.add_argument("--usuarios", type=int, default=5000)
+    args = p.parse_args()
+    niveis = [int(n) for n in args.concorrencia.split(",")]
+
+    ambiente = comum.preparar("async-sync")
+    comum.criar_schema()
+    # tokens livres para todas as ativações (2 caminhos x níveis x (aquecimento + medição))
+    comum.popular(usuarios=args.usuarios, tokens=2 * len(niveis) * (args.pedidos + min(50, args.pedidos)))
+    with comum.Servidor(ambiente, modulo="benchmarks.app_sync:app") as servidor:
+        asyncio.run(rodar(servidor.url, args.usuarios, args.pedidos, niveis))
+
+
+if __name__ == "__main__":
+    main()
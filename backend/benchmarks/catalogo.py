@@ -0,0 +1,74 @@
+# benchmarks/catalogo.py
+import asyncio
+import argparse
+
+import httpx
+
+import comum
+
+# ================================
+# CATÁLOGO: SNAPSHOT EM MEMÓRIA x BANCO
+# ================================
+# O catálogo inteiro por dois caminhos:
+# - /jogos: bytes prontos do snapshot (sem consulta, sem json.dumps)
+# - /admin/listar_jogos: consulta + dicts + JSON a cada pedido (páginas de
+#   1000, seguindo "next" até o fim)
+# Depois, /jogos com edições de jogo no meio (cada uma invalida o snapshot)
+# para ver o custo das remontagens. No fim, hits/montagens do snapshot.
+#
+#   python benchmarks/catalogo.py --jogos 2000 --pedidos 1000
+
+
+async def catalogo_admin(c: httpx.AsyncClient):
+    params = {"limit": 1000}
+    while True:
+        r = await c.get("/admin/listar_jogos", params=params)
+        proximo = r.json()["next"]
+        if not proximo:
+            return r
+        params["after"] = proximo
+
+
+async def rodar(url: str, pedidos: int, concorrencia: int, edicoes: int):
+    limites = httpx.Limits(max_connections=concorrencia + 1)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limites) as c:
+        casos = (
+            ("/jogos (snapshot, identity)", lambda _: c.get("/jogos", headers={"Accept-Encoding": "identity"})),
+            ("/jogos (snapshot, gzip)", lambda _: c.get("/jogos", headers={"Accept-Encoding": "gzip"})),
+            ("/admin/listar_jogos (banco)", lambda _: catalogo_admin(c)),
+        )
+        for nome, pedido in casos:
+            await comum.carga(pedido, 20, concorrencia)   # aquece
+            comum.imprimir(nome, await comum.carga(pedido, pedidos, concorrencia))
+
+        # edições espalhadas pela medição: cada uma derruba o snapshot
+        async def editar():
+            for i in range(edicoes):
+                await c.put("/admin/editar_jogo/1", json={"nome": f"Jogo 0 ({i})", "descricao": "-", "dropbox_token": "-"})
+                await asyncio.sleep(0.2)
+
+        edicao = asyncio.create_task(editar())
+        r = await comum.carga(lambda _: c.get("/jogos", headers={"Accept-Encoding": "gzip"}), pedidos, concorrencia)
+        await edicao
+        comum.imprimir(f"/jogos com {edicoes} edições no meio", r)
+
+        print("\nsnapshot:", (await c.get("/admin/metricas")).json()["catalogo_snapshot"])
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--jogos", type=int, default=2000)
+    p.add_argument("--pedidos", type=int, default=1000)
+    p.add_argument("--concorrencia", type=int, default=16)
+    p.add_argument("--edicoes", type=int, default=10)
+    args = p.parse_args()
+
+    ambiente = comum.preparar("catalogo")
+    comum.criar_schema()
+    comum.popular(jogos=args.jogos)
+    with comum.Servidor(ambiente) as servidor:
+        asyncio.run(rodar(servidor.url, args.pedidos, args.concorrencia, args.edicoes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# benchmarks/comum.py
+import os
+import sys
+import time
+import shutil
+import socket
+import asyncio
+import tempfile
+import threading
+import subprocess
+
+import httpx
+
+# ================================
+# BASE DOS BENCHMARKS
+# ================================
+# Cada script sobe o app num processo uvicorn separado (o gerador de carga não
+# disputa o GIL com o servidor), com banco SQLite num diretório temporário, e
+# mede com httpx: pedidos/s e latência p50/p95/p99.
+#
+# Rodar de backend/:  python benchmarks/<script>.py --help
+#
+# preparar() precisa vir antes de qualquer import de app.*: o banco e os
+# caches leem o ambiente na importação.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def preparar(nome: str, **env) -> dict:
+    """
+    Diretório novo para o banco do benchmark e o ambiente do servidor.
+    Também vale para este processo (quem popula o banco).
+    """
+    db_dir = os.path.join(tempfile.gettempdir(), f"primex-bench-{nome}")
+    shutil.rmtree(db_dir, ignore_errors=True)
+    os.makedirs(db_dir)
+    ambiente = {
+        "DB_DIR": db_dir,
+        "MANUTENCAO_INTERVALO": "0",
+        "METADADOS_ATIVO": "0",
+        **{k: str(v) for k, v in env.items()},
+    }
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.update(ambiente)
+    return ambiente
+
+
+def criar_schema():
+    # mesmo que a subida do app faz (create_all + migrações)
+    from app import models, migrations
+    from app.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    migrations.aplicar_migracoes(engine)
+
+
+# senha de todos os usuários gerados; bcrypt com custo 4: com o custo de
+# produção o login mede o bcrypt (no threadpool), não o banco
+SENHA = "bench123"
+
+
+def popular(usuarios: int = 0, jogos: int = 0, tokens: int = 0):
+    """
+    usuarios u1@bench.x..uN@bench.x, tokens livres BENCH-00000000.. (Mensal)
+    e jogos, direto no banco.
+    """
+    from datetime import datetime
+    from sqlalchemy import insert
+    from passlib.hash import bcrypt_sha256
+    from app import models, catalogo
+    from app.database import engine, SessionLocal
+
+    senha = bcrypt_sha256.using(rounds=4).hash(SENHA)
+    with engine.begin() as conn:
+        if usuarios:
+            conn.execute(insert(models.User), [
+                {"id": i, "nome": f"Usuário {i}", "email": f"u{i}@bench.x", "password": senha, "is_active": True}
+                for i in range(1, usuarios + 1)
+            ])
+        if tokens:
+            conn.execute(insert(models.TokenDB), [
+                {"token": f"BENCH-{i:08d}", "type": "Mensal", "active": False, "created_at": datetime.utcnow()}
+                for i in range(tokens)
+            ])
+        if jogos:
+            conn.execute(insert(models.Game), [
+                {"nome": f"Jogo {i}", "descricao": "descrição do jogo " * 10, "dropbox_token": "-"}
+                for i in range(jogos)
+            ])
+    with SessionLocal() as db:
+        catalogo.incrementar_versao(db)
+        db.commit()
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Servidor:
+    """
+    uvicorn app.main:app num subprocesso, com o ambiente de preparar().
+    """
+
+    def __init__(self, ambiente: dict, modulo: str = "app.main:app", workers: int = 1):
+        self.porta = porta_livre()
+        self.url = f"http://127.0.0.1:{self.porta}"
+        self._cmd = [
+            sys.executable, "-m", "uvicorn", modulo,
+            "--port", str(self.porta), "--workers", str(workers), "--log-level", "warning",
+        ]
+        self._env = {**os.environ, **ambiente}
+        self._proc = None
+
+    def __enter__(self):
+        self._proc = subprocess.Popen(self._cmd, cwd=BACKEND_DIR, env=self._env)
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"servidor saiu com código {self._proc.returncode}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError("servidor não respondeu em 30 s")
+
+    def __exit__(self, *exc):
+        self._proc.terminate()
+        try:
+            self._proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+
+
+class UpstreamLento:
+    """
+    Upstream falso (no lugar do Dropbox) que entrega `tamanho` bytes a
+    `bytes_por_s` por conexão: downloads ficam abertos como na vida real.
+    """
+
+    def __init__(self, tamanho: int, bytes_por_s: int, bloco: int = 64 * 1024):
+        import uvicorn
+        from starlette.applications import Starlette
+        from starlette.responses import Response, StreamingResponse
+        from starlette.routing import Route
+
+        dados = os.urandom(bloco)
+        pausa = bloco / bytes_por_s
+
+        async def arquivo(request):
+            headers = {"Content-Length": str(tamanho), "Accept-Ranges": "bytes", "ETag": '"bench"'}
+            if request.method == "HEAD":
+                return Response(headers=headers, media_type="application/zip")
+
+            async def corpo():
+                falta = tamanho
+                while falta > 0:
+                    n = min(bloco, falta)
+                    yield dados[:n]
+                    falta -= n
+                    await asyncio.sleep(pausa)
+            return StreamingResponse(corpo(), headers=headers, media_type="application/zip")
+
+        app = Starlette(routes=[Route("/jogo.zip", arquivo, methods=["GET", "HEAD"])])
+        porta = porta_livre()
+        self.url = f"http://127.0.0.1:{porta}/jogo.zip"
+        self._servidor = uvicorn.Server(uvicorn.Config(app, port=porta, log_level="error"))
+
+    def __enter__(self):
+        threading.Thread(target=self._servidor.run, daemon=True).start()
+        while not self._servidor.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.should_exit = True
+
+
+# ---------- carga ----------
+async def carga(pedido, total: int, concorrencia: int) -> dict:
+    """
+    Chama `await pedido(i)` `total` vezes com até `concorrencia` ao mesmo
+    tempo. pedido devolve a resposta httpx (status >= 400 conta como erro).
+    """
+    latencias = []
+    erros = 0
+    proximo = iter(range(total))
+
+    async def trabalhador():
+        nonlocal erros
+        for i in proximo:
+            t = time.perf_counter()
+            try:
+                r = await pedido(i)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencias.append(time.perf_counter() - t)
+            if not ok:
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return resumo(latencias, time.perf_counter() - inicio, erros)
+
+
+def resumo(latencias: list, duracao: float, erros: int = 0) -> dict:
+    ordenadas = sorted(latencias)
+
+    def p(q):
+        if not ordenadas:
+            return 0.0
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000
+
+    return {
+        "pedidos": len(ordenadas),
+        "erros": erros,
+        "req_s": len(ordenadas) / duracao if duracao else 0.0,
+        "p50_ms": p(0.50),
+        "p95_ms": p(0.95),
+        "p99_ms": p(0.99),
+        "max_ms": ordenadas[-1] * 1000 if ordenadas else 0.0,
+    }
+
+
+def imprimir(titulo: str, r: dict):
+    print(
+        f"{titulo:<42} {r['pedidos']:>6} pedidos  {r['req_s']:>8.1f} req/s  "
+        f"p50 {r['p50_ms']:>7.1f} ms  p95 {r['p95_ms']:>7.1f} ms  "
+        f"p99 {r['p99_ms']:>7.1f} ms  erros {r['erros']}"
+    )
@@ -0,0 +1,104 @@
+# benchmarks/downloads.py
+import asyncio
+import argparse
+import time
+
+import httpx
+
+import comum
+
+# ================================
+# DOWNLOADS x RESTO DA API
+# ================================
+# Abre N downloads lentos (upstream falso a --mb-s por conexão) e, com eles
+# em andamento, mede rotas que não têm nada a ver com download:
+# - /admin/metricas: rota síncrona (threadpool do anyio)
+# - /jogos: rota async (event loop)
+# Mesma medição antes, sem downloads, como referência. Se o proxy segurasse
+# uma thread por download, a primeira esperaria na fila do threadpool.
+#
+#   python benchmarks/downloads.py --downloads 200 --tamanho-mb 16 --mb-s 1
+#   python benchmarks/downloads.py --sem-coalescer   # 1 conexão upstream por download
+
+
+async def medir_rotas(url: str, pedidos: int, concorrencia: int, prefixo: str):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as c:
+        for rota in ("/admin/metricas", "/jogos?fields=id,nome"):
+            r = await comum.carga(lambda _: c.get(rota), pedidos, concorrencia)
+            comum.imprimir(f"{prefixo:<15} GET {rota}", r)
+
+
+async def preparar_dados(url: str, upstream_url: str) -> tuple:
+    async with httpx.AsyncClient(base_url=url, timeout=30) as c:
+        r = await c.post("/register", json={"nome": "bench", "email": "bench@x.com", "password": "bench123"})
+        user_id = r.raise_for_status().json()["id"]
+        token = (await c.post("/admin/criar_token", json={"type": "Mensal"})).json()["tokens"][0]["token"]
+        (await c.post("/token/ativar", json={"token": token, "user_id": user_id})).raise_for_status()
+        r = await c.post("/admin/adicionar_jogo", json={"nome": "Bench", "descricao": "-", "dropbox_token": upstream_url})
+        return r.raise_for_status().json()["id"], user_id
+
+
+async def rodar(args, url: str, upstream_url: str):
+    jogo_id, user_id = await preparar_dados(url, upstream_url)
+    await medir_rotas(url, args.pedidos, args.concorrencia, "sem downloads")
+
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    recebidos = 0
+    primeiros_bytes = []
+    erros = 0
+
+    async def baixar(c: httpx.AsyncClient):
+        nonlocal recebidos, erros
+        t = time.perf_counter()
+        try:
+            async with c.stream("GET", f"/jogos/{jogo_id}/download", params={"user_id": user_id}) as r:
+                r.raise_for_status()
+                primeiro = True
+                async for chunk in r.aiter_raw():
+                    if primeiro:
+                        primeiros_bytes.append(time.perf_counter() - t)
+                        primeiro = False
+                    recebidos += len(chunk)
+        except httpx.HTTPError:
+            erros += 1
+
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limites) as c:
+        inicio = time.perf_counter()
+        tarefas = [asyncio.create_task(baixar(c)) for _ in range(args.downloads)]
+        # mede com os downloads já abertos (todos receberam o primeiro bloco)
+        while len(primeiros_bytes) + erros < args.downloads:
+            await asyncio.sleep(0.1)
+        await medir_rotas(url, args.pedidos, args.concorrencia, f"{args.downloads} downloads")
+        await asyncio.gather(*tarefas)
+        duracao = time.perf_counter() - inicio
+
+    ttfb = comum.resumo(primeiros_bytes, duracao)
+    print(
+        f"\ndownloads: {args.downloads} ({erros} com erro), {recebidos / 1024**2:.0f} MB em {duracao:.1f} s "
+        f"= {recebidos / 1024**2 / duracao:.1f} MB/s; primeiro byte p50 {ttfb['p50_ms']:.0f} ms, "
+        f"p99 {ttfb['p99_ms']:.0f} ms"
+    )
+    async with httpx.AsyncClient(base_url=url) as c:
+        m = (await c.get("/admin/metricas")).json()
+    print("coalescedor:", m["download_coalescer"])
+    print("cache de planos:", m["planos"])
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--downloads", type=int, default=200)
+    p.add_argument("--tamanho-mb", type=float, default=16)
+    p.add_argument("--mb-s", type=float, default=1, help="velocidade do upstream por conexão")
+    p.add_argument("--pedidos", type=int, default=500, help="pedidos por rota medida")
+    p.add_argument("--concorrencia", type=int, default=10)
+    p.add_argument("--sem-coalescer", action="store_true", help="DOWNLOAD_COALESCE=0")
+    args = p.parse_args()
+
+    ambiente = comum.preparar("downloads", DOWNLOAD_COALESCE="0" if args.sem_coalescer else "1")
+    upstream = comum.UpstreamLento(int(args.tamanho_mb * 1024**2), int(args.mb_s * 1024**2))
+    with upstream, comum.Servidor(ambiente) as servidor:
+        asyncio.run(rodar(args, servidor.url, upstream.url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/listar_usuarios.py
+import random
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import comum
+
+# ================================
+# /admin/listar_usuarios: CONSULTAS POR PEDIDO
+# ================================
+# Gera usuários (com plano ativo, vencido, permanente ou sem plano, e o token
+# de cada um) em tamanhos crescentes e conta quantas instruções SQL cada
+# pedido executa. No app (in-process): o contador escuta os engines.
+#
+#   python benchmarks/listar_usuarios.py --usuarios 1000,10000,100000
+LOTE = 5000
+TIPOS = ("Diario", "Semanal", "Mensal", "Trimestral", "Permanente")
+
+
+def popular(engine, models, de: int, ate: int):
+    from sqlalchemy import insert
+
+    agora = datetime.utcnow()
+    rnd = random.Random(de)
+    for inicio in range(de, ate, LOTE):
+        usuarios, tokens = [], []
+        for i in range(inicio, min(inicio + LOTE, ate)):
+            u = {
+                "id": i + 1, "nome": f"Usuário {i}", "email": f"u{i:07d}@bench.x", "password": "-",
+                "is_active": i % 50 != 0, "plan_type": None, "plan_expires_at": None, "plan_token": None,
+            }
+            tipo = rnd.choice(TIPOS + (None,))
+            if tipo:
+                token = f"BENCH-{i:08d}"
+                ativado = agora - timedelta(days=rnd.randint(0, 120))
+                expira = None if tipo == "Permanente" else ativado + timedelta(days=rnd.choice((1, 7, 30, 90)))
+                u.update(plan_type=tipo, plan_expires_at=expira, plan_token=token)
+                tokens.append({
+                    "token": token, "type": tipo, "active": True, "user_id": i + 1,
+                    "activated_at": ativado, "expires_at": expira,
+                })
+            usuarios.append(u)
+        with engine.begin() as conn:
+            conn.execute(insert(models.User), usuarios)
+            if tokens:
+                conn.execute(insert(models.TokenDB), tokens)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--usuarios", default="1000,10000,100000", help="tamanhos, em ordem crescente")
+    p.add_argument("--pedidos", type=int, default=50, help="pedidos medidos por cenário")
+    args = p.parse_args()
+    tamanhos = [int(n) for n in args.usuarios.split(",")]
+
+    comum.preparar("listar-usuarios")
+    comum.criar_schema()
+
+    from sqlalchemy import event
+    from fastapi.testclient import TestClient
+    from app import models, database
+    from app.main import app
+
+    consultas = 0
+
+    def contar(*_):
+        nonlocal consultas
+        consultas += 1
+
+    engines = {database.engine, database.read_engine, database.async_engine.sync_engine,
+               database.async_read_engine.sync_engine}
+    for e in engines:
+        event.listen(e, "before_cursor_execute", contar)
+
+    cenarios = {
+        "1ª página (100)": {"limit": 100},
+        "página de 1000": {"limit": 1000},
+        "status=VENCIDO": {"limit": 100, "status": "VENCIDO"},
+        "email prefixo": {"limit": 100, "email": "u00001"},
+    }
+
+    with TestClient(app) as c:
+        feitos = 0
+        for n in tamanhos:
+            popular(database.engine, models, feitos, n)
+            feitos = n
+            print(f"\n{n} usuários")
+            for nome, params in cenarios.items():
+                c.get("/admin/listar_usuarios", params=params)   # aquece
+                latencias, antes = [], consultas
+                for _ in range(args.pedidos):
+                    t = time.perf_counter()
+                    c.get("/admin/listar_usuarios", params=params).raise_for_status()
+                    latencias.append(time.perf_counter() - t)
+                r = comum.resumo(latencias, sum(latencias))
+                print(
+                    f"  {nome:<18} {(consultas - antes) / args.pedidos:>4.1f} consultas/pedido  "
+                    f"p50 {r['p50_ms']:>7.1f} ms  p99 {r['p99_ms']:>7.1f} ms"
+                )
+
+            # lista inteira, página a página
+            antes, paginas, t = consultas, 0, time.perf_counter()
+            params = {"limit": 1000}
+            while True:
+                dados = c.get("/admin/listar_usuarios", params=params).json()
+                paginas += 1
+                if not dados["next"]:
+                    break
+                params["after"] = dados["next"]
+            print(
+                f"  {'lista inteira':<18} {(consultas - antes) / paginas:>4.1f} consultas/página  "
+                f"{paginas} páginas em {time.perf_counter() - t:.2f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/sqlite_perfis.py
+import os
+import sys
+import random
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+import comum
+
+# ================================
+# PERFIS DO SQLITE SOB CARGA MISTA
+# ================================
+# Mesma carga contra SQLITE_PROFILE=legacy (1 conexão compartilhada,
+# StaticPool) e SQLITE_PROFILE=wal (1 escritora + pool de leitoras, WAL):
+# - 40% login
+# - 40% listagens (/admin/listar_usuarios, /jogos, /admin/listar_tokens)
+# - 20% ativação de token (escrita)
+#
+# Cada perfil roda num processo próprio (o engine é escolhido na importação
+# de app.database), com banco novo e os mesmos dados.
+#
+#   python benchmarks/sqlite_perfis.py --pedidos 4000 --concorrencia 32
+
+
+async def carga_mista(url: str, usuarios: int, pedidos: int, concorrencia: int) -> tuple:
+    rnd = random.Random(1)
+    tipos = [rnd.choices(("login", "listagem", "ativacao"), (4, 4, 2))[0] for _ in range(pedidos)]
+    listagens = ("/admin/listar_usuarios?limit=100", "/jogos?fields=id,nome", "/admin/listar_tokens?limit=100")
+    limites = httpx.Limits(max_connections=concorrencia)
+    latencias = {t: [] for t in ("login", "listagem", "ativacao")}
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limites) as c:
+        async def pedido(i):
+            tipo = tipos[i]
+            t = asyncio.get_running_loop().time()
+            if tipo == "login":
+                u = rnd.randint(1, usuarios)
+                r = await c.post("/login", json={"email": f"u{u}@bench.x", "password": comum.SENHA})
+            elif tipo == "listagem":
+                r = await c.get(listagens[i % len(listagens)])
+            else:
+                # cada pedido ativa um token ainda livre
+                r = await c.post("/token/ativar", json={"token": f"BENCH-{i:08d}", "user_id": rnd.randint(1, usuarios)})
+            latencias[tipo].append(asyncio.get_running_loop().time() - t)
+            return r
+
+        total = await comum.carga(pedido, pedidos, concorrencia)
+    por_tipo = {t: comum.resumo(lat, sum(lat)) for t, lat in latencias.items()}
+    return total, por_tipo
+
+
+def rodar_perfil(args):
+    ambiente = comum.preparar(f"sqlite-{args.perfil}", SQLITE_PROFILE=args.perfil)
+    comum.criar_schema()
+    comum.popular(args.usuarios, args.jogos, args.pedidos)
+    with comum.Servidor(ambiente) as servidor:
+        total, por_tipo = asyncio.run(carga_mista(servidor.url, args.usuarios, args.pedidos, args.concorrencia))
+    comum.imprimir(f"{args.perfil}: tudo", total)
+    for tipo, r in por_tipo.items():
+        # req/s por tipo não faz sentido (disputam o mesmo tempo): só latência
+        print(f"  {tipo:<10} {r['pedidos']:>6} pedidos  p50 {r['p50_ms']:>7.1f} ms  "
+              f"p95 {r['p95_ms']:>7.1f} ms  p99 {r['p99_ms']:>7.1f} ms")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--perfil", choices=("legacy", "wal"), help="só este perfil (padrão: os dois)")
+    p.add_argument("--pedidos", type=int, default=4000)
+    p.add_argument("--concorrencia", type=int, default=32)
+    p.add_argument("--usuarios", type=int, default=5000)
+    p.add_argument("--jogos", type=int, default=500)
+    args = p.parse_args()
+
+    if args.perfil:
+        rodar_perfil(args)
+        return
+    for perfil in ("legacy", "wal"):
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--perfil", perfil, *sys.argv[1:]], check=True)
+
+
+if __name__ == "__main__":
+    main()
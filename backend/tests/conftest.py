@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+# banco de teste isolado (SQLite em diretório temporário): precisa estar no
+# ambiente antes do primeiro import de app.*
+os.environ.pop("DATABASE_URL", None)
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="primex-tests-")
+os.environ["MANUTENCAO_INTERVALO"] = "0"
+os.environ["METADADOS_ATIVO"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def engine():
+    # schema como na subida do app: create_all + migrações
+    from app import models, migrations
+    from app.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    migrations.aplicar_migracoes(engine)
+    return engine
@@ -0,0 +1,132 @@
+# tests/test_ativacao_token.py
+import asyncio
+import threading
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, select, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app import crud, models
+from app.database import DATABASE_URL, ASYNC_DATABASE_URL
+
+# ================================
+# ATIVAÇÃO CONCORRENTE (UPDATE condicional de crud._sql_ativar)
+# ================================
+# Cada chamador usa a sua própria conexão (NullPool): a disputa acontece no
+# banco, não na fila do pool de 1 escritor do app.
+THREADS = 64
+TAREFAS = 256
+
+USADO = crud.FALHAS_ATIVACAO["usado"][1]
+
+
+def _criar(engine, prefixo: str, n_usuarios: int, tipo: str = "Mensal"):
+    token = f"{prefixo}-TOKEN"
+    with engine.begin() as conn:
+        conn.execute(insert(models.TokenDB), [{"token": token, "type": tipo, "active": False}])
+        ids = [
+            conn.execute(
+                insert(models.User).values(nome=f"{prefixo}{i}", email=f"{prefixo}{i}@teste", password="x")
+            ).inserted_primary_key[0]
+            for i in range(n_usuarios)
+        ]
+    return token, ids
+
+
+def _conferir_vencedor(engine, token: str, resultados: list):
+    # resultados: [(user_id, ativado, motivo)]
+    vencedores = [(uid, ativado) for uid, ativado, _ in resultados if ativado is not None]
+    assert len(vencedores) == 1, vencedores
+    perdedores = [motivo for _, ativado, motivo in resultados if ativado is None]
+    assert len(perdedores) == len(resultados) - 1
+    assert {crud.FALHAS_ATIVACAO[m][1] for m in perdedores} == {USADO}
+
+    uid, _ = vencedores[0]
+    with engine.connect() as conn:
+        t = conn.execute(select(models.TokenDB).where(models.TokenDB.token == token)).one()
+        planos = conn.execute(
+            select(models.User.id).where(models.User.plan_token == token)
+        ).scalars().all()
+    assert t.active and t.user_id == uid
+    # só o vencedor ficou com o plano
+    assert planos == [uid]
+
+
+def test_threads_disputando_o_mesmo_token(engine):
+    token, usuarios = _criar(engine, "thr", THREADS)
+    proprio = create_engine(DATABASE_URL, poolclass=NullPool, connect_args={"timeout": 30})
+    Sessao = sessionmaker(bind=proprio, autoflush=False)
+    largada = threading.Barrier(THREADS)
+    resultados = []
+    trava = threading.Lock()
+
+    def ativar(user_id):
+        with Sessao() as db:
+            largada.wait()
+            ativado, motivo = crud.ativar_token(db, token, user_id)
+        with trava:
+            resultados.append((user_id, ativado, motivo))
+
+    threads = [threading.Thread(target=ativar, args=(uid,)) for uid in usuarios]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    proprio.dispose()
+
+    assert len(resultados) == THREADS
+    _conferir_vencedor(engine, token, resultados)
+
+
+def test_tarefas_async_disputando_o_mesmo_token(engine):
+    token, usuarios = _criar(engine, "aio", TAREFAS)
+
+    async def disputar():
+        proprio = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool, connect_args={"timeout": 30})
+        Sessao = async_sessionmaker(bind=proprio, autoflush=False, expire_on_commit=False)
+
+        async def ativar(user_id):
+            async with Sessao() as db:
+                ativado, motivo = await crud.ativar_token_async(db, token, user_id)
+            return user_id, ativado, motivo
+
+        try:
+            return await asyncio.gather(*(ativar(uid) for uid in usuarios))
+        finally:
+            await proprio.dispose()
+
+    resultados = asyncio.run(disputar())
+    _conferir_vencedor(engine, token, resultados)
+
+
+@pytest.mark.parametrize("tipo", sorted(crud.durations))
+def test_expiracao_por_tipo(engine, tipo):
+    # cada ramo do CASE de _sql_ativar (Permanente = sem expiração)
+    token, (uid,) = _criar(engine, f"dur-{tipo}", 1, tipo)
+    with sessionmaker(bind=engine)() as db:
+        ativado, motivo = crud.ativar_token(db, token, uid)
+        assert motivo is None
+        t = db.execute(select(models.TokenDB).where(models.TokenDB.token == token)).scalar_one()
+        u = db.get(models.User, uid)
+
+    dur = crud.durations[tipo]
+    esperado = t.activated_at + dur if dur else None
+    assert ativado.expires_at == esperado
+    assert t.expires_at == esperado
+    assert (u.plan_type, u.plan_expires_at, u.plan_token) == (tipo, esperado, token)
+
+
+def test_token_vencido_sem_uso_nao_ativa(engine):
+    token, (uid,) = _criar(engine, "venc", 1)
+    with engine.begin() as conn:
+        conn.execute(
+            models.TokenDB.__table__.update()
+            .where(models.TokenDB.token == token)
+            .values(expires_at=models.TokenDB.created_at - timedelta(days=1))
+        )
+    with sessionmaker(bind=engine)() as db:
+        assert crud.ativar_token(db, token, uid) == (None, "expirado")
+        assert crud.ativar_token(db, "NAO-EXISTE", uid) == (None, "inexistente")
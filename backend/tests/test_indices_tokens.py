@@ -0,0 +1,100 @@
+# tests/test_indices_tokens.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text, insert
+
+from app import crud, migrations
+from app.models import TokenDB
+from app.manutencao import consulta_vencidos, consulta_arquivaveis
+
+# ================================
+# EXPLAIN QUERY PLAN das consultas quentes de tokens
+# ================================
+# As consultas vêm das mesmas funções que as rotas/manutenção usam; cada uma
+# tem que sair por um ix_tokens_* e nunca por um SCAN da tabela inteira.
+AGORA = datetime(2026, 1, 1)
+
+CONSULTAS = {
+    "listagem": (lambda: crud.consulta_tokens(AGORA).limit(101), "ix_tokens_created_token"),
+    "listagem_cursor": (
+        lambda: crud.consulta_tokens(AGORA, (AGORA, "ZZZ")).limit(101), "ix_tokens_created_token",
+    ),
+    "livres": (lambda: crud.consulta_tokens(AGORA, active=False).limit(101), "ix_tokens_livres"),
+    "livres_cursor": (
+        lambda: crud.consulta_tokens(AGORA, (AGORA, "ZZZ"), active=False).limit(101), "ix_tokens_livres",
+    ),
+    "ativos": (lambda: crud.consulta_tokens(AGORA, active=True).limit(101), "ix_tokens_created_token"),
+    "varredura_vencidos": (lambda: consulta_vencidos(AGORA).limit(1000), "ix_tokens_expiracao_ativos"),
+    "arquivamento": (
+        lambda: consulta_arquivaveis(AGORA - timedelta(days=30)).limit(1000), "ix_tokens_expiracao_ativos",
+    ),
+}
+
+
+def plano(engine, consulta) -> list:
+    compilada = consulta.compile(engine)
+    params = tuple(compilada.params[p] for p in compilada.positiontup)
+    with engine.connect() as conn:
+        return [r[3] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compilada), params)]
+
+
+def conferir(engine, nome):
+    consulta, indice = CONSULTAS[nome]
+    linhas = plano(engine, consulta())
+    assert any(f"INDEX {indice}" in linha for linha in linhas), linhas
+    assert not any(linha.startswith("SCAN tokens") and "INDEX" not in linha for linha in linhas), linhas
+    # a ordem da listagem vem do índice, sem ordenar em memória
+    assert not any("TEMP B-TREE" in linha for linha in linhas if nome.startswith(("listagem", "livres"))), linhas
+
+
+@pytest.mark.parametrize("nome", sorted(CONSULTAS))
+def test_consulta_usa_indice(engine, nome):
+    conferir(engine, nome)
+
+
+@pytest.fixture
+def com_estatisticas(engine):
+    # banco com dados e ANALYZE (o que PRAGMA optimize faz em produção)
+    linhas = []
+    for i in range(3000):
+        usado = i % 2 == 0
+        linhas.append({
+            "token": f"T{i:05d}", "type": "Mensal", "active": usado,
+            "created_at": AGORA - timedelta(minutes=i),
+            "activated_at": AGORA - timedelta(minutes=i) if usado else None,
+            "expires_at": AGORA + timedelta(days=(i % 60) - 30) if usado and i % 10 else None,
+            "expirado": usado and i % 3 == 0,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(TokenDB), linhas)
+        conn.execute(text("ANALYZE"))
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM tokens"))
+        conn.execute(text("DROP TABLE IF EXISTS sqlite_stat1"))
+
+
+@pytest.mark.parametrize("nome", sorted(CONSULTAS))
+def test_consulta_usa_indice_com_estatisticas(com_estatisticas, nome):
+    conferir(com_estatisticas, nome)
+
+
+def test_migracao_corrige_indices_de_banco_antigo(engine):
+    # banco criado antes da migração 10: índices com a definição antiga
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_tokens_expiracao_ativos"))
+        conn.execute(text("DROP INDEX ix_tokens_livres"))
+        conn.execute(text("CREATE INDEX ix_tokens_active_expires ON tokens (active, expires_at)"))
+        conn.execute(text("CREATE INDEX ix_tokens_expiracao_ativos ON tokens (expires_at) WHERE active"))
+
+        migrations._m010_indices_parciais_tokens(conn)
+
+        indices = dict(conn.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tokens'"
+        )).all())
+    assert "ix_tokens_active_expires" not in indices
+    assert "active = 1" in indices["ix_tokens_expiracao_ativos"]
+    assert "ix_tokens_livres" in indices
+    conferir(engine, "varredura_vencidos")
+    conferir(engine, "livres")
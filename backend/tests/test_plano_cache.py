@@ -0,0 +1,36 @@
+# tests/test_plano_cache.py
+from datetime import datetime, timedelta
+
+from app.plano_cache import PlanoCache
+
+# ================================
+# CACHE DE PLANO: leitura velha x invalidar
+# ================================
+FUTURO = datetime.utcnow() + timedelta(days=30)
+
+
+def test_leitura_anterior_a_invalidacao_nao_volta_ao_cache():
+    c = PlanoCache(100, 300)
+    assert c.consultar(1) is None
+
+    # pedido de download: pega a geração e lê o banco (usuário com plano)
+    geracao = c.geracao(1)
+    # no meio da consulta o admin remove o plano e invalida
+    c.invalidar(1)
+    # a leitura velha ainda responde este pedido, mas não é guardada
+    assert c.guardar(1, geracao, True, True, FUTURO) is True
+    assert c.consultar(1) is None
+    assert c.stats()["descartes"] == 1
+
+    # a próxima leitura (já depois da alteração) é guardada normalmente
+    assert c.guardar(1, c.geracao(1), True, False, None) is False
+    assert c.consultar(1) is False
+
+
+def test_invalidar_outro_usuario_nao_descarta():
+    c = PlanoCache(100, 300)
+    geracao = c.geracao(1)
+    c.invalidar(2)
+    c.guardar(1, geracao, True, True, None)
+    assert c.consultar(1) is True
+    assert c.stats()["descartes"] == 0
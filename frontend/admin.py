@@ -64,50 +64,96 @@ def request_api(parent, method: str, path: str, *, json_body=None, timeout=15):
     }
     return requests.request(method, url, json=json_body, headers=headers, timeout=timeout)
 
+ADMIN_PAGINA = 100   # itens por página nas listas do painel
+
+
+def get_page(path: str, key: str, after=None, *, timeout=15, limit=ADMIN_PAGINA):
+    """
+    Uma página de uma listagem paginada do backend (?after=&limit=).
+    Retorna (resposta, itens, next); next = None na última página. Se a
+    página falhar, a resposta com erro volta para quem chamou tratar.
+    """
+    params = {"limit": limit}
+    if after:
+        params["after"] = after
+    response = requests.get(api_url(path), params=params, timeout=timeout)
+    if response.status_code != 200:
+        return response, [], None
+
+    data = response.json()
+    return response, data.get(key, []), data.get("next")
+
 
 
 class LoadTokensThread(QThread):
-    success = pyqtSignal(list)
+    success = pyqtSignal(list, object)   # itens da página, cursor da próxima
     error = pyqtSignal(str)
 
+    def __init__(self, after=None):
+        super().__init__()
+        self.after = after
+
     def run(self):
         try:
-            url = api_url("/admin/listar_tokens")
-            response = requests.get(url, timeout=10)
+            response, tokens, proximo = get_page("/admin/listar_tokens", "tokens", self.after, timeout=10)
 
             if response.status_code != 200:
                 self.error.emit(f"Erro {response.status_code}: {response.text}")
                 return
 
-            data = response.json()
-            tokens = data.get("tokens", [])
-            self.success.emit(tokens)
+            self.success.emit(tokens, proximo)
 
         except Exception as e:
             self.error.emit(str(e))
 
 
 class LoadUsersThread(QThread):
-    success = pyqtSignal(list)
+    success = pyqtSignal(list, object)   # itens da página, cursor da próxima
     error = pyqtSignal(str)
 
+    def __init__(self, after=None):
+        super().__init__()
+        self.after = after
+
     def run(self):
         try:
-            url = api_url("/admin/listar_usuarios")
-            response = requests.get(url, timeout=15)
+            response, usuarios, proximo = get_page("/admin/listar_usuarios", "usuarios", self.after, timeout=15)
 
             if response.status_code != 200:
                 self.error.emit(f"Erro {response.status_code}: {response.text}")
                 return
 
-            data = response.json()
-            usuarios = data.get("usuarios", [])
-            self.success.emit(usuarios)
+            self.success.emit(usuarios, proximo)
 
         except Exception as e:
             self.error.emit(str(e))
 
 
+def carregar_ao_rolar(lista: QListWidget, carregar_mais):
+    # chegou perto do fim da lista: pede a próxima página
+    barra = lista.verticalScrollBar()
+    barra.valueChanged.connect(
+        lambda v: carregar_mais() if barra.maximum() > 0 and v >= barra.maximum() - 3 else None
+    )
+
+
+def botao_carregar_mais(acao):
+    btn = QPushButton("Carregar mais")
+    btn.setStyleSheet("""
+        QPushButton {
+            background-color: #2a245f;
+            color: white;
+            font-size: 14px;
+            padding: 8px;
+            border-radius: 6px;
+        }
+        QPushButton:hover { background-color: #3b3390; }
+    """)
+    btn.clicked.connect(lambda: acao())
+    btn.setVisible(False)
+    return btn
+
+
 
 class AdminPage(QWidget):
 
@@ -268,6 +314,13 @@ class AdminPage(QWidget):
             }
         """)
         layout.addWidget(self.token_list)
+        carregar_ao_rolar(self.token_list, self.load_more_tokens)
+        self._tokens_next = None
+        self._tokens_loading = False
+        self._tokens_geracao = 0   # "Atualizar" no meio de uma carga descarta a página velha
+
+        self.tokens_more_btn = botao_carregar_mais(self.load_more_tokens)
+        layout.addWidget(self.tokens_more_btn)
 
         refresh_btn = QPushButton("Atualizar Tokens")
         refresh_btn.setStyleSheet("""
@@ -297,25 +350,57 @@ class AdminPage(QWidget):
         return lambda: self.copiar_token(tok)
 
     def load_tokens(self):
+        # recomeça da primeira página; as outras vêm ao rolar / "Carregar mais"
         self.token_list.clear()
+        self._tokens_next = None
+        self._tokens_geracao += 1
+        self._carregar_tokens(None)
 
-        th = LoadTokensThread()
-        th.success.connect(self.populate_tokens)
+    def load_more_tokens(self):
+        if self._tokens_next and not self._tokens_loading:
+            self._carregar_tokens(self._tokens_next)
+
+    def _carregar_tokens(self, after):
+        self._tokens_loading = True
+        self.tokens_more_btn.setEnabled(False)
+
+        th = LoadTokensThread(after)
+        geracao = self._tokens_geracao
+        th.success.connect(lambda tokens, proximo: self.populate_tokens(tokens, proximo) if geracao == self._tokens_geracao else None)
         th.error.connect(self.show_token_error)
         th.finished.connect(lambda: self.threads.remove(th) if th in self.threads else None)
+        th.finished.connect(self._tokens_carregados)
 
         self.threads.append(th)
         th.start()
 
-    def populate_tokens(self, tokens):
+    def _tokens_carregados(self):
+        self._tokens_loading = False
+        self.tokens_more_btn.setEnabled(True)
+        self.tokens_more_btn.setVisible(bool(self._tokens_next))
+
+    def populate_tokens(self, tokens, proximo=None):
+        # acrescenta a página ao fim da lista
         from datetime import datetime
 
-        self.token_list.clear()
+        self._tokens_next = proximo
+
+        cores_status = {
+            "DISPONÍVEL": "#4CAF50",  # verde
+            "PERMANENTE": "#2196F3",  # azul
+            "EXPIRADO": "#FFC107",    # amarelo
+            "ATIVO": "#F44336",       # vermelho
+        }
 
         for t in tokens:
 
             # ---------- STATUS ----------
-            if not t.get("active"):
+            if t.get("status") in cores_status:
+                # backend já manda o status calculado
+                status_text = t["status"]
+                status_color = cores_status[status_text]
+
+            elif not t.get("active"):
                 status_text = "DISPONÍVEL"
                 status_color = "#4CAF50"  # verde
 
@@ -472,6 +557,13 @@ class AdminPage(QWidget):
             }
         """)
         layout.addWidget(self.user_list)
+        carregar_ao_rolar(self.user_list, self.load_more_users)
+        self._users_next = None
+        self._users_loading = False
+        self._users_geracao = 0   # "Atualizar" no meio de uma carga descarta a página velha
+
+        self.users_more_btn = botao_carregar_mais(self.load_more_users)
+        layout.addWidget(self.users_more_btn)
 
         btns = QHBoxLayout()
 
@@ -494,20 +586,40 @@ class AdminPage(QWidget):
         return frame
 
     def load_users(self):
+        # recomeça da primeira página; as outras vêm ao rolar / "Carregar mais"
         self.user_list.clear()
+        self._users_next = None
+        self._users_geracao += 1
+        self._carregar_usuarios(None)
+
+    def load_more_users(self):
+        if self._users_next and not self._users_loading:
+            self._carregar_usuarios(self._users_next)
 
-        th = LoadUsersThread()
-        th.success.connect(self.populate_users)
+    def _carregar_usuarios(self, after):
+        self._users_loading = True
+        self.users_more_btn.setEnabled(False)
+
+        th = LoadUsersThread(after)
+        geracao = self._users_geracao
+        th.success.connect(lambda usuarios, proximo: self.populate_users(usuarios, proximo) if geracao == self._users_geracao else None)
         th.error.connect(lambda msg: QMessageBox.critical(self, "Erro", f"Falha ao carregar usuários:\n{msg}"))
         th.finished.connect(lambda: self.threads.remove(th) if th in self.threads else None)
+        th.finished.connect(self._usuarios_carregados)
 
         self.threads.append(th)
         th.start()
 
-    def populate_users(self, usuarios):
+    def _usuarios_carregados(self):
+        self._users_loading = False
+        self.users_more_btn.setEnabled(True)
+        self.users_more_btn.setVisible(bool(self._users_next))
+
+    def populate_users(self, usuarios, proximo=None):
+        # acrescenta a página ao fim da lista
         from datetime import datetime
 
-        self.user_list.clear()
+        self._users_next = proximo
 
         for u in usuarios:
             user_id = u.get("id")
@@ -728,6 +840,11 @@ class AdminPage(QWidget):
         self.game_cover.setStyleSheet("padding: 5px; border: 2px solid #007eff; border-radius: 5px; color: white;")
         layout.addWidget(self.game_cover)
 
+        self.game_genres = QLineEdit()
+        self.game_genres.setPlaceholderText("Gêneros, separados por vírgula (ex.: Ação, RPG)")
+        self.game_genres.setStyleSheet("padding: 5px; border: 2px solid #007eff; border-radius: 5px; color: white;")
+        layout.addWidget(self.game_genres)
+
         # Botão para salvar
         save_btn = QPushButton("Salvar Jogo")
         save_btn.setStyleSheet("""
@@ -753,7 +870,8 @@ class AdminPage(QWidget):
             "nome": (self.game_name.text() or "").strip(),
             "descricao": (self.game_desc.toPlainText() or "").strip(),
             "dropbox_token": (self.game_dropbox.text() or "").strip(),
-            "capa_url": (self.game_cover.text() or "").strip()
+            "capa_url": (self.game_cover.text() or "").strip(),
+            "genero": [g.strip() for g in (self.game_genres.text() or "").split(",") if g.strip()]
         }
 
         if not data["nome"]:
@@ -781,6 +899,7 @@ class AdminPage(QWidget):
             self.game_desc.clear()
             self.game_dropbox.clear()
             self.game_cover.clear()
+            self.game_genres.clear()
 
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Falha ao conectar ao servidor:\n{e}")
@@ -796,6 +915,10 @@ class AdminPage(QWidget):
         self.games_list = QVBoxLayout()  # usamos QVBoxLayout para ter botões junto
         layout.addLayout(self.games_list)
 
+        self._games_next = None
+        self.games_more_btn = botao_carregar_mais(self.load_more_games)
+        layout.addWidget(self.games_more_btn)
+
         refresh_btn = QPushButton("Atualizar Lista")
         refresh_btn.setStyleSheet("background-color: #007eff; color: white; font-size: 18px;")
         refresh_btn.clicked.connect(self.load_games)
@@ -805,8 +928,16 @@ class AdminPage(QWidget):
         return frame
 
     def load_games(self):
+        self._carregar_jogos(None)
+
+    def load_more_games(self):
+        if self._games_next:
+            self._carregar_jogos(self._games_next)
+
+    def _carregar_jogos(self, after):
+        # after=None: recomeça da primeira página; senão acrescenta a próxima
         try:
-            response = request_api(self, "GET", "/admin/listar_jogos", timeout=20)
+            response, jogos, proximo = get_page("/admin/listar_jogos", "jogos", after, timeout=20)
 
             if response.status_code != 200:
                 payload = safe_json(response) or {}
@@ -815,15 +946,16 @@ class AdminPage(QWidget):
                 QMessageBox.warning(self, "Erro", f"Falha ao carregar jogos ({response.status_code}).\n\n{detail}")
                 return
 
-            data = safe_json(response) or {}
-            jogos = data.get("jogos", [])
+            if after is None:
+                # limpar lista
+                while self.games_list.count():
+                    item = self.games_list.takeAt(0)
+                    w = item.widget()
+                    if w:
+                        w.deleteLater()
 
-            # limpar lista
-            while self.games_list.count():
-                item = self.games_list.takeAt(0)
-                w = item.widget()
-                if w:
-                    w.deleteLater()
+            self._games_next = proximo
+            self.games_more_btn.setVisible(bool(proximo))
 
             for jogo in jogos:
                 row_widget = QFrame()
@@ -891,6 +1023,10 @@ class AdminPage(QWidget):
         capa_input.setPlaceholderText("URL da capa")
         layout.addWidget(capa_input)
 
+        generos_input = QLineEdit(", ".join(jogo.get("genero", [])))
+        generos_input.setPlaceholderText("Gêneros, separados por vírgula")
+        layout.addWidget(generos_input)
+
         save_btn = QPushButton("Salvar Alterações")
         save_btn.setStyleSheet("background-color: #007eff; color: white; font-size: 14px;")
         layout.addWidget(save_btn)
@@ -903,7 +1039,8 @@ class AdminPage(QWidget):
                         "nome": (nome_input.text() or "").strip(),
                         "descricao": (desc_input.toPlainText() or "").strip(),
                         "dropbox_token": (token_input.text() or "").strip(),
-                        "capa_url": (capa_input.text() or "").strip()
+                        "capa_url": (capa_input.text() or "").strip(),
+                        "genero": [g.strip() for g in (generos_input.text() or "").split(",") if g.strip()]
                     },
                     timeout=20
                 )
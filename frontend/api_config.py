@@ -2,4 +2,6 @@ import os
 
 API_BASE = os.getenv("PRIMEX_API_BASE", "https://apiprimex.online").rstrip("/")
 
-
+# catálogo estático publicado pelo backend (CATALOGO_PUBLICAR_DIR) atrás de
+# nginx/CDN; vazio = catálogo direto da API
+CATALOGO_BASE = os.getenv("PRIMEX_CATALOGO_BASE", "").rstrip("/")
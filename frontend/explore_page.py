@@ -6,15 +6,16 @@ from PyQt6.QtWidgets import (
     QGridLayout, QSizePolicy, QSpacerItem, QLineEdit, QMenu, QMessageBox
 )
 from PyQt6.QtGui import QPixmap, QImage, QIcon, QPainter, QColor
-from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtCore import Qt, QSize, QTimer, QThread, pyqtSignal
 from profile import ProfilePage
 from admin import AdminPage
 from navbar import NavBar
 from downloader import baixar_jogo, decrypt_file_to
 from filter_bar import FilterBar
 from PyQt6.QtGui import QFontDatabase
-from api_config import API_BASE
+from api_config import API_BASE, CATALOGO_BASE
 import hashlib
+import gzip
 import requests
 
 
@@ -26,6 +27,193 @@ FONT_PATH = os.path.join(os.getcwd(), "assets", "fonts", "VT323-Regular.ttf")
 base_dir = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
 GAMES_DIR = os.path.join(base_dir, "PrimeX", "games")
 JSON_INSTALLED = os.path.join(GAMES_DIR, "instalados.json")
+CATALOGO_CACHE = os.path.join(base_dir, "PrimeX", "cache", "catalogo.json")
+CATALOGO_CAMPOS = "id,nome,capa_thumb,genero"
+BUSCA_ATRASO_MS = 300   # espera o usuário parar de digitar antes de buscar
+BUSCA_PAGINA = 100
+
+
+def _ler_cache_catalogo():
+    try:
+        with open(CATALOGO_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _salvar_cache_catalogo(cache: dict):
+    try:
+        os.makedirs(os.path.dirname(CATALOGO_CACHE), exist_ok=True)
+        with open(CATALOGO_CACHE, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    except Exception:
+        pass
+
+
+def load_catalogo_estatico(cache: dict):
+    """
+    Catálogo publicado como arquivos (latest.json -> catalog-<versao>.json.gz).
+    Só baixa o catálogo quando a versão do latest.json muda.
+    """
+    r = requests.get(f"{CATALOGO_BASE}/latest.json", timeout=10)
+    r.raise_for_status()
+    latest = r.json()
+    if cache.get("estatico") == CATALOGO_BASE and cache.get("versao") == latest["versao"]:
+        return cache.get("jogos", [])
+
+    r = requests.get(f"{CATALOGO_BASE}/{latest['catalogo']}", timeout=30)
+    r.raise_for_status()
+    dados = r.content
+    if dados[:2] == b"\x1f\x8b":   # servidor pode já ter descomprimido
+        dados = gzip.decompress(dados)
+    jogos = json.loads(dados.decode("utf-8")).get("jogos", [])
+    for jogo in jogos:
+        # capas publicadas vêm relativas ao diretório do catálogo
+        thumb = jogo.get("capa_thumb")
+        if thumb and not thumb.startswith(("http://", "https://")):
+            jogo["capa_thumb"] = f"{CATALOGO_BASE}/{thumb}"
+
+    _salvar_cache_catalogo({"estatico": CATALOGO_BASE, "versao": latest["versao"], "jogos": jogos})
+    return jogos
+
+
+def sync_catalogo(cache: dict):
+    """
+    Atualiza a cópia local só com o que mudou desde cache["versao"]
+    (/jogos/sync). None quando o servidor pede o catálogo inteiro.
+    """
+    r = requests.get(
+        f"{API_BASE}/jogos/sync",
+        params={"since": cache["versao"], "fields": CATALOGO_CAMPOS},
+        timeout=15,
+    )
+    r.raise_for_status()
+    dados = r.json()
+    if dados.get("resync"):
+        return None
+    if dados["versao"] == cache["versao"]:
+        return cache.get("jogos", [])
+
+    por_id = {j["id"]: j for j in cache.get("jogos", [])}
+    for jogo_id in dados.get("removidos", []):
+        por_id.pop(jogo_id, None)
+    for jogo in dados.get("upserts", []):
+        por_id[jogo["id"]] = jogo
+    jogos = [por_id[k] for k in sorted(por_id)]
+
+    # ETag antigo não vale mais: o próximo /jogos completo vem inteiro
+    _salvar_cache_catalogo({"versao": dados["versao"], "fields": CATALOGO_CAMPOS, "jogos": jogos})
+    return jogos
+
+
+def load_catalogo():
+    """
+    Catálogo público com cache local: se já temos uma cópia, pede só o que
+    mudou (/jogos/sync). Sem cópia (ou se o servidor pedir), baixa o /jogos
+    com o ETag da última resposta; nada mudou = 304 e usamos o do disco.
+    Com PRIMEX_CATALOGO_BASE, lê o catálogo estático (e cai na API se falhar).
+    """
+    cache = _ler_cache_catalogo()
+    if CATALOGO_BASE:
+        try:
+            return load_catalogo_estatico(cache)
+        except Exception:
+            pass
+
+    if cache.get("fields") == CATALOGO_CAMPOS and cache.get("versao") is not None:
+        try:
+            jogos = sync_catalogo(cache)
+            if jogos is not None:
+                return jogos
+        except Exception:
+            pass
+
+    headers = {}
+    if cache.get("etag") and cache.get("fields") == CATALOGO_CAMPOS:
+        headers["If-None-Match"] = cache["etag"]
+
+    r = requests.get(f"{API_BASE}/jogos", params={"fields": CATALOGO_CAMPOS}, headers=headers, timeout=15)
+    if r.status_code == 304:
+        return cache.get("jogos", [])
+    r.raise_for_status()
+
+    dados = r.json()
+    jogos = dados.get("jogos", [])
+    _salvar_cache_catalogo({
+        "etag": r.headers.get("ETag"), "versao": dados.get("versao"),
+        "fields": CATALOGO_CAMPOS, "jogos": jogos,
+    })
+    return jogos
+
+
+def url_capa(thumb):
+    # API: caminho (/jogos/{id}/capa?v=...); catálogo estático: URL completa
+    if not thumb:
+        return ""
+    if thumb.startswith(("http://", "https://")):
+        return thumb
+    return f"{API_BASE}{thumb}"
+
+
+def buscar_ids(texto: str):
+    """
+    Ids dos jogos que batem com a busca (full-text no servidor: ignora
+    acentos, aceita prefixo). Segue o "next" até a última página. None se
+    o servidor não respondeu. Bloqueante: chamar fora da thread da UI.
+    """
+    ids = set()
+    after = None
+    try:
+        while True:
+            params = {"q": texto, "limit": BUSCA_PAGINA, "fields": "id"}
+            if after:
+                params["after"] = after
+            r = requests.get(f"{API_BASE}/jogos/busca", params=params, timeout=5)
+            r.raise_for_status()
+            dados = r.json()
+            ids.update(j["id"] for j in dados.get("jogos", []))
+            after = dados.get("next")
+            if not after:
+                return ids
+    except Exception:
+        return None
+
+
+class BuscaThread(QThread):
+    # texto buscado + ids (None se o servidor não respondeu)
+    pronto = pyqtSignal(str, object)
+
+    def __init__(self, texto: str):
+        super().__init__()
+        self.texto = texto
+
+    def run(self):
+        self.pronto.emit(self.texto, buscar_ids(self.texto))
+
+
+def load_generos(selecionados=()):
+    """
+    [{"genero", "total"}] para o menu: quantos jogos cada gênero tem junto
+    com os já selecionados. None se o servidor não respondeu.
+    """
+    try:
+        r = requests.get(f"{API_BASE}/jogos/generos", params={"genero": sorted(selecionados)}, timeout=5)
+        r.raise_for_status()
+        return r.json().get("generos", [])
+    except Exception:
+        return None
+
+
+class GenerosThread(QThread):
+    # gêneros selecionados na hora do pedido + contagens (None se falhou)
+    pronto = pyqtSignal(object, object)
+
+    def __init__(self, selecionados):
+        super().__init__()
+        self.selecionados = frozenset(selecionados)
+
+    def run(self):
+        self.pronto.emit(self.selecionados, load_generos(self.selecionados))
 
 
 def load_installed():
@@ -250,6 +438,11 @@ class GameCard(QWidget):
     # =========================
     # MÉTODOS AUXILIARES
     # =========================
+    def metadados_url(self):
+        # tamanho/SHA-256 do zip; o downloader busca na própria thread
+        jogo_id = getattr(self, "jogo_id", None)
+        return f"{API_BASE}/jogos/{jogo_id}/metadados" if jogo_id is not None else None
+
     def get_image_data(self, url):
         if not url:
             return b""
@@ -356,7 +549,7 @@ class GameCard(QWidget):
         self.btn_install.setText("BAIXANDO... 0%")
         self.btn_install.setEnabled(False)
 
-        signals = baixar_jogo(self.game_title, self.download_url, card=self)
+        signals = baixar_jogo(self.game_title, self.download_url, card=self, metadados_url=self.metadados_url())
 
         signals.progress.connect(self._set_progress)
 
@@ -561,6 +754,16 @@ QPushButton:hover {
         self.showMaximized()
 
         self.cards = []
+        self.threads = []
+
+        # busca no servidor só quando o usuário para de digitar
+        self._busca_texto = ""
+        self._busca_ids = None
+        self._busca_timer = QTimer(self)
+        self._busca_timer.setSingleShot(True)
+        self._busca_timer.setInterval(BUSCA_ATRASO_MS)
+        self._busca_timer.timeout.connect(self._iniciar_busca)
+
         self.load_games()
         # aplica filtros atuais (mantém layout consistente mesmo sem jogos)
         self.apply_filters()
@@ -582,10 +785,8 @@ QPushButton:hover {
         self.close()
 
     def load_games(self):
-        import requests
         try:
-            response = requests.get(f"{API_BASE}/admin/listar_jogos")
-            jogos_data = response.json().get("jogos", [])
+            jogos_data = load_catalogo()
         except:
             jogos_data = []
 
@@ -599,13 +800,14 @@ QPushButton:hover {
 
         for idx, jogo in enumerate(jogos_data):
             card = GameCard(
-                image_url=jogo.get("capa_url", ""),
+                image_url=url_capa(jogo.get("capa_thumb")),
                 title_top=jogo.get("nome", ""),
                 title_bottom="",
                 download_url=f"{API_BASE}/jogos/{jogo['id']}/download?user_id={self.user_info['id']}",
                 genres=jogo.get("genero", []),
                 user_info=self.user_info
             )
+            card.jogo_id = jogo.get("id")
 
             self.cards.append(card)
             row = idx // 5
@@ -621,19 +823,69 @@ QPushButton:hover {
             placeholder.setStyleSheet("background-color: transparent; border: none;")
             self.grid_layout.addWidget(placeholder, row, col)
 
+        self.update_genre_counts()
+
+    def update_genre_counts(self):
+        _, active_genres = self.filter_bar.get_filters()
+        self._genres_counted = set(active_genres)
+        th = GenerosThread(active_genres)
+        th.pronto.connect(self._on_generos)
+        th.finished.connect(lambda: self.threads.remove(th) if th in self.threads else None)
+        self.threads.append(th)
+        th.start()
+
+    def _on_generos(self, selecionados, contagens):
+        if contagens is None or selecionados != self._genres_counted:
+            return   # falhou, ou a seleção já mudou (outra contagem a caminho)
+        self.filter_bar.set_genres(contagens)
+
     # <<< NOVO: filtros (texto + gêneros) sem quebrar layout
     def apply_filters(self, search_text=None, active_genres=None):
         # quando chamado manualmente, lê do componente
         if search_text is None or active_genres is None:
             search_text, active_genres = self.filter_bar.get_filters()
 
+        if set(active_genres) != getattr(self, "_genres_counted", set()):
+            self.update_genre_counts()
+
+        # texto novo: filtra já pelo título e agenda a busca no servidor
+        if search_text.strip() and search_text != self._busca_texto:
+            self._busca_timer.start()
+        self._filtrar_cards(search_text, active_genres)
+
+    def _iniciar_busca(self):
+        texto, _ = self.filter_bar.get_filters()
+        if not texto.strip():
+            return
+        th = BuscaThread(texto)
+        th.pronto.connect(self._on_busca)
+        th.finished.connect(lambda: self.threads.remove(th) if th in self.threads else None)
+        self.threads.append(th)
+        th.start()
+
+    def _on_busca(self, texto, ids):
+        search_text, active_genres = self.filter_bar.get_filters()
+        if texto != search_text:
+            return   # resposta de um texto que o usuário já mudou
+        self._busca_texto = texto
+        self._busca_ids = ids
+        self._filtrar_cards(search_text, active_genres)
+
+    def _filtrar_cards(self, search_text, active_genres):
+        # busca no servidor; sem resposta (ou ainda esperando), filtro por trecho do título
+        ids = self._busca_ids if search_text.strip() and search_text == self._busca_texto else None
+
         for card in self.cards:
             title = card.game_title.lower()
             genre_match = True
             if active_genres:
-                # compara interseção de gêneros do card com selecionados
-                genre_match = any(g in card.genres for g in active_genres)
-            card.setVisible(search_text in title and genre_match)
+                # card precisa ter todos os selecionados (mesma regra do /jogos?genero=)
+                genre_match = all(g in card.genres for g in active_genres)
+            if ids is not None:
+                text_match = getattr(card, "jogo_id", None) in ids
+            else:
+                text_match = search_text in title
+            card.setVisible(text_match and genre_match)
 
 
 
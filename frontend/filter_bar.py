@@ -142,5 +142,22 @@ class FilterBar(QWidget):
                 self.active_genres
             )
 
+    def set_genres(self, contagens):
+        """
+        Troca os gêneros do menu pelos do servidor (/jogos/generos), com a
+        quantidade de jogos de cada um dentro da seleção atual.
+        """
+        self.genre_menu.clear()
+        self.genres = []
+        for c in contagens:
+            g = c.get("genero")
+            if not g:
+                continue
+            self.genres.append(g)
+            total = c.get("total", 0)
+            acao = self.genre_menu.addAction(f"{g} ({total})", partial(self.toggle_genre, g))
+            # sem jogos na seleção: só deixa clicar se for para desmarcar
+            acao.setEnabled(total > 0 or g in self.active_genres)
+
     def get_filters(self):
         return self.search_input.text().lower(), self.active_genres
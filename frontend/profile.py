@@ -270,6 +270,11 @@ class ProfilePage(QWidget):
                 self.plan_label.setStyleSheet("font-size: 18px; color: #00ff88;")
 
                 expires_at = data.get("expires_at")  # pode vir None no permanente
+
+                # mesmo dict usado pelas outras telas: libera o botão de download
+                self.user_info["plan_type"] = plano
+                self.user_info["plan_expires_at"] = expires_at
+                self.user_info["plano_status"] = "ATIVO" if expires_at else "PERMANENTE"
                 if expires_at:
                     # pode vir como string ISO
                     exp = datetime.fromisoformat(str(expires_at)).replace(tzinfo=timezone.utc)